@@ -46,8 +46,10 @@ class CounterOfferGenerator:
 
         issueIndex = 0
 
+        issue_weights, value_weights = self.party.preference.issue_weights, self.party.preference.value_weights
+
         for issue, value in bid:
-            point[issueIndex] = self.party.preference.issue_weights[issue] * self.party.preference.value_weights[issue][value]
+            point[issueIndex] = issue_weights[issue] * value_weights[issue][value]
 
             issueIndex += 1
 
@@ -8,25 +8,27 @@ class SaneUtilitySpace(nenv.OpponentModel.EstimatedPreference):
 
     def init_zero(self):
         for issue in self.issue_weights.keys():
-            self._issue_weights[issue] = 0.
+            self[issue] = 0.
 
-            for value_name in self.value_weights[issue].keys():
-                self._value_weights[issue][value_name] = 0.
+            for value_name in self._value_weights[issue].keys():
+                self[issue, value_name] = 0.
 
     def init_copy(self, pref: nenv.Preference):
+        issue_weights, value_weights = pref.issue_weights, pref.value_weights
+
         for issue in self.issue_weights.keys():
-            self._issue_weights[issue] = pref.issue_weights[issue]
+            self[issue] = issue_weights[issue]
 
-            for value_name in self.value_weights[issue].keys():
-                self._value_weights[issue][value_name] = pref.value_weights[issue][value_name]
+            for value_name in self._value_weights[issue].keys():
+                self[issue, value_name] = value_weights[issue][value_name]
 
     def normalize(self):
         issueSum = sum(self.issue_weights.values())
 
         for issue in self.issue_weights.keys():
-            self._issue_weights[issue] /= issueSum
+            self[issue] = self[issue] / issueSum
 
-            valueSum = sum(self.value_weights[issue].values())
+            valueSum = sum(self._value_weights[issue].values())
 
-            for value in self.value_weights[issue].keys():
-                self._value_weights[issue][value] /= valueSum
+            for value in list(self._value_weights[issue].keys()):
+                self[issue, value] = self[issue, value] / valueSum
@@ -19,7 +19,7 @@ class Model(nn.Module):
         super(Model, self).__init__()
 
         self.pred_length = output_length
-        self.dropout = dropout
+        self.dropout = nn.Dropout(p=dropout)  # Follows the training mode of the model, i.e., disabled in evaluation
 
         if d_ff is None:
             d_ff = d_model * 4
@@ -83,9 +83,11 @@ class Model(nn.Module):
 
     def forward(self, x_enc, x_dec, time, target_time,
                 enc_self_mask=None, dec_self_mask=None, dec_enc_mask=None):
+        # The prediction length follows the target times, i.e., pred_length or a shorter horizon
+        pred_length = target_time.shape[1]
         # decomp init
-        mean = torch.mean(x_enc, dim=1).unsqueeze(1).repeat(1, self.pred_length, 1)
-        zeros = torch.zeros([x_dec.shape[0], target_time.shape[1], x_dec.shape[2]], device=x_enc.device)
+        mean = torch.mean(x_enc, dim=1).unsqueeze(1).repeat(1, pred_length, 1)
+        zeros = torch.zeros([x_dec.shape[0], pred_length, x_dec.shape[2]], device=x_enc.device)
         seasonal_init, trend_init = self.decomp(x_enc)
         # decoder input
         trend_init = torch.cat([trend_init[:, 0:, :], mean], dim=1)
@@ -97,7 +99,7 @@ class Model(nn.Module):
 
         enc_out = enc_out + time_out
 
-        enc_out = nn.Dropout(p=self.dropout)(enc_out)
+        enc_out = self.dropout(enc_out)
 
         enc_out, attns = self.encoder(enc_out, attn_mask=enc_self_mask)
 
@@ -111,7 +113,7 @@ class Model(nn.Module):
 
         dec_out = dec_out + time_out_dec
 
-        dec_out = nn.Dropout(p=self.dropout)(dec_out)
+        dec_out = self.dropout(dec_out)
 
         seasonal_part, trend_part = self.decoder(dec_out, enc_out, x_mask=dec_self_mask, cross_mask=dec_enc_mask,
                                                  trend=trend_init)
@@ -119,6 +121,6 @@ class Model(nn.Module):
         dec_out = trend_part + seasonal_part
 
         if self.output_attention:
-            return dec_out[:, -self.pred_length:, :], attns
+            return dec_out[:, -pred_length:, :], attns
         else:
-            return dec_out[:, -self.pred_length:, :]  # [B, L, D]
+            return dec_out[:, -pred_length:, :]  # [B, L, D]
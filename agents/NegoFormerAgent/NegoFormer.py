@@ -1,21 +1,67 @@
 import pickle as pkl
-from typing import List, Dict
+import weakref
+from typing import List, Dict, Tuple, Union
 import torch
 from .TimeEstimator import TimeEstimator
 from .Autoformer import Model
+from .model_store import get_shared_model, get_horizon_models, prepare_model
+from .inference_server import InferenceClient, connect
 from .NegoFormerProcessor import *
-from sklearn.linear_model import LinearRegression
+
+# torch.inference_mode is available since PyTorch 1.9, otherwise torch.no_grad is used.
+inference_mode = torch.inference_mode if hasattr(torch, "inference_mode") else torch.no_grad
+
+# Horizons of the models that are already warmed up, so that a shared model is warmed up only once
+warmed_up_models = weakref.WeakKeyDictionary()
 
 
 class NegoFormer:
+    """
+        NegoFormer predicts the estimated opponent utilities of the next rounds via Autoformer model.
+
+        The features of the last INPUT_LENGTH offer points are held in a ring buffer. They are updated incrementally
+        while the estimated opponent preferences do not change; otherwise, they are recalculated in one vectorized pass.
+
+        If the TorchScript model exported by export_model.py exists in COMPILED_MODEL_PATH, it is loaded instead of the
+        eager Autoformer model. Otherwise, the eager model is loaded from the memory-mapped weights in WEIGHTS_PATH, if
+        they exist. In all cases, the model runs in evaluation mode without gradient tracking, and it is created once
+        per process and shared by all NegoFormer instances, see model_store.py. Optionally, the model is quantized
+        dynamically (int8) for CPU inference, see quantization.py. If QUANTIZED is set, only the quantized TorchScript
+        model (e.g., 'model.quantized.pt') is loaded; otherwise, the eager model is quantized. Note that the quantized
+        predictions differ from the float model, so the agent may choose different candidates (see
+        quantization_report.py).
+
+        If INFERENCE_SERVER_PATH is set and the inference server is running, the forward passes are sent to the server,
+        which batches the requests of all sessions, see inference_server.py. Otherwise, or if the server fails, the
+        model runs in the process.
+
+        Optionally (i.e., TRUNCATE_HORIZON), the model decodes only the smallest horizon in HORIZON_BUCKETS that covers
+        the remaining rounds instead of OUTPUT_LENGTH, so the late rounds are cheaper. Since Autoformer decodes the whole
+        sequence at once (e.g., auto-correlation and decomposition), the predictions of a truncated horizon are an
+        approximation of the full horizon, and they may change the chosen candidate.
+    """
     time_estimator: TimeEstimator
     opponent_model: nenv.OpponentModel.AbstractOpponentModel
-    model: Model
+    model: Union[Model, torch.jit.ScriptModule]
+    inference_client: Union[None, InferenceClient]  # Connection to the inference server, None for in-process inference
+    horizon_models: Dict[int, torch.nn.Module]      # Models of the truncated horizons, if enabled
     bid_point_history: List[OfferPoint]
+    feature_buffer: np.ndarray     # Ring buffer of the features of the last offer points (INPUT_LENGTH x INPUT_FEATURE_SIZE)
+    time_buffer: np.ndarray        # Ring buffer of the times of the last offer points
+    bid_index_buffer: np.ndarray   # Ring buffer of the bid indices of the last offer points
+    feature_version: int           # Version of the estimated preferences that the features are calculated with
 
     INPUT_FEATURE_SIZE: int = 12
     OUTPUT_LENGTH: int = 336
     INPUT_LENGTH: int = 96
+    COMPILED_MODEL_PATH: str = 'agents/NegoFormerAgent/model.pt'  # TorchScript model, see export_model.py
+    WEIGHTS_PATH: str = 'agents/NegoFormerAgent/weights'  # Weights directory, see model_store.py
+    NUMBER_OF_THREADS: Union[None, int] = None  # Intra-op threads for CPU inference, None for the default of PyTorch
+    WARM_UP_STEPS: int = 2  # Number of the dummy forward passes in warm_up
+    QUANTIZED: bool = False  # Whether the eager model is quantized dynamically (int8), only on CPU
+    INFERENCE_SERVER_PATH: Union[None, str] = None  # Unix socket of the inference server, None for in-process inference
+    TRUNCATE_HORIZON: bool = False  # Whether the model decodes only the required horizon in the late rounds
+    HORIZON_BUCKETS: List[int] = [32, 64, 128]  # Truncated horizons, fixed so that the traced models are reusable
 
     predictions: Dict[float, List[float]]
     current_predictions: Dict[nenv.Bid, Dict[float, float]]
@@ -26,25 +72,86 @@ class NegoFormer:
 
         self.bid_point_history = []
 
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.feature_buffer = np.zeros((self.INPUT_LENGTH, self.INPUT_FEATURE_SIZE))
+        self.time_buffer = np.zeros(self.INPUT_LENGTH)
+        self.bid_index_buffer = np.zeros(self.INPUT_LENGTH, dtype=np.int64)
+        self.feature_version = -1
+
+        self.device = torch.device('cuda' if torch.cuda.is_available() and not self.QUANTIZED else 'cpu')
         print("Device:", self.device)
 
-        self.model = Model(self.INPUT_FEATURE_SIZE, self.OUTPUT_LENGTH).to(self.device)
+        if self.NUMBER_OF_THREADS is not None:
+            torch.set_num_threads(self.NUMBER_OF_THREADS)
+
+        self.model = get_shared_model(self.INPUT_FEATURE_SIZE, self.OUTPUT_LENGTH, self.device,
+                                      self.COMPILED_MODEL_PATH, self.WEIGHTS_PATH, self.QUANTIZED)
+
+        self.horizon_models = {}
+
+        if self.TRUNCATE_HORIZON:
+            self.horizon_models = get_horizon_models(self.INPUT_FEATURE_SIZE, self.OUTPUT_LENGTH, self.device,
+                                                     self.COMPILED_MODEL_PATH, self.WEIGHTS_PATH, self.QUANTIZED,
+                                                     self.HORIZON_BUCKETS)
+
+        self.inference_client = connect(self.INFERENCE_SERVER_PATH)
 
         self.current_predictions = {}
         self.predictions = {}
 
     def load_model(self, file_path: str = 'agents//NegoFormerAgent//model.pkl'):
+        model = Model(self.INPUT_FEATURE_SIZE, self.OUTPUT_LENGTH).to(self.device)
+
         with open(file_path, "rb") as f:
-            self.model.load_state_dict(pkl.load(f))
+            model.load_state_dict(pkl.load(f))
+
+        self.model = prepare_model(model, self.QUANTIZED)
+
+        # The eager model supports any horizon
+        self.horizon_models = {horizon: self.model for horizon in self.horizon_models}
+
+    def get_dummy_inputs(self, batch_size: int = 1, horizon: Union[None, int] = None) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+            This method provides dummy inputs in the shapes of the model inputs, e.g., for warm-up and export.
+        :param batch_size: Batch size, default 1
+        :param horizon: Number of the target times, default OUTPUT_LENGTH
+        :return: Features, decoder features, times and target times
+        """
+        x_tensor = torch.zeros((batch_size, self.INPUT_LENGTH, self.INPUT_FEATURE_SIZE), device=self.device)
+        t_tensor = torch.zeros((batch_size, self.INPUT_LENGTH, 1), device=self.device)
+        t_t_tensor = torch.zeros((batch_size, self.OUTPUT_LENGTH if horizon is None else horizon, 1), device=self.device)
+
+        return x_tensor, x_tensor, t_tensor, t_t_tensor
 
-        self.model.train(False)
+    def warm_up(self, batch_size: int = 5):
+        """
+            This method runs the model with dummy inputs, so that the lazy initializations (e.g., memory allocations,
+            TorchScript optimizations) take place before the first timed act. A shared model is warmed up only once.
+        :param batch_size: Batch size, i.e., the number of candidates. Default 5
+        :return: Nothing
+        """
+        if self.inference_client is not None:
+            return
+
+        models = dict(self.horizon_models)
+        models[self.OUTPUT_LENGTH] = self.model
+
+        for horizon, model in models.items():
+            if horizon in warmed_up_models.setdefault(model, set()):
+                continue
+
+            dummy_inputs = self.get_dummy_inputs(batch_size, horizon)
+
+            with inference_mode():
+                for _ in range(self.WARM_UP_STEPS):
+                    model(*dummy_inputs)
+
+            warmed_up_models[model].add(horizon)
 
     def receive_bid(self, bid: nenv.Bid, t: float):
-        self.bid_point_history.append(OfferPoint(1, bid, t))
+        self.append(OfferPoint(1, bid, t))
 
     def update(self, bid: nenv.Bid, t: float):
-        self.bid_point_history.append(OfferPoint(-1, bid, t))
+        self.append(OfferPoint(-1, bid, t))
 
         if bid in self.current_predictions:
             selected_predictions = self.current_predictions[bid]
@@ -57,67 +164,259 @@ class NegoFormer:
 
         self.current_predictions = {}
 
+    def append(self, bid_point: OfferPoint):
+        """
+            This method appends an offer point into the history and the ring buffer. Its features are calculated
+            immediately if the features in the buffer are up-to-date.
+        :param bid_point: New offer point
+        :return: Nothing
+        """
+        self.bid_point_history.append(bid_point)
+
+        position = (len(self.bid_point_history) - 1) % self.INPUT_LENGTH
+
+        self.time_buffer[position] = bid_point.t
+        self.bid_index_buffer[position] = self.opponent_model.preference.get_bid_index(bid_point.bid)
+        self.feature_buffer[position, 0] = bid_point.bid.utility
+        self.feature_buffer[position, 2] = bid_point.who
+
+        if self.feature_version == self.opponent_model.version:
+            self.update_features(np.array([position]))
+
+    def update_features(self, positions: np.ndarray):
+        """
+            This method calculates the features, which depend on the estimated opponent preferences, for the given
+            positions of the ring buffer. The previous offer points of the given positions must be up-to-date.
+        :param positions: Positions in the ring buffer
+        :return: Nothing
+        """
+        estimated_preference = self.opponent_model.preference
+
+        features = self.feature_buffer
+
+        bid_codes = estimated_preference.get_bid_codes(self.bid_index_buffer[positions])
+        features[positions, 3] = estimated_preference.get_utilities(bid_codes)
+
+        prev_positions = (positions - 2) % self.INPUT_LENGTH
+
+        features[positions, 4:10] = process_moves(features[positions, 2],
+                                                  features[prev_positions, 0], features[positions, 0],
+                                                  features[prev_positions, 3], features[positions, 3])
+
+        features[positions, 10] = features[positions, 0] * features[positions, 3]
+        features[positions, 11] = features[positions, 0] + features[positions, 3]
+
+    def get_features(self, t: float, length: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            This method provides the features of the last offer points. If the estimated opponent preferences have
+            changed, the features in the ring buffer are recalculated at once.
+        :param t: Current negotiation time
+        :param length: Number of the last offer points, at most INPUT_LENGTH
+        :return: Features (length x INPUT_FEATURE_SIZE) and times of the last offer points
+        """
+        number_of_points = len(self.bid_point_history)
+
+        version = self.opponent_model.version
+
+        if self.feature_version != version:
+            self.update_features(np.arange(max(0, number_of_points - self.INPUT_LENGTH), number_of_points) % self.INPUT_LENGTH)
+
+            self.feature_version = version
+
+        length = min(length, number_of_points)
+
+        positions = np.arange(number_of_points - length, number_of_points) % self.INPUT_LENGTH
+
+        features = self.feature_buffer[positions]
+        features[:, 1] = t
+        features[:2, 4:10] = 0.  # No previous offer point for the first two time-steps
+
+        return features, self.time_buffer[positions]
+
     def is_ready(self) -> bool:
         return len(self.bid_point_history) >= self.INPUT_LENGTH * 2
 
     def predict(self, bid: nenv.Bid, t: float) -> float:
-        target_times = self.time_estimator.populate(t, self.OUTPUT_LENGTH)
+        """
+            This method predicts the slope of the estimated opponent utility if the agent offers the given bid.
+        :param bid: Candidate bid
+        :param t: Current negotiation time
+        :return: Predicted slope
+        """
+        return self.predict_batch([bid], t)[0]
+
+    def predict_batch(self, bids: List[nenv.Bid], t: float) -> List[float]:
+        """
+            This method predicts the slopes of many candidate bids in a single forward pass. The candidates share the
+            same history, only the last time-step differs. Thus, the features of the history are extracted once.
+
+            The predictions of all candidates are kept in current_predictions until the agent offers one of them.
+        :param bids: Candidate bids
+        :param t: Current negotiation time
+        :return: Predicted slope of each candidate bid
+        """
+        X, T, T_Target, number_of_prediction = self.prepare_inputs(bids, t)
+
+        return self.process_predictions(bids, t, self.forward(X, T, T_Target), T_Target, number_of_prediction)
+
+    def prepare_inputs(self, bids: List[nenv.Bid], t: float, pending_point: Union[None, OfferPoint] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+            This method prepares the model inputs of the candidate bids. Optionally, a pending offer point (e.g., the
+            expected offer of the opponent) is appended to the history virtually, i.e., the history does not change.
+        :param bids: Candidate bids
+        :param t: Current negotiation time, or the time of the pending offer point
+        :param pending_point: Pending offer point, default None
+        :return: Features, times, target times and the number of the valid target times (i.e., the populated ones)
+        """
+        horizon = self.get_horizon(t)
+
+        target_times = self.time_estimator.populate(t, horizon)
         number_of_prediction = len(target_times)
 
-        X = np.zeros((1, self.INPUT_LENGTH, self.INPUT_FEATURE_SIZE))
-        T = np.zeros((1, self.INPUT_LENGTH, 1))
-        T_Target = np.zeros((1, self.OUTPUT_LENGTH, 1))
+        X = np.zeros((len(bids), self.INPUT_LENGTH, self.INPUT_FEATURE_SIZE))
+        T = np.zeros((len(bids), self.INPUT_LENGTH, 1))
+        T_Target = np.zeros((len(bids), horizon, 1))
 
-        for i in range(number_of_prediction):
-            T_Target[0, i, 0] = target_times[i]
-
-        self.update(bid, t)
+        T_Target[:, :number_of_prediction, 0] = target_times
 
         estimated_preference = self.opponent_model.preference
 
-        bid_point_history = self.bid_point_history[-self.INPUT_LENGTH:]
+        bid_point_history = self.bid_point_history[-(self.INPUT_LENGTH - 1):]
 
-        for i, bid_point in enumerate(bid_point_history):
-            T[0, i, 0] = bid_point.t
+        # The last time-step is reserved for the candidate bid, and the previous one for the pending offer point
+        if pending_point is not None:
+            features, times = self.get_features(t, self.INPUT_LENGTH - 2)
+            pending_index = len(features)
 
-            if i >= 2:
-                x = process(bid_point_history[i - 2], bid_point, t, estimated_preference)
-            else:
-                x = process(None, bid_point, t, estimated_preference)
+            X[:, :pending_index, :] = features
+            T[:, :pending_index, 0] = times
 
-            X[0, i, :] = x
+            X[:, pending_index, :] = process(bid_point_history[-2] if len(bid_point_history) >= 2 else None,
+                                             pending_point, t, estimated_preference)
+            T[:, pending_index, 0] = pending_point.t
 
-        self.bid_point_history.pop(-1)
+            bid_point_history = bid_point_history[1:] + [pending_point]
+            candidate_index = pending_index + 1
+        else:
+            features, times = self.get_features(t, self.INPUT_LENGTH - 1)
+            candidate_index = len(features)
 
-        with torch.no_grad():
-            x_tensor = torch.FloatTensor(X).to(self.device)
-            t_tensor = torch.FloatTensor(T).to(self.device)
-            t_t_tensor = torch.FloatTensor(T_Target).to(self.device)
+            X[:, :candidate_index, :] = features
+            T[:, :candidate_index, 0] = times
 
-            prediction = self.model(x_tensor, x_tensor, t_tensor, t_t_tensor)[0]
+        T[:, candidate_index, 0] = t
 
-        output_length = min(self.OUTPUT_LENGTH, self.time_estimator.get_remaining_round(t))
+        for j, bid in enumerate(bids):
+            bid_point = OfferPoint(-1, bid, t)
 
-        prediction = prediction.detach().cpu().numpy()
+            if candidate_index >= 2:
+                X[j, candidate_index, :] = process(bid_point_history[candidate_index - 2], bid_point, t, estimated_preference)
+            else:
+                X[j, candidate_index, :] = process(None, bid_point, t, estimated_preference)
+
+        return X, T, T_Target, number_of_prediction
+
+    def get_horizon(self, t: float) -> int:
+        """
+            This method provides the number of the time-steps to decode, i.e., the smallest truncated horizon that
+            covers the remaining rounds, or OUTPUT_LENGTH.
+        :param t: Current negotiation time
+        :return: Horizon
+        """
+        if len(self.horizon_models) == 0:
+            return self.OUTPUT_LENGTH
+
+        remaining_round = self.time_estimator.get_remaining_round(t)
+
+        for horizon in sorted(self.horizon_models.keys()):
+            if horizon >= remaining_round:
+                return horizon
+
+        return self.OUTPUT_LENGTH
+
+    def process_predictions(self, bids: List[nenv.Bid], t: float, predictions: np.ndarray, T_Target: np.ndarray,
+                            number_of_prediction: int) -> List[float]:
+        """
+            This method converts the model outputs into the slopes of the candidate bids, and keeps the predictions of
+            all candidates in current_predictions until the agent offers one of them.
+        :param bids: Candidate bids
+        :param t: Current negotiation time
+        :param predictions: Model outputs
+        :param T_Target: Target times of the model inputs
+        :param number_of_prediction: Number of the valid target times, see prepare_inputs
+        :return: Predicted slope of each candidate bid
+        """
+        output_length = min(self.OUTPUT_LENGTH, self.time_estimator.get_remaining_round(t), number_of_prediction)
+
+        last_estimated_opp_utility = self.opponent_model.preference.get_utility(self.bid_point_history[-1].bid)
+
+        y_pred = np.clip(predictions[:, :output_length, -1], 0., 1.)
 
-        y_pred = np.reshape(np.clip(prediction[:output_length, -1], 0., 1.), (output_length, ))
+        self.current_predictions = {}
 
-        last_estimated_opp_utility = estimated_preference.get_utility(self.bid_point_history[-1].bid)
+        for j, bid in enumerate(bids):
+            self.current_predictions[bid] = {float(t): pred for t, pred in zip(T_Target[j, :output_length, 0], y_pred[j])}
 
         if output_length <= 1:
-            slope = 0.
-        else:
-            slope = self.calculate_slope(T_Target[0, :output_length], y_pred, last_estimated_opp_utility)
+            return [0. for _ in bids]
+
+        return self.calculate_slopes(T_Target[0, :output_length, 0], y_pred, last_estimated_opp_utility)
+
+    def forward(self, X: np.ndarray, T: np.ndarray, T_Target: np.ndarray) -> np.ndarray:
+        """
+            This method runs the model on the inference server if it is connected, otherwise in the process. If the
+            server fails, it falls back to the in-process inference for the rest of the session.
+        :param X: Features (batch x INPUT_LENGTH x INPUT_FEATURE_SIZE)
+        :param T: Times (batch x INPUT_LENGTH x 1)
+        :param T_Target: Target times (batch x horizon x 1)
+        :return: Predictions
+        """
+        if self.inference_client is not None:
+            try:
+                return self.inference_client.predict(X, T, T_Target)
+            except (OSError, RuntimeError) as e:
+                print("Inference server is not available, in-process inference is used:", e)
+
+                self.inference_client.close()
+                self.inference_client = None
+
+        model = self.horizon_models.get(T_Target.shape[1], self.model)
+
+        with inference_mode():
+            x_tensor = torch.FloatTensor(X).to(self.device)
+            t_tensor = torch.FloatTensor(T).to(self.device)
+            t_t_tensor = torch.FloatTensor(T_Target).to(self.device)
+
+            predictions = model(x_tensor, x_tensor, t_tensor, t_t_tensor)
+
+        return predictions.detach().cpu().numpy()
 
-        self.current_predictions[bid] = {float(t): pred for t, pred in zip(T_Target[0, :output_length], y_pred)}
+    def close(self):
+        """
+            This method closes the connection to the inference server, if any, so that the server releases the handler
+            of the session. It must be called at the end of the session.
+        :return: Nothing
+        """
+        if self.inference_client is not None:
+            self.inference_client.close()
+            self.inference_client = None
 
-        return slope
+    def calculate_slopes(self, times: np.ndarray, predictions: np.ndarray, last_estimated_opp_utility: float) -> List[float]:
+        """
+            This method fits a line without intercept (i.e., least squares) to the predicted change of the estimated
+            opponent utility for each candidate at once.
+        :param times: Target times, shared by the candidates
+        :param predictions: Predicted utilities of the candidates (number of candidates x number of target times)
+        :param last_estimated_opp_utility: Estimated opponent utility of the last offer point
+        :return: Slope of each candidate, rounded to 4 decimals
+        """
+        times = np.asarray(times, dtype=np.float64)
 
-    def calculate_slope(self, times: np.ndarray, prediction: np.ndarray, last_estimated_opp_utility: float) -> float:
-        linear_model = LinearRegression(fit_intercept=False)
+        denominator = np.dot(times, times)
 
-        linear_model.fit(times, prediction - last_estimated_opp_utility)
+        if denominator == 0.:
+            return [0. for _ in range(len(predictions))]
 
-        slope = round(float(linear_model.coef_[0]), 4)
+        slopes = (predictions - last_estimated_opp_utility).astype(np.float64) @ times / denominator
 
-        return slope
+        return [round(float(slope), 4) for slope in slopes]
@@ -6,6 +6,7 @@ from .MICROStrategy import MICROAgent
 from .NegoFormer import NegoFormer
 from .TimeEstimator import TimeEstimator
 from .ParetoEstimator import ParetoEstimator
+from .SpeculativeForecaster import SpeculativeForecaster
 
 
 class NegoFormerAgent(nenv.AbstractAgent):
@@ -16,6 +17,7 @@ class NegoFormerAgent(nenv.AbstractAgent):
     time_estimator: TimeEstimator
     pareto_estimator: ParetoEstimator
     negoformer: NegoFormer
+    speculative_forecaster: Union[None, SpeculativeForecaster]  # Background forecasts of the next round, if enabled
     initial_strategy: MICROAgent
     pareto_index: int
     pareto_bid_point: Union[None | nenv.BidPoint]
@@ -25,6 +27,7 @@ class NegoFormerAgent(nenv.AbstractAgent):
     main_strategy_starting_t: float
     NUMBER_OF_CONCESSION: int = 1
     MINIMUM_UTILITY: float = 0.5
+    SPECULATIVE: bool = False  # Whether the next round is forecast while the opponent is thinking
 
     last_candidate: dict
     pareto: List[nenv.BidPoint]
@@ -33,6 +36,14 @@ class NegoFormerAgent(nenv.AbstractAgent):
     def name(self) -> str:
         return "NegoFormerAgent"
 
+    @property
+    def background_compute(self) -> bool:
+        """
+            The speculative forecasts run on a background thread, so the agent cannot be used with virtual clock.
+        :return: Whether the speculation is enabled
+        """
+        return self.SPECULATIVE
+
     def initiate(self, opponent_name: Union[None, str]):
         self.opponent_model = nenv.OpponentModel.FrequencyWindowOpponentModel(self.preference)
 
@@ -44,6 +55,9 @@ class NegoFormerAgent(nenv.AbstractAgent):
         self.time_estimator = TimeEstimator()
 
         self.negoformer = NegoFormer(self.time_estimator, self.opponent_model)
+        self.negoformer.warm_up()
+
+        self.speculative_forecaster = SpeculativeForecaster(self.negoformer) if self.SPECULATIVE else None
 
         self.pareto_estimator = ParetoEstimator(self.preference, self.opponent_model, self.MINIMUM_UTILITY, self.negoformer.INPUT_LENGTH)
 
@@ -134,12 +148,20 @@ class NegoFormerAgent(nenv.AbstractAgent):
         # Get candidates
         self.candidates = self.pareto_estimator.get_candidate_bids(self.pareto_bid_point, self.window_size)
 
-        # Predict the slopes
-        bid_infos = {}
+        # Predict the slopes of the distinct candidates at once
+        candidate_bid_points = list(dict.fromkeys(self.candidates.values()))
+
+        candidate_bids = [bid_point.bid for bid_point in candidate_bid_points]
 
-        for candidate_bid_point in self.candidates.values():
-            if candidate_bid_point not in bid_infos:
-                bid_infos[candidate_bid_point] = self.negoformer.predict(candidate_bid_point.bid, t)
+        slopes = None
+
+        if self.speculative_forecaster is not None:
+            slopes = self.speculative_forecaster.collect(candidate_bids, self.last_received_bids[-1], t)
+
+        if slopes is None:
+            slopes = self.negoformer.predict_batch(candidate_bids, t)
+
+        bid_infos = dict(zip(candidate_bid_points, slopes))
 
         candidates = {
             key: (bid_infos[self.candidates[key]], self.candidates[key]) for key in self.candidates
@@ -161,8 +183,19 @@ class NegoFormerAgent(nenv.AbstractAgent):
         if self.can_accept() and self.last_received_bids[-1].utility >= bid.utility:
             return self.accept_action
 
+        # Speculate the next round while the opponent is thinking
+        if self.speculative_forecaster is not None:
+            self.speculative_forecaster.speculate(candidate_bids, self.last_received_bids[-1],
+                                                  t + self.time_estimator.estimated_round_time())
+
         return nenv.Offer(bid)
 
+    def terminate(self, is_accept: bool, opponent_name: str, t: float):
+        if self.speculative_forecaster is not None:
+            self.speculative_forecaster.close()
+
+        self.negoformer.close()
+
     def get_pareto_point(self, t: float, pareto: List[nenv.BidPoint]):
         """
             This method provides an estimated pareto point based on Pareto Walker strategy.
@@ -52,3 +52,42 @@ def process(prev_offer_point: Union[OfferPoint, None], offer_point: OfferPoint,
         offer_point.bid.utility * estimated_preference.get_utility(offer_point.bid),
         offer_point.bid.utility + estimated_preference.get_utility(offer_point.bid)
     ])
+
+
+MOVE_FEATURES = ['Concession', 'Selfish', 'Fortunate', 'Unfortunate', 'Silent', 'Nice']  # Order of the move features
+
+
+def process_moves(who: np.ndarray, prev_utility: np.ndarray, utility: np.ndarray, prev_estimated_utility: np.ndarray,
+                  estimated_utility: np.ndarray, threshold: float = 0.03) -> np.ndarray:
+    """
+        This method extracts the move features of many offer points at once. It follows the same rules with
+        nenv.utils.get_move, and the same perspective with process method.
+    :param who: Who offered, -1 for the agent and 1 for the opponent
+    :param prev_utility: Utility of the previous offer points for the agent
+    :param utility: Utility of the offer points for the agent
+    :param prev_estimated_utility: Estimated opponent utility of the previous offer points
+    :param estimated_utility: Estimated opponent utility of the offer points
+    :param threshold: Threshold for the silent moves, default 0.03
+    :return: One-hot move features as NumPy matrix (number of offer points x 6)
+    """
+    own = who == -1
+
+    diff_utility = utility - prev_utility
+    diff_estimated_utility = estimated_utility - prev_estimated_utility
+
+    diff_offered = np.where(own, diff_utility, diff_estimated_utility)
+    diff_opponent = np.where(own, diff_estimated_utility, diff_utility)
+
+    conditions = [
+        (np.abs(diff_offered) < threshold) & (np.abs(diff_opponent) < threshold),
+        (np.abs(diff_offered) < threshold) & (diff_opponent > 0.),
+        (diff_offered < 0) & (diff_opponent >= 0),
+        (diff_offered <= 0) & (diff_opponent < 0),
+        (diff_offered > 0) & (diff_opponent <= 0),
+        (diff_offered > 0) & (diff_opponent > 0)
+    ]
+
+    moves = np.select(conditions, [MOVE_FEATURES.index(move) for move in
+                                   ['Silent', 'Nice', 'Concession', 'Unfortunate', 'Selfish', 'Fortunate']], default=-1)
+
+    return (moves[:, np.newaxis] == np.arange(len(MOVE_FEATURES))[np.newaxis, :]).astype(np.float64)
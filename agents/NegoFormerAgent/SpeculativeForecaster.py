@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Union
+import numpy as np
+import nenv
+from .NegoFormer import NegoFormer
+from .NegoFormerProcessor import OfferPoint
+
+
+class SpeculativeForecaster:
+    """
+        SpeculativeForecaster runs the forward pass of the next round on a background thread while the opponent is
+        thinking. After the agent offers, the next round is speculated as follows: The opponent repeats its last offer
+        after an estimated round time, and the agent considers the same candidates. When the opponent's offer arrives,
+        the speculation is used only if:
+
+            - The opponent offers the expected bid,
+            - The estimated opponent preferences do not change,
+            - All candidates of the agent are speculated,
+            - The current time is close enough to the speculated time (i.e., TOLERANCE).
+
+        Otherwise, it is a miss: the speculation is cancelled if it has not started yet, or the agent waits for it to
+        finish, and then the agent predicts synchronously. Thus, a miss costs up to one forward pass, and the hit rate
+        depends on how often the opponent repeats its offer, and on the opponent model (e.g.,
+        FrequencyWindowOpponentModel does not change the estimated preferences after t=0.8). A hit is exact for round-based deadlines; for time-based deadlines, it is
+        an approximation in time, since the speculated time and the time estimations are used.
+    """
+    negoformer: NegoFormer
+    executor: ThreadPoolExecutor                # Background worker
+    future: Union[None, Future]                 # Speculated forward pass
+    bids: List[nenv.Bid]                        # Speculated candidate bids
+    opponent_bid: Union[None, nenv.Bid]         # Expected offer of the opponent
+    t: float                                    # Speculated time
+    version: int                                # Version of the estimated preferences during speculation
+    T_Target: Union[None, np.ndarray]           # Target times of the speculated inputs
+    number_of_prediction: int                   # Number of the valid target times of the speculated inputs
+    hits: int                                   # Number of hits
+    misses: int                                 # Number of misses
+
+    TOLERANCE: float = 0.005  # Maximum difference between the current time and the speculated time
+
+    def __init__(self, negoformer: NegoFormer):
+        """
+            Constructor
+        :param negoformer: NegoFormer instance of the agent
+        """
+        self.negoformer = negoformer
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.future = None
+        self.bids = []
+        self.opponent_bid = None
+        self.t = -1.
+        self.version = -1
+        self.T_Target = None
+        self.number_of_prediction = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def speculate(self, bids: List[nenv.Bid], opponent_bid: nenv.Bid, t: float):
+        """
+            This method starts the forward pass of the next round on the background thread. The inputs are prepared
+            immediately, so the history can change safely.
+        :param bids: Candidate bids of the next round
+        :param opponent_bid: Expected offer of the opponent
+        :param t: Expected time of the next round
+        :return: Nothing
+        """
+        self.wait()
+
+        X, T, self.T_Target, self.number_of_prediction = self.negoformer.prepare_inputs(bids, t, OfferPoint(1, opponent_bid, t))
+
+        self.bids = list(bids)
+        self.opponent_bid = opponent_bid
+        self.t = t
+        self.version = self.negoformer.opponent_model.version
+
+        self.future = self.executor.submit(self.negoformer.forward, X, T, self.T_Target)
+
+    def collect(self, bids: List[nenv.Bid], opponent_bid: nenv.Bid, t: float) -> Union[None, List[float]]:
+        """
+            This method provides the slopes of the candidate bids from the speculation if it is a hit.
+        :param bids: Candidate bids
+        :param opponent_bid: Last offer of the opponent
+        :param t: Current negotiation time
+        :return: Predicted slope of each candidate bid, or None if it is a miss
+        """
+        if self.future is None:
+            return None
+
+        is_hit = opponent_bid == self.opponent_bid and self.version == self.negoformer.opponent_model.version and \
+            abs(t - self.t) <= self.TOLERANCE and set(bids).issubset(self.bids)
+
+        if not is_hit:
+            self.misses += 1
+
+            # Skip the speculation if it has not started yet. Otherwise, wait for it, so that the stale forward pass
+            # does not compete with the synchronous one for the CPU (or overlap on the inference server).
+            if not self.future.cancel():
+                self.wait()
+
+            self.future = None
+
+            return None
+
+        predictions = self.wait()
+
+        if predictions is None:
+            self.misses += 1
+
+            return None
+
+        self.hits += 1
+
+        indices = [self.bids.index(bid) for bid in bids]
+
+        return self.negoformer.process_predictions(bids, t, predictions[indices], self.T_Target[indices],
+                                                   self.number_of_prediction)
+
+    def wait(self) -> Union[None, np.ndarray]:
+        """
+            This method waits for the speculated forward pass, and discards the speculation.
+        :return: Predictions of the speculated forward pass, or None if there is no speculation or it fails
+        """
+        if self.future is None:
+            return None
+
+        future, self.future = self.future, None
+
+        try:
+            return future.result()
+        except Exception as e:
+            print("Speculative forecast is failed:", e)
+
+            return None
+
+    def close(self):
+        """
+            This method stops the background worker.
+        :return: Nothing
+        """
+        self.wait()
+
+        self.executor.shutdown(wait=True)
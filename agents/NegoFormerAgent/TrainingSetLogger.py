@@ -0,0 +1,222 @@
+import json
+import os
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import nenv
+from nenv import Session, SessionEstimator, Bid
+from nenv.utils import LogRow, ExcelLog
+
+TRAINING_SET_INDEX = "index.jsonl"  # Index file of a training set store, one line for each chunk
+
+# Columns of a row, i.e., the offered bid, who offered, the offer time, the utility of the offer for the agent and for
+# the opponent. The rest of the columns hold the estimated opponent preferences at the offers of the agent, see
+# get_estimation.
+BID_INDEX_COLUMN = 0
+WHO_COLUMN = 1
+TIME_COLUMN = 2
+UTILITY_COLUMN = 3
+OPPONENT_UTILITY_COLUMN = 4
+NUMBER_OF_COLUMNS = 5
+
+
+def get_estimation(estimated_preference: nenv.Preference) -> np.ndarray:
+    """
+        This method flattens the estimated opponent preferences, i.e., the Issue weight times the Value weight for each
+        Issue-Value pair in the order of the domain. Thus, the estimated utility of a bid is the sum of the entries of
+        its values, see get_estimated_utilities.
+    :param estimated_preference: Estimated opponent preferences
+    :return: Flattened estimated preferences
+    """
+    issue_weights, value_weights = estimated_preference.issue_weights, estimated_preference.value_weights
+
+    return np.array([issue_weights[issue] * value_weights[issue][value]
+                     for issue in estimated_preference.issues for value in issue.values])
+
+
+def get_estimated_utilities(estimation: np.ndarray, bid_indices: np.ndarray, number_of_values: List[int]) -> np.ndarray:
+    """
+        This method calculates the estimated utilities of the bids from the flattened estimated preferences in the same
+        way as Preference.get_utilities, so that the utilities are identical with the ones of NegoFormer.
+    :param estimation: Flattened estimated preferences, see get_estimation
+    :param bid_indices: Indices of the bids
+    :param number_of_values: Number of the values of each issue in the order of the domain
+    :return: Estimated utilities of the bids
+    """
+    remainders = np.array(bid_indices, dtype=np.int64)
+    bid_codes = np.zeros((len(remainders), len(number_of_values)), dtype=np.int64)
+
+    for i in reversed(range(len(number_of_values))):  # As in Preference.get_bid_codes
+        bid_codes[:, i] = remainders % number_of_values[i]
+        remainders //= number_of_values[i]
+
+    offsets = np.cumsum([0] + number_of_values[:-1])
+    utilities = np.zeros(len(bid_codes))
+
+    for i in range(len(number_of_values)):
+        utilities += estimation[offsets[i] + bid_codes[:, i]]
+
+    return utilities
+
+
+def load_index(store_dir: str) -> List[dict]:
+    """
+        This method reads the index of a training set store.
+    :param store_dir: Directory of the training set store
+    :return: Chunk entries, see TrainingSetLogger.write_chunk
+    """
+    with open(os.path.join(store_dir, TRAINING_SET_INDEX), "r") as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+
+def load_chunk(store_dir: str, entry: dict) -> np.ndarray:
+    """
+        This method reads the rows of a chunk.
+    :param store_dir: Directory of the training set store
+    :param entry: Chunk entry of the index
+    :return: Rows (number of rows x (NUMBER_OF_COLUMNS + number of Issue-Value pairs))
+    """
+    with np.load(os.path.join(store_dir, entry["file"]), allow_pickle=False) as chunk:
+        rows = chunk["Rows"]
+
+    if rows.shape != (entry["size"], NUMBER_OF_COLUMNS + sum(entry["number_of_values"])):
+        raise ValueError("Corrupted training set chunk: %s" % entry["file"])
+
+    return rows
+
+
+class TrainingSetLogger(nenv.logger.AbstractLogger):
+    """
+        TrainingSetLogger records every offer with the estimated opponent preferences while the session runs, so that
+        the training set is ready at the end of a data collection tournament without replaying the Estimators.
+
+        Each agent and each Estimator of that agent make a sequence, i.e., the offers from the perspective of the agent
+        where the Estimator estimates the opponent preferences. A row of a sequence holds the offered bid, who offered,
+        its time and its utility for both agents. At each offer of the agent, the row also holds the estimated
+        opponent preferences at that time (see get_estimation), which NegoFormer would use to predict.
+
+        The NegoFormer features of a window are calculated when the window is read (see dataset.TrainingSetDataset):
+        The estimated utilities of the whole window (and of the estimated targets) are calculated with the estimation
+        at the last offer of the window, as NegoFormer recalculates the features of its history with the latest
+        estimation. Thus, the windows are identical with the ones of dataset.build_dataset.
+
+        The sequences are buffered for each domain, and written into a compressed chunk (i.e., 'DomainX/chunk_*.npz')
+        when the buffer exceeds CHUNK_SIZE rows, and at the end of the tournament. Each chunk appends a line into the
+        index of the store. Since the Estimator sessions (i.e., the replays of evaluate_estimators.py) do not end with
+        a tournament, their sequences are written at the end of each session.
+    """
+    store_dir: str                                              # Directory of the store
+    session_name: str                                           # Name of the current session, i.e., AgentA_AgentB_DomainX
+    domain_name: str                                            # Domain of the current session
+    number_of_values: List[int]                                 # Number of the values of each issue in the domain
+    is_estimator_session: bool
+    rows: Dict[Tuple[str, int], List[np.ndarray]]               # Rows of each sequence in the current session
+    buffers: Dict[str, List[Tuple[dict, np.ndarray]]]           # Buffered sequences of each domain
+    domains: Dict[str, List[int]]                               # Number of the values of each issue of each domain
+    number_of_chunks: int
+
+    reads_estimators: bool = True
+
+    CHUNK_SIZE: int = 65536      # Minimum number of the rows in a chunk
+    STORE_DIR: str = "training_set/"
+
+    def initiate(self):
+        self.store_dir = self.get_path(self.STORE_DIR)
+        self.buffers = {}
+        self.domains = {}
+        self.number_of_chunks = 0
+
+        self.rows = {}
+
+    def before_session_start(self, session: Union[Session, SessionEstimator]) -> List[str]:
+        self.is_estimator_session = isinstance(session, SessionEstimator)
+
+        self.session_name = os.path.splitext(os.path.basename(session.log_path))[0]
+        self.domain_name = self.session_name.rsplit("_Domain", 1)[1]
+        self.number_of_values = [len(issue.values) for issue in session.agentA.preference.issues]
+
+        self.domains[self.domain_name] = self.number_of_values
+
+        self.rows = {}
+
+        for agent_no, agent in [("A", session.agentA), ("B", session.agentB)]:
+            for estimator_id in range(len(agent.estimators)):
+                self.rows[(agent_no, estimator_id)] = []
+
+        return []
+
+    def on_offer(self, agent: str, offer: Bid, time: float, session: Union[Session, SessionEstimator]) -> LogRow:
+        bid_index = session.agentA.preference.get_bid_index(offer)
+
+        for agent_no, owner, opponent in [("A", session.agentA, session.agentB), ("B", session.agentB, session.agentA)]:
+            for estimator_id, estimator in enumerate(owner.estimators):
+                row = np.zeros(NUMBER_OF_COLUMNS + sum(self.number_of_values))
+                row[BID_INDEX_COLUMN] = bid_index
+                row[WHO_COLUMN] = -1 if agent_no == agent else 1
+                row[TIME_COLUMN] = time
+                row[UTILITY_COLUMN] = owner.preference.get_utility(offer)
+                row[OPPONENT_UTILITY_COLUMN] = opponent.preference.get_utility(offer)
+
+                if agent_no == agent:  # The Estimator is already updated with the received offers
+                    row[NUMBER_OF_COLUMNS:] = get_estimation(estimator.preference)
+
+                self.rows[(agent_no, estimator_id)].append(row)
+
+        return {}
+
+    def on_session_end(self, final_row: LogRow, session: Union[Session, SessionEstimator]) -> LogRow:
+        buffer = self.buffers.setdefault(self.domain_name, [])
+
+        for agent_no, agent in [("A", session.agentA), ("B", session.agentB)]:
+            for estimator_id, estimator in enumerate(agent.estimators):
+                rows = self.rows[(agent_no, estimator_id)]
+
+                if len(rows) == 0:
+                    continue
+
+                buffer.append(({"session": self.session_name, "perspective": agent_no, "estimator": estimator.name},
+                               np.array(rows)))
+
+        self.rows = {}
+
+        if self.is_estimator_session or sum(len(rows) for _, rows in buffer) >= self.CHUNK_SIZE:
+            self.write_chunk(self.domain_name)
+
+        return {}
+
+    def on_tournament_end(self, tournament_logs: ExcelLog, agent_names: List[str], domain_names: List[str], estimator_names: List[str]):
+        for domain_name in list(self.buffers.keys()):
+            self.write_chunk(domain_name)
+
+    def write_chunk(self, domain_name: str):
+        """
+            This method writes the buffered sequences of the domain into a compressed chunk, and appends its entry into
+            the index. The chunk names include the process id, so that the processes of a replay pool can write into
+            the same store.
+        :param domain_name: Domain name
+        :return: Nothing
+        """
+        buffer = self.buffers.pop(domain_name, [])
+
+        if len(buffer) == 0:
+            return
+
+        file_name = os.path.join("Domain%s" % domain_name, "chunk_%d_%d.npz" % (os.getpid(), self.number_of_chunks))
+        self.number_of_chunks += 1
+
+        os.makedirs(os.path.join(self.store_dir, "Domain%s" % domain_name), exist_ok=True)
+
+        sequences, start = [], 0
+
+        for sequence, rows in buffer:
+            sequences.append(dict(sequence, start=start, size=len(rows)))
+
+            start += len(rows)
+
+        np.savez_compressed(os.path.join(self.store_dir, file_name), Rows=np.concatenate([rows for _, rows in buffer]))
+
+        entry = {"file": file_name, "domain": domain_name, "number_of_values": self.domains[domain_name], "size": start,
+                 "sequences": sequences}
+
+        # A single appended line, so that the index is not corrupted by the other processes
+        with open(os.path.join(self.store_dir, TRAINING_SET_INDEX), "a") as f:
+            f.write(json.dumps(entry) + "\n")
@@ -0,0 +1,434 @@
+import argparse
+import glob
+import json
+import os
+import re
+from collections import OrderedDict
+from multiprocessing import Pool
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+import torch
+import nenv
+from nenv.Preference import domain_loader
+from nenv.utils.DynamicImport import load_estimator_class
+from nenv.utils.SessionTrace import TRACE_DTYPE, TRACE_EXTENSION, AGENT_CODES, AGENT_NAMES, ACTION_CODES, \
+    get_trace_path, parse_trace_name
+from .NegoFormer import NegoFormer
+from .TimeEstimator import TimeEstimator
+from .replay import replay_offers
+from .NegoFormerProcessor import process_moves
+from .TrainingSetLogger import TRAINING_SET_INDEX, NUMBER_OF_COLUMNS, BID_INDEX_COLUMN, WHO_COLUMN, TIME_COLUMN, \
+    UTILITY_COLUMN, OPPONENT_UTILITY_COLUMN, load_index, load_chunk, get_estimated_utilities
+
+DATASET_INDEX = "index.json"  # Index file of a dataset directory
+DATASET_DTYPE = np.float32
+SESSION_NAME_PATTERN = re.compile(r"[^_]+_[^_]+_Domain.+")  # Session file name convention, see parse_trace_name
+
+# Shapes of the windows of each array, i.e., the features, the times, the target times and the target utilities
+DATASET_ARRAYS: Dict[str, Tuple[int, ...]] = {
+    "X": (NegoFormer.INPUT_LENGTH, NegoFormer.INPUT_FEATURE_SIZE),
+    "T": (NegoFormer.INPUT_LENGTH, 1),
+    "T_Target": (NegoFormer.OUTPUT_LENGTH, 1),
+    "Y": (NegoFormer.OUTPUT_LENGTH,)
+}
+
+
+def find_sessions(session_dir: str) -> List[str]:
+    """
+        This method finds the recorded sessions in the given directory. The binary session trace is preferred over the
+        session log file of the same session. For a tournament result directory, its 'sessions' directory is searched.
+        Only the files following the session file name convention (i.e., AgentA_AgentB_DomainX) are accepted, so that
+        the other files (e.g., 'results.xlsx') are skipped.
+    :param session_dir: Directory of the recorded sessions, or the result directory of a tournament
+    :return: Sorted list of the session paths
+    """
+    if os.path.isdir(os.path.join(session_dir, "sessions")):
+        session_dir = os.path.join(session_dir, "sessions")
+
+    session_paths = glob.glob(os.path.join(session_dir, "*" + TRACE_EXTENSION))
+
+    for log_path in glob.glob(os.path.join(session_dir, "*.xlsx")):
+        if not os.path.exists(get_trace_path(log_path)):
+            session_paths.append(log_path)
+
+    return sorted(path for path in session_paths if SESSION_NAME_PATTERN.fullmatch(get_session_name(path)))
+
+
+def load_session(session_path: str, preference: nenv.Preference) -> np.ndarray:
+    """
+        This method loads a recorded session in the layout of the binary session trace. A trace is memory-mapped. For a
+        session log file, only the required columns of the 'Session' sheet are read.
+    :param session_path: Binary session trace or session log file path
+    :param preference: Preference of an agent in the session, to convert the bids into bid indices
+    :return: Structured NumPy array, see TRACE_DTYPE
+    """
+    if session_path.endswith(TRACE_EXTENSION):
+        return np.load(session_path, mmap_mode="r", allow_pickle=False)
+
+    df = pd.read_excel(session_path, sheet_name="Session", usecols=["Round", "Time", "Who", "Action", "BidContent"])
+
+    trace = np.zeros(len(df), dtype=TRACE_DTYPE)
+
+    trace["Round"] = df["Round"].to_numpy()
+    trace["Time"] = df["Time"].to_numpy()
+    trace["Who"] = [AGENT_CODES[who] for who in df["Who"]]
+    trace["Action"] = [ACTION_CODES[action] for action in df["Action"]]
+    trace["BidIndex"] = [preference.get_bid_index(nenv.Bid(json.loads(str(bid_content).replace("'", '"'))))
+                         for bid_content in df["BidContent"]]
+
+    return trace
+
+
+def get_session_name(session_path: str) -> str:
+    """
+        This method provides the name of a recorded session, i.e., AgentA_AgentB_DomainX.
+    :param session_path: Binary session trace or session log file path
+    :return: Session name
+    """
+    if not session_path.endswith(TRACE_EXTENSION):
+        session_path = get_trace_path(session_path)
+
+    return os.path.basename(session_path)[:-len(TRACE_EXTENSION)]
+
+
+def extract_windows(session_path: str, agent_no: str, output_dir: str, opponent_model_name: str = "FrequencyWindowOpponentModel",
+                    stride: int = 1, true_utility: bool = False) -> dict:
+    """
+        This method replays a recorded session from the perspective of the given agent, and writes a window at each
+        offer of the agent into a chunk of the dataset. The features are prepared by NegoFormer as in the negotiation,
+        where the offered bid is the candidate. The targets are the next offers of the opponent (at most
+        OUTPUT_LENGTH), i.e., their times and their opponent utilities. The unused target times are zero.
+
+        The number of the windows is known before the replay, so the windows are written into memory-mapped .npy files
+        directly, i.e., the memory usage does not depend on the length of the session.
+    :param session_path: Binary session trace or session log file path
+    :param agent_no: Perspective of the replay, 'A' or 'B'
+    :param output_dir: Dataset directory
+    :param opponent_model_name: Opponent model of the features, default 'FrequencyWindowOpponentModel'
+    :param stride: Number of the offers of the agent between two windows, default 1
+    :param true_utility: Whether the targets are the utilities of the opponent's preferences instead of the estimated
+    ones at the time of the window, default False
+    :return: Chunk entry of the index, i.e., the name and the number of the windows
+    """
+    agent_a_name, agent_b_name, domain_name = parse_trace_name(get_session_name(session_path) + TRACE_EXTENSION)
+
+    pref_a, pref_b = domain_loader(domain_name)
+    preference, opponent_preference = (pref_a, pref_b) if agent_no == "A" else (pref_b, pref_a)
+
+    trace = load_session(session_path, pref_a)
+
+    offers = np.asarray(trace["Action"]) == ACTION_CODES["Offer"]
+    bid_indices = np.asarray(trace["BidIndex"])[offers]
+    times = np.asarray(trace["Time"])[offers]
+    is_own = np.asarray(trace["Who"])[offers] == AGENT_CODES[agent_no]
+
+    opponent_offers = np.flatnonzero(~is_own)
+
+    # The window of an offer requires a full history, and at least one next offer of the opponent
+    window_offers = np.flatnonzero(is_own & (np.arange(len(is_own)) >= NegoFormer.INPUT_LENGTH - 1))
+    window_offers = window_offers[np.searchsorted(opponent_offers, window_offers) < len(opponent_offers)][::stride]
+
+    chunk_name = "%s_%s" % (get_session_name(session_path), agent_no)
+    chunk = {"name": chunk_name, "size": len(window_offers), "AgentA": agent_a_name, "AgentB": agent_b_name,
+             "DomainID": domain_name, "Perspective": agent_no}
+
+    if len(window_offers) == 0:  # Too short session
+        return chunk
+
+    chunk_dir = os.path.join(output_dir, "chunks", chunk_name)
+
+    os.makedirs(chunk_dir, exist_ok=True)
+
+    arrays = {name: np.lib.format.open_memmap(os.path.join(chunk_dir, name + ".npy"), mode="w+", dtype=DATASET_DTYPE,
+                                              shape=(len(window_offers),) + shape)
+              for name, shape in DATASET_ARRAYS.items()}
+
+    time_estimator = TimeEstimator()
+    opponent_model = load_estimator_class(opponent_model_name)(preference)
+
+    negoformer = NegoFormer(time_estimator, opponent_model)
+
+    window_positions = {int(offer): i for i, offer in enumerate(window_offers)}
+
+    for i, is_received, t, bid in replay_offers(trace, agent_no, preference, [negoformer]):
+        if is_received or i not in window_positions:
+            continue
+
+        j = window_positions[i]
+
+        X, T, _, _ = negoformer.prepare_inputs([bid], t)
+
+        targets = opponent_offers[np.searchsorted(opponent_offers, i):][:NegoFormer.OUTPUT_LENGTH]
+        target_preference = opponent_preference if true_utility else opponent_model.preference
+
+        arrays["X"][j] = X[0]
+        arrays["T"][j] = T[0]
+        arrays["T_Target"][j] = 0.
+        arrays["T_Target"][j, :len(targets), 0] = times[targets]
+        arrays["Y"][j] = 0.
+        arrays["Y"][j, :len(targets)] = target_preference.get_utilities(target_preference.get_bid_codes(bid_indices[targets]))
+
+    for array in arrays.values():
+        array.flush()
+
+    return chunk
+
+
+def _extract_windows(args: tuple) -> dict:
+    """
+        Pool wrapper of extract_windows method.
+    """
+    return extract_windows(*args)
+
+
+def build_dataset(session_paths: List[str], output_dir: str, opponent_model_name: str = "FrequencyWindowOpponentModel",
+                  stride: int = 1, true_utility: bool = False, processes: Union[None, int] = None) -> dict:
+    """
+        This method builds a dataset from the recorded sessions across a process pool. Each session is replayed from
+        the perspective of both agents in a process, which writes its own chunk. Thus, only one session is held in the
+        memory of a process at a time. At the end, the index of the chunks is written.
+
+        See extract_windows for the other parameters.
+    :param session_paths: List of the binary session trace or session log file paths, see find_sessions
+    :param processes: Number of processes. Default None, i.e., the number of CPUs.
+    :return: Index of the dataset
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = [(session_path, agent_no, output_dir, opponent_model_name, stride, true_utility)
+            for session_path in session_paths for agent_no in AGENT_NAMES]
+
+    if processes == 1:
+        chunks = [_extract_windows(job) for job in jobs]
+    else:
+        with Pool(processes) as pool:
+            chunks = pool.map(_extract_windows, jobs, chunksize=1)
+
+    index = {
+        "dtype": np.dtype(DATASET_DTYPE).name,
+        "arrays": {name: list(shape) for name, shape in DATASET_ARRAYS.items()},
+        "opponent_model": opponent_model_name,
+        "true_utility": true_utility,
+        "size": sum(chunk["size"] for chunk in chunks),
+        "chunks": [chunk for chunk in chunks if chunk["size"] > 0]
+    }
+
+    with open(os.path.join(output_dir, DATASET_INDEX), "w") as f:
+        json.dump(index, f, indent=1)
+
+    return index
+
+
+class NegoFormerDataset(torch.utils.data.Dataset):
+    """
+        NegoFormerDataset provides the windows of a dataset directory (see build_dataset) from the memory-mapped
+        chunks. The chunks are opened lazily, so that each DataLoader worker maps them in its own process.
+    """
+    directory: str                                  # Dataset directory
+    index: dict                                     # Index of the dataset
+    offsets: np.ndarray                             # First window of each chunk
+    chunks: Union[None, List[Dict[str, np.ndarray]]]  # Memory-mapped arrays of each chunk, opened lazily
+
+    def __init__(self, directory: str):
+        """
+            Constructor
+        :param directory: Dataset directory
+        """
+        self.directory = directory
+
+        with open(os.path.join(directory, DATASET_INDEX), "r") as f:
+            self.index = json.load(f)
+
+        self.offsets = np.cumsum([0] + [chunk["size"] for chunk in self.index["chunks"]])
+        self.chunks = None
+
+    def open(self):
+        """
+            This method memory-maps the arrays of the chunks.
+        :return: Nothing
+        """
+        self.chunks = []
+
+        for chunk in self.index["chunks"]:
+            arrays = {}
+
+            for name, shape in self.index["arrays"].items():
+                array = np.load(os.path.join(self.directory, "chunks", chunk["name"], name + ".npy"), mmap_mode="r",
+                                allow_pickle=False)
+
+                if array.shape != (chunk["size"],) + tuple(shape):
+                    raise ValueError("Corrupted dataset file for %s in %s" % (name, chunk["name"]))
+
+                arrays[name] = array
+
+            self.chunks.append(arrays)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        :param index: Index of the window
+        :return: Features, times, target times and target utilities of the window
+        """
+        if self.chunks is None:
+            self.open()
+
+        chunk_index = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        arrays = self.chunks[chunk_index]
+        i = index - int(self.offsets[chunk_index])
+
+        return tuple(torch.from_numpy(np.array(arrays[name][i])) for name in DATASET_ARRAYS.keys())
+
+
+class TrainingSetDataset(torch.utils.data.Dataset):
+    """
+        TrainingSetDataset provides the windows of a training set store written by TrainingSetLogger, in the same
+        layout with NegoFormerDataset. A window is made at each offer of the agent in a sequence as in extract_windows,
+        i.e., the last INPUT_LENGTH rows, and the next offers of the opponent (at most OUTPUT_LENGTH) as the targets.
+
+        The features of a window are calculated with the estimated opponent preferences at its last offer, as in
+        NegoFormer.get_features. Thus, the windows are identical with the ones of build_dataset for the same Estimator.
+
+        The chunks are decompressed on demand, and at most MAX_CACHED_CHUNKS chunks are kept in each process.
+    """
+    store_dir: str                          # Directory of the store
+    entries: List[dict]                     # Chunk entries of the index
+    windows: np.ndarray                     # Chunk index, row index and target end of each window
+    true_utility: bool                      # Whether the targets are the opponent utilities or the estimated ones
+    cache: OrderedDict                      # Recently used chunks
+
+    MAX_CACHED_CHUNKS: int = 16
+
+    def __init__(self, store_dir: str, stride: int = 1, true_utility: bool = False):
+        """
+            Constructor
+        :param store_dir: Directory of the training set store
+        :param stride: Number of the offers of the agent between two windows, default 1
+        :param true_utility: Whether the targets are the utilities of the opponent's preferences instead of the
+        estimated ones at the time of the window, default False (as in build_dataset)
+        """
+        self.store_dir = store_dir
+        self.entries = load_index(store_dir)
+        self.true_utility = true_utility
+        self.cache = OrderedDict()
+
+        windows = []
+
+        for chunk_index, entry in enumerate(self.entries):
+            who = load_chunk(store_dir, entry)[:, WHO_COLUMN]
+
+            for sequence in entry["sequences"]:
+                sequence_who = who[sequence["start"]:sequence["start"] + sequence["size"]]
+
+                opponent_offers = np.flatnonzero(sequence_who == 1)
+                window_offers = np.flatnonzero((sequence_who == -1) &
+                                               (np.arange(len(sequence_who)) >= NegoFormer.INPUT_LENGTH - 1))
+
+                next_offers = np.searchsorted(opponent_offers, window_offers)
+                window_offers = window_offers[next_offers < len(opponent_offers)][::stride]
+
+                windows.append(np.stack([np.full(len(window_offers), chunk_index), sequence["start"] + window_offers,
+                                         np.full(len(window_offers), sequence["start"] + sequence["size"])], axis=1))
+
+        self.windows = np.concatenate(windows) if len(windows) > 0 else np.zeros((0, 3), dtype=np.int64)
+
+    def get_chunk(self, chunk_index: int) -> np.ndarray:
+        """
+            This method provides the rows of a chunk from the cache.
+        :param chunk_index: Index of the chunk
+        :return: Rows of the chunk
+        """
+        if chunk_index in self.cache:
+            self.cache.move_to_end(chunk_index)
+        else:
+            self.cache[chunk_index] = load_chunk(self.store_dir, self.entries[chunk_index])
+
+            if len(self.cache) > self.MAX_CACHED_CHUNKS:
+                self.cache.popitem(last=False)
+
+        return self.cache[chunk_index]
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        :param index: Index of the window
+        :return: Features, times, target times and target utilities of the window
+        """
+        chunk_index, row, end = (int(value) for value in self.windows[index])
+
+        rows = self.get_chunk(chunk_index)
+        number_of_values = self.entries[chunk_index]["number_of_values"]
+
+        window = rows[row - NegoFormer.INPUT_LENGTH + 1:row + 1]
+        estimation = window[-1, NUMBER_OF_COLUMNS:]
+        t = window[-1, TIME_COLUMN]
+
+        who, utilities = window[:, WHO_COLUMN], window[:, UTILITY_COLUMN]
+        estimated_utilities = get_estimated_utilities(estimation, window[:, BID_INDEX_COLUMN], number_of_values)
+
+        arrays = {name: np.zeros(shape, dtype=DATASET_DTYPE) for name, shape in DATASET_ARRAYS.items()}
+
+        # As in NegoFormer.update_features and NegoFormer.get_features
+        arrays["X"][:, 0] = utilities
+        arrays["X"][:, 1] = t
+        arrays["X"][:, 2] = who
+        arrays["X"][:, 3] = estimated_utilities
+        arrays["X"][2:, 4:10] = process_moves(who[2:], utilities[:-2], utilities[2:], estimated_utilities[:-2],
+                                              estimated_utilities[2:])
+        arrays["X"][:, 10] = utilities * estimated_utilities
+        arrays["X"][:, 11] = utilities + estimated_utilities
+        arrays["T"][:, 0] = window[:, TIME_COLUMN]
+
+        following_rows = rows[row + 1:end]
+        targets = following_rows[following_rows[:, WHO_COLUMN] == 1][:NegoFormer.OUTPUT_LENGTH]
+
+        arrays["T_Target"][:len(targets), 0] = targets[:, TIME_COLUMN]
+
+        if self.true_utility:
+            arrays["Y"][:len(targets)] = targets[:, OPPONENT_UTILITY_COLUMN]
+        else:
+            arrays["Y"][:len(targets)] = get_estimated_utilities(estimation, targets[:, BID_INDEX_COLUMN],
+                                                                 number_of_values)
+
+        return tuple(torch.from_numpy(arrays[name]) for name in DATASET_ARRAYS.keys())
+
+
+def load_dataset(directory: str, true_utility: bool = False) -> torch.utils.data.Dataset:
+    """
+        This method opens a dataset directory of build_dataset, or a training set store of TrainingSetLogger.
+    :param directory: Dataset directory or training set store
+    :param true_utility: Whether the targets are the utilities of the opponent's preferences instead of the estimated
+    ones, default False. The targets of a dataset directory are fixed by build_dataset, so they must match.
+    :return: Dataset of the windows
+    """
+    if os.path.exists(os.path.join(directory, TRAINING_SET_INDEX)):
+        return TrainingSetDataset(directory, true_utility=true_utility)
+
+    dataset = NegoFormerDataset(directory)
+
+    if dataset.index["true_utility"] != true_utility:
+        raise ValueError("The targets of the dataset are built with true_utility=%s, but true_utility=%s is requested."
+                         % (dataset.index["true_utility"], true_utility))
+
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the dataset of NegoFormer from the recorded sessions of a tournament (e.g., tournament_data_collection.yaml).")
+    parser.add_argument("session_dir", help="Directory of the recorded sessions (e.g., 'results/sessions/')")
+    parser.add_argument("--output", default="dataset/", help="Output dataset directory. Default: 'dataset/'")
+    parser.add_argument("--opponent_model", default="FrequencyWindowOpponentModel", help="Opponent model of the features. Default: 'FrequencyWindowOpponentModel'")
+    parser.add_argument("--stride", type=int, default=1, help="Number of the offers of an agent between two windows. Default: 1")
+    parser.add_argument("--true_utility", action="store_true", help="Use the utilities of the opponent's preferences as the targets instead of the estimated ones")
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes. Default: the number of CPUs")
+
+    args = parser.parse_args()
+
+    dataset_index = build_dataset(find_sessions(args.session_dir), args.output, args.opponent_model, args.stride,
+                                  args.true_utility, args.processes)
+
+    print("%d windows of %d chunks are saved into %s" % (dataset_index["size"], len(dataset_index["chunks"]), args.output))
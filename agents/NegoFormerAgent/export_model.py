@@ -0,0 +1,135 @@
+import argparse
+import os
+import pickle as pkl
+from typing import Tuple, Union, List
+import torch
+from .Autoformer import Model
+from .NegoFormer import NegoFormer
+from .quantization import quantize
+from .model_store import load_weights, get_horizon_path, get_compiled_model_path
+
+INPUT_NAMES = ["x_enc", "x_dec", "time", "target_time"]
+
+
+def load_eager_model(weights_path: Union[None, str] = None) -> Model:
+    """
+        This method creates the Autoformer model of NegoFormer in evaluation mode.
+    :param weights_path: Path of the pickled state dictionary or the weights directory (see model_store.py), None for
+                         the initial weights
+    :return: Autoformer model
+    """
+    model = Model(NegoFormer.INPUT_FEATURE_SIZE, NegoFormer.OUTPUT_LENGTH)
+
+    if weights_path is not None and os.path.isdir(weights_path):
+        model.load_state_dict(load_weights(weights_path))
+    elif weights_path is not None:
+        with open(weights_path, "rb") as f:
+            model.load_state_dict(pkl.load(f))
+
+    model.train(False)
+
+    return model
+
+
+def get_example_inputs(batch_size: int = 1, horizon: int = NegoFormer.OUTPUT_LENGTH) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+        This method generates random inputs in the fixed shapes of NegoFormer (i.e., INPUT_LENGTH and the horizon).
+    :param batch_size: Batch size, default 1
+    :param horizon: Number of the target times, default OUTPUT_LENGTH
+    :return: Features, decoder features, times and target times
+    """
+    x_tensor = torch.rand((batch_size, NegoFormer.INPUT_LENGTH, NegoFormer.INPUT_FEATURE_SIZE))
+    t_tensor = torch.sort(torch.rand((batch_size, NegoFormer.INPUT_LENGTH, 1)), dim=1)[0]
+    t_t_tensor = torch.sort(torch.rand((batch_size, horizon, 1)), dim=1)[0]
+
+    return x_tensor, x_tensor, t_tensor, t_t_tensor
+
+
+def export_torchscript(model: Model, file_path: str, horizon: int = NegoFormer.OUTPUT_LENGTH) -> torch.jit.ScriptModule:
+    """
+        This method traces the model into TorchScript for the given horizon, and saves it.
+    :param model: Autoformer model in evaluation mode
+    :param file_path: Output path, e.g., NegoFormer.COMPILED_MODEL_PATH
+    :param horizon: Number of the target times, default OUTPUT_LENGTH
+    :return: Traced model
+    """
+    with torch.no_grad():
+        traced_model = torch.jit.trace(model, get_example_inputs(1, horizon), check_trace=False)
+
+    traced_model.save(file_path)
+
+    return traced_model
+
+
+def export_onnx(model: Model, file_path: str):
+    """
+        This method exports the model into ONNX with a dynamic batch size. Note that the exporter of the installed
+        PyTorch version must support the FFT operations of AutoCorrelation.
+    :param model: Autoformer model in evaluation mode
+    :param file_path: Output path
+    :return: Nothing
+    """
+    with torch.no_grad():
+        torch.onnx.export(model, get_example_inputs(), file_path, input_names=INPUT_NAMES,
+                          output_names=["prediction"],
+                          dynamic_axes={name: {0: "batch"} for name in INPUT_NAMES + ["prediction"]})
+
+
+def verify(model: Model, compiled_model: torch.jit.ScriptModule, batch_sizes: List[int],
+           horizon: int = NegoFormer.OUTPUT_LENGTH) -> float:
+    """
+        This method compares the outputs of the compiled model with the eager model.
+    :param model: Eager model
+    :param compiled_model: Compiled model
+    :param batch_sizes: Batch sizes to compare
+    :param horizon: Number of the target times, default OUTPUT_LENGTH
+    :return: Maximum absolute difference
+    """
+    max_difference = 0.
+
+    for batch_size in batch_sizes:
+        inputs = get_example_inputs(batch_size, horizon)
+
+        with torch.no_grad():
+            expected = model(*inputs)
+            actual = compiled_model(*inputs)
+
+        max_difference = max(max_difference, float(torch.max(torch.abs(expected - actual))))
+
+    return max_difference
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the Autoformer model of NegoFormer for inference.")
+    parser.add_argument("--weights", default=None, help="Pickled state dictionary or weights directory of the model (e.g., 'agents/NegoFormerAgent/weights'). Default: the initial weights")
+    parser.add_argument("--output", default=NegoFormer.COMPILED_MODEL_PATH, help="Output path of the TorchScript model of the float model. The quantized model is saved with '.quantized' suffix (e.g., 'model.quantized.pt'). Default: '%s'" % NegoFormer.COMPILED_MODEL_PATH)
+    parser.add_argument("--onnx", default=None, help="Output path of the ONNX model, if required")
+    parser.add_argument("--quantized", action="store_true", help="Export the dynamically quantized (int8) model")
+    parser.add_argument("--horizons", type=int, nargs="*", default=[], help="Also export the TorchScript models of the truncated horizons (e.g., 32 64 128)")
+
+    args = parser.parse_args()
+
+    eager_model = load_eager_model(args.weights)
+
+    if args.quantized:
+        eager_model = quantize(eager_model)
+
+    output_path = get_compiled_model_path(args.output, args.quantized)
+
+    traced = export_torchscript(eager_model, output_path)
+
+    print("TorchScript model is saved into", output_path)
+    print("Max. absolute difference:", verify(eager_model, traced, [1, 5]))
+
+    for horizon in args.horizons:
+        horizon_path = get_compiled_model_path(get_horizon_path(args.output, horizon), args.quantized)
+
+        traced = export_torchscript(eager_model, horizon_path, horizon)
+
+        print("TorchScript model of horizon %d is saved into" % horizon, horizon_path)
+        print("Max. absolute difference:", verify(eager_model, traced, [1, 5], horizon))
+
+    if args.onnx is not None:
+        export_onnx(eager_model, args.onnx)
+
+        print("ONNX model is saved into", args.onnx)
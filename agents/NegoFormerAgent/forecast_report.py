@@ -0,0 +1,248 @@
+import argparse
+import glob
+import os
+import time
+from multiprocessing import Pool
+from typing import List, Tuple, Union
+import numpy as np
+import pandas as pd
+import torch
+from nenv.Preference import domain_loader
+from nenv.utils.DynamicImport import load_estimator_class
+from nenv.utils.SessionTrace import SessionTrace, TRACE_EXTENSION, AGENT_NAMES, parse_trace_name
+from .NegoFormer import NegoFormer
+from .TimeEstimator import TimeEstimator
+from .quantization import quantize
+from .export_model import load_eager_model
+from .replay import replay_offers, sample_candidates
+
+# Model of the worker processes, see initiate_worker
+worker_model: Union[None, torch.nn.Module] = None
+
+
+def evaluate_on_trace(trace_path: str, agent_no: str, model: torch.nn.Module,
+                      opponent_model_name: str = "FrequencyWindowOpponentModel", number_of_candidates: int = 5,
+                      truncate_horizon: bool = False, max_predictions: Union[None, int] = None,
+                      seed: int = 0) -> Tuple[dict, List[float]]:
+    """
+        This method replays a recorded session from the perspective of the given agent. At each offer of the agent,
+        NegoFormer predicts the candidates, i.e., the offered bid and randomly selected bids, in a single forward pass.
+        The predictions of the offered bid are evaluated on the next offers of the opponent in the predicted period.
+        Since the predicted times are estimated, the predictions are interpolated at the times of the offers.
+
+        The predictions are compared with the real opponent utilities and with the estimated ones when the offers are
+        received, as in PredictionLogger. The predicted slope of the offered bid is compared with the slope of the
+        estimated opponent utilities of the offers (see NegoFormer.calculate_slopes), i.e., whether their signs agree.
+    :param trace_path: Binary session trace path
+    :param agent_no: Perspective of the replay, 'A' or 'B'
+    :param model: Model of NegoFormer
+    :param opponent_model_name: Opponent model of NegoFormer, default 'FrequencyWindowOpponentModel'
+    :param number_of_candidates: Number of candidates in each prediction, default 5
+    :param truncate_horizon: Whether the horizons are truncated in the late rounds, see NegoFormer.TRUNCATE_HORIZON
+    :param max_predictions: Maximum number of predictions, default None (i.e., no limit)
+    :param seed: Random seed for the candidates, default 0
+    :return: Evaluation of the session, and the elapsed time of each forward pass in milliseconds
+    """
+    agent_a_name, agent_b_name, domain_name = parse_trace_name(trace_path)
+
+    pref_a, pref_b = domain_loader(domain_name)
+    preference, opponent_preference = (pref_a, pref_b) if agent_no == "A" else (pref_b, pref_a)
+
+    trace = SessionTrace.load(trace_path)
+
+    random_state = np.random.RandomState(seed)
+
+    time_estimator = TimeEstimator()
+    opponent_model = load_estimator_class(opponent_model_name)(preference)
+
+    negoformer = NegoFormer(time_estimator, opponent_model)
+    negoformer.model = model
+
+    if truncate_horizon:  # The eager model supports any horizon
+        negoformer.horizon_models = {horizon: model for horizon in negoformer.HORIZON_BUCKETS
+                                     if horizon < negoformer.OUTPUT_LENGTH}
+
+    predictions = []  # Time, target times, predicted utilities, predicted slope and last estimated opponent utility
+    opponent_offers = []  # Time, real and estimated opponent utility of each received offer
+    latencies = []
+
+    for _, is_received, t, bid in replay_offers(trace, agent_no, preference, [negoformer]):
+        if is_received:
+            opponent_offers.append((t, opponent_preference.get_utility(bid), opponent_model.preference.get_utility(bid)))
+
+            continue
+
+        if not negoformer.is_ready() or (max_predictions is not None and len(predictions) >= max_predictions):
+            continue
+
+        candidates = sample_candidates(bid, preference, number_of_candidates, random_state)
+
+        X, T, T_Target, number_of_prediction = negoformer.prepare_inputs(candidates, t)
+
+        start_time = time.perf_counter()
+        outputs = negoformer.forward(X, T, T_Target)
+        latencies.append((time.perf_counter() - start_time) * 1000.)
+
+        slopes = negoformer.process_predictions(candidates, t, outputs, T_Target, number_of_prediction)
+
+        predicted = negoformer.current_predictions[bid]
+
+        if len(predicted) > 1:
+            predictions.append((t, np.array(list(predicted.keys())), np.array(list(predicted.values())), slopes[0],
+                                opponent_model.preference.get_utility(negoformer.bid_point_history[-1].bid)))
+
+    offer_times, real_utilities, estimated_utilities = (np.array(values) for values in zip(*opponent_offers)) \
+        if len(opponent_offers) > 0 else (np.zeros(0), np.zeros(0), np.zeros(0))
+
+    real_errors, estimated_errors, real_ape, estimated_ape, slope_agreement = [], [], [], [], []
+
+    for t, target_times, predicted_utilities, predicted_slope, last_estimated_utility in predictions:
+        mask = (offer_times > t) & (offer_times <= target_times[-1])
+
+        if not np.any(mask):
+            continue
+
+        y_pred = np.interp(offer_times[mask], target_times, predicted_utilities)
+
+        real_errors.extend(y_pred - real_utilities[mask])
+        estimated_errors.extend(y_pred - estimated_utilities[mask])
+
+        real_ape.extend(np.abs(y_pred - real_utilities[mask])[real_utilities[mask] != 0.] /
+                        real_utilities[mask][real_utilities[mask] != 0.])
+        estimated_ape.extend(np.abs(y_pred - estimated_utilities[mask])[estimated_utilities[mask] != 0.] /
+                             estimated_utilities[mask][estimated_utilities[mask] != 0.])
+
+        actual_slope = negoformer.calculate_slopes(offer_times[mask], estimated_utilities[mask][np.newaxis, :],
+                                                   last_estimated_utility)[0]
+
+        slope_agreement.append(np.sign(predicted_slope) == np.sign(actual_slope))
+
+    return {
+        "AgentA": agent_a_name,
+        "AgentB": agent_b_name,
+        "DomainID": domain_name,
+        "Perspective": agent_no,
+        "NumPrediction": len(slope_agreement),
+        "NumPoint": len(real_errors),
+        "MSE_Real": float(np.mean(np.square(real_errors))) if len(real_errors) > 0 else None,
+        "MAPE_Real": float(np.mean(real_ape)) if len(real_ape) > 0 else None,
+        "MSE_Est": float(np.mean(np.square(estimated_errors))) if len(estimated_errors) > 0 else None,
+        "MAPE_Est": float(np.mean(estimated_ape)) if len(estimated_ape) > 0 else None,
+        "SlopeAgreement": float(np.mean(slope_agreement)) if len(slope_agreement) > 0 else None,
+        "ForwardTime": float(np.mean(latencies)) if len(latencies) > 0 else None
+    }, latencies
+
+
+def initiate_worker(weights_path: Union[None, str], quantized: bool, number_of_threads: Union[None, int]):
+    """
+        This method loads the model once in each worker process.
+    :param weights_path: Path of the pickled state dictionary or the weights directory, None for the initial weights
+    :param quantized: Whether the model is quantized dynamically (int8)
+    :param number_of_threads: Intra-op threads for CPU, None for the default of PyTorch
+    :return: Nothing
+    """
+    global worker_model
+
+    if number_of_threads is not None:
+        torch.set_num_threads(number_of_threads)
+
+    worker_model = load_eager_model(weights_path)
+
+    if quantized:
+        worker_model = quantize(worker_model)
+
+
+def _evaluate_on_trace(args: tuple) -> Tuple[dict, List[float]]:
+    """
+        Pool wrapper of evaluate_on_trace method with the model of the worker.
+    """
+    trace_path, agent_no, kwargs = args
+
+    return evaluate_on_trace(trace_path, agent_no, worker_model, **kwargs)
+
+
+def summarize(report: pd.DataFrame, latencies: List[float]) -> pd.DataFrame:
+    """
+        This method summarizes the evaluations of the sessions. The errors are weighted by the number of the evaluated
+        offers, and the slope agreement by the number of the predictions.
+    :param report: Evaluations of the sessions
+    :param latencies: Elapsed time of each forward pass in milliseconds
+    :return: Summary as DataFrame with a single row
+    """
+    evaluated = report[report["NumPoint"] > 0]
+
+    row = {"NumPrediction": int(report["NumPrediction"].sum()), "NumPoint": int(report["NumPoint"].sum())}
+
+    for column in ["MSE_Real", "MAPE_Real", "MSE_Est", "MAPE_Est"]:
+        values = evaluated[evaluated[column].notnull()]
+
+        row[column] = float(np.average(values[column].astype(float), weights=values["NumPoint"])) if len(values) > 0 else None
+
+    row["RMSE_Real"] = float(np.sqrt(row["MSE_Real"])) if row["MSE_Real"] is not None else None
+    row["RMSE_Est"] = float(np.sqrt(row["MSE_Est"])) if row["MSE_Est"] is not None else None
+    row["SlopeAgreement"] = float(np.average(evaluated["SlopeAgreement"], weights=evaluated["NumPrediction"])) \
+        if len(evaluated) > 0 else None
+
+    row["ForwardTimeMean"] = float(np.mean(latencies)) if len(latencies) > 0 else None
+
+    for percentile in [50, 90, 95, 99]:
+        row["ForwardTimeP%d" % percentile] = float(np.percentile(latencies, percentile)) if len(latencies) > 0 else None
+
+    return pd.DataFrame([row])
+
+
+def generate_report(trace_paths: List[str], weights_path: Union[None, str] = None, quantized: bool = False,
+                    processes: Union[None, int] = None, number_of_threads: Union[None, int] = None,
+                    **kwargs) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+        This method evaluates the forecasts of NegoFormer on the given recorded sessions from the perspective of both
+        agents across a process pool. Each worker process loads the model once.
+    :param trace_paths: List of binary session trace paths
+    :param weights_path: Path of the pickled state dictionary or the weights directory, None for the initial weights
+    :param quantized: Whether the model is quantized dynamically (int8), default False
+    :param processes: Number of processes. Default None, i.e., the number of CPUs.
+    :param number_of_threads: Intra-op threads of each process, None for the default of PyTorch
+    :param kwargs: Arguments of evaluate_on_trace
+    :return: Report as DataFrame (one row for each session and perspective), and its summary
+    """
+    jobs = [(trace_path, agent_no, kwargs) for trace_path in trace_paths for agent_no in AGENT_NAMES]
+
+    if processes == 1:
+        initiate_worker(weights_path, quantized, number_of_threads)
+
+        results = [_evaluate_on_trace(job) for job in jobs]
+    else:
+        with Pool(processes, initializer=initiate_worker, initargs=(weights_path, quantized, number_of_threads)) as pool:
+            results = pool.map(_evaluate_on_trace, jobs, chunksize=1)
+
+    report = pd.DataFrame([row for row, _ in results])
+    latencies = [latency for _, session_latencies in results for latency in session_latencies]
+
+    return report, summarize(report, latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the forecasts of NegoFormer on the recorded sessions.")
+    parser.add_argument("session_dir", help="Directory of the recorded sessions (e.g., 'results/sessions/')")
+    parser.add_argument("--weights", default=None, help="Pickled state dictionary or weights directory of the model. Default: the initial weights")
+    parser.add_argument("--opponent_model", default="FrequencyWindowOpponentModel", help="Opponent model of NegoFormer. Default: 'FrequencyWindowOpponentModel'")
+    parser.add_argument("--quantized", action="store_true", help="Quantize the model dynamically (int8)")
+    parser.add_argument("--truncate_horizon", action="store_true", help="Truncate the horizons in the late rounds")
+    parser.add_argument("--output", default="forecast_report.xlsx", help="Output path of the report. Default: 'forecast_report.xlsx'")
+    parser.add_argument("--max_predictions", type=int, default=None, help="Maximum number of predictions for each session")
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes. Default: the number of CPUs")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads of each process. Default: the default of PyTorch")
+
+    args = parser.parse_args()
+
+    report, summary = generate_report(sorted(glob.glob(os.path.join(args.session_dir, "*" + TRACE_EXTENSION))),
+                                      args.weights, args.quantized, args.processes, args.threads,
+                                      opponent_model_name=args.opponent_model, truncate_horizon=args.truncate_horizon,
+                                      max_predictions=args.max_predictions)
+
+    with pd.ExcelWriter(args.output) as writer:
+        report.to_excel(writer, sheet_name="Sessions", index=False)
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+
+    print(report.to_string())
+    print(summary.T.to_string(header=False))
@@ -0,0 +1,418 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Set, Tuple, Union
+import numpy as np
+import torch
+
+HEADER_SIZE = struct.Struct("!I")  # Length prefix of the JSON header of a message
+
+
+def receive_exactly(connection: socket.socket, size: int) -> bytes:
+    """
+        This method receives exactly the given number of bytes.
+    :param connection: Socket
+    :param size: Number of bytes
+    :return: Received bytes
+    """
+    buffer = bytearray()
+
+    while len(buffer) < size:
+        chunk = connection.recv(size - len(buffer))
+
+        if len(chunk) == 0:
+            raise ConnectionError("Connection is closed.")
+
+        buffer.extend(chunk)
+
+    return bytes(buffer)
+
+
+def send_arrays(connection: socket.socket, arrays: List[np.ndarray], **header):
+    """
+        This method sends a message, i.e., a length-prefixed JSON header followed by the raw bytes of the float32
+        arrays. Unlike pickle, the receiver does not execute any code.
+    :param connection: Socket
+    :param arrays: List of arrays
+    :param header: Additional header fields, e.g., an error message
+    :return: Nothing
+    """
+    arrays = [np.ascontiguousarray(array, dtype=np.float32) for array in arrays]
+
+    header["shapes"] = [list(array.shape) for array in arrays]
+
+    encoded_header = json.dumps(header).encode("utf-8")
+
+    connection.sendall(HEADER_SIZE.pack(len(encoded_header)) + encoded_header + b"".join(array.tobytes() for array in arrays))
+
+
+def receive_arrays(connection: socket.socket) -> Tuple[dict, List[np.ndarray]]:
+    """
+        This method receives a message sent via send_arrays.
+    :param connection: Socket
+    :return: Header and list of float32 arrays
+    """
+    header_size, = HEADER_SIZE.unpack(receive_exactly(connection, HEADER_SIZE.size))
+    header = json.loads(receive_exactly(connection, header_size).decode("utf-8"))
+
+    arrays = []
+
+    for shape in header["shapes"]:
+        size = int(np.prod(shape)) * 4
+
+        arrays.append(np.frombuffer(receive_exactly(connection, size), dtype=np.float32).reshape(shape))
+
+    return header, arrays
+
+
+class InferenceRequest:
+    """
+        InferenceRequest holds the inputs of a forward pass requested by a session until the batch is run.
+    """
+    inputs: List[np.ndarray]            # Features, times and target times
+    done: threading.Event               # Set when the result is ready
+    result: Union[None, np.ndarray]     # Predictions
+    error: Union[None, str]             # Error message, if the forward pass fails
+
+    def __init__(self, inputs: List[np.ndarray]):
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    @property
+    def size(self) -> int:
+        """
+        :return: Number of candidates in the request
+        """
+        return self.inputs[0].shape[0]
+
+    @property
+    def shapes(self) -> tuple:
+        """
+        :return: Shapes of the inputs except the batch dimension, requests with the same shapes can be batched
+        """
+        return tuple(array.shape[1:] for array in self.inputs)
+
+
+class InferenceServer:
+    """
+        InferenceServer runs the Autoformer model of NegoFormer for many sessions (e.g., parallel workers) over a Unix
+        socket. The requests are collected until the batch is full or the latency budget is exceeded, then they are
+        run in a single forward pass. The server can run in a separate process (see the command line interface), or in
+        a background thread via start, e.g., for tests:
+
+            with InferenceServer(socket_path, model):
+                ...
+    """
+    socket_path: str                            # Path of the Unix socket
+    model: torch.nn.Module                      # Model in evaluation mode
+    horizon_models: Dict[int, torch.nn.Module]  # Models of the truncated horizons, see model_store.get_horizon_models
+    device: torch.device                        # Device of the model
+    max_batch_size: int                         # Maximum number of candidates in a batch
+    latency_budget: float                       # Maximum waiting time of the first request in a batch, in seconds
+    requests: queue.Queue                       # Pending requests
+    server_socket: Union[None, socket.socket]   # Listening socket
+    stopped: threading.Event                    # Set when the server is stopped
+    threads: List[threading.Thread]             # Background threads of the server
+    connections: Set[socket.socket]             # Open connections of the sessions
+
+    def __init__(self, socket_path: str, model: torch.nn.Module, device: torch.device = torch.device("cpu"),
+                 max_batch_size: int = 64, latency_budget: float = 0.005,
+                 horizon_models: Union[None, Dict[int, torch.nn.Module]] = None):
+        """
+            Constructor
+        :param socket_path: Path of the Unix socket
+        :param model: Model in evaluation mode
+        :param device: Device of the model, default CPU
+        :param max_batch_size: Maximum number of candidates in a batch, default 64
+        :param latency_budget: Maximum waiting time of the first request in a batch, default 5ms
+        :param horizon_models: Models of the truncated horizons, default None
+        """
+        self.socket_path = socket_path
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.latency_budget = latency_budget
+        self.horizon_models = horizon_models if horizon_models is not None else {}
+
+        self.requests = queue.Queue()
+        self.server_socket = None
+        self.stopped = threading.Event()
+        self.threads = []
+        self.connections = set()
+
+    def start(self):
+        """
+            This method starts listening on the Unix socket in background threads.
+        :return: Server
+        """
+        if os.path.exists(self.socket_path):  # Stale socket of a previous server
+            os.remove(self.socket_path)
+
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server_socket.bind(self.socket_path)
+        self.server_socket.listen()
+        self.server_socket.settimeout(0.1)  # So that the accepting thread checks whether the server is stopped
+
+        self.stopped.clear()
+
+        self.threads = [threading.Thread(target=self.accept_connections, daemon=True),
+                        threading.Thread(target=self.run_batches, daemon=True)]
+
+        for thread in self.threads:
+            thread.start()
+
+        return self
+
+    def serve_forever(self):
+        """
+            This method starts the server, and blocks until it is stopped.
+        :return: Nothing
+        """
+        self.start()
+
+        try:
+            self.stopped.wait()
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        """
+            This method stops the server, and removes the Unix socket.
+        :return: Nothing
+        """
+        self.stopped.set()
+
+        for thread in self.threads:
+            thread.join()
+
+        self.threads = []
+
+        for connection in list(self.connections):  # Sessions fall back to in-process inference
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        if self.server_socket is not None:
+            self.server_socket.close()
+            self.server_socket = None
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def accept_connections(self):
+        """
+            This method accepts the connections of the sessions, each connection is handled in a separate thread.
+        :return: Nothing
+        """
+        while not self.stopped.is_set():
+            try:
+                connection, _ = self.server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:  # Socket is closed
+                break
+
+            connection.settimeout(None)
+
+            threading.Thread(target=self.handle_connection, args=(connection,), daemon=True).start()
+
+    def handle_connection(self, connection: socket.socket):
+        """
+            This method receives the requests of a session, and sends the predictions back.
+        :param connection: Socket of the session
+        :return: Nothing
+        """
+        self.connections.add(connection)
+
+        with connection:
+            while not self.stopped.is_set():
+                try:
+                    _, inputs = receive_arrays(connection)
+                except (ConnectionError, OSError):
+                    break
+
+                request = InferenceRequest(inputs)
+
+                self.requests.put(request)
+
+                while not request.done.wait(0.1):
+                    if self.stopped.is_set():  # Pending requests are not run
+                        request.error = "Server is stopped."
+                        break
+
+                try:
+                    if request.error is not None:
+                        send_arrays(connection, [], error=request.error)
+                    else:
+                        send_arrays(connection, [request.result])
+                except OSError:
+                    break
+
+        self.connections.discard(connection)
+
+    def run_batches(self):
+        """
+            This method collects the pending requests into batches, and runs them.
+        :return: Nothing
+        """
+        while not self.stopped.is_set():
+            try:
+                request = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [request]
+            batch_size = request.size
+            deadline = time.perf_counter() + self.latency_budget
+
+            while batch_size < self.max_batch_size:
+                remaining_time = deadline - time.perf_counter()
+
+                if remaining_time <= 0.:
+                    break
+
+                try:
+                    request = self.requests.get(timeout=remaining_time)
+                except queue.Empty:
+                    break
+
+                batch.append(request)
+                batch_size += request.size
+
+            # Only the requests with the same input shapes can be concatenated
+            groups = {}
+
+            for request in batch:
+                groups.setdefault(request.shapes, []).append(request)
+
+            for requests in groups.values():
+                self.run_batch(requests)
+
+    def run_batch(self, requests: List[InferenceRequest]):
+        """
+            This method runs the given requests in a single forward pass.
+        :param requests: Requests with the same input shapes
+        :return: Nothing
+        """
+        try:
+            x, t, t_target = [np.concatenate([request.inputs[i] for request in requests]) for i in range(3)]
+
+            model = self.horizon_models.get(t_target.shape[1], self.model)
+
+            with torch.no_grad():
+                x_tensor = torch.from_numpy(x).to(self.device)
+                t_tensor = torch.from_numpy(t).to(self.device)
+                t_t_tensor = torch.from_numpy(t_target).to(self.device)
+
+                predictions = model(x_tensor, x_tensor, t_tensor, t_t_tensor).detach().cpu().numpy()
+
+            start = 0
+
+            for request in requests:
+                request.result = predictions[start:start + request.size]
+                start += request.size
+        except Exception as e:
+            for request in requests:
+                request.error = "%s: %s" % (type(e).__name__, e)
+
+        for request in requests:
+            request.done.set()
+
+
+class InferenceClient:
+    """
+        InferenceClient sends the forward passes of a session to the InferenceServer.
+    """
+    connection: socket.socket  # Connection to the server
+
+    def __init__(self, socket_path: str, timeout: Union[None, float] = 10.):
+        """
+            Constructor
+        :param socket_path: Path of the Unix socket
+        :param timeout: Timeout of a request in seconds, default 10 seconds
+        """
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+
+        try:
+            self.connection.connect(socket_path)
+        except OSError:
+            self.connection.close()
+            raise
+
+    def predict(self, x: np.ndarray, t: np.ndarray, t_target: np.ndarray) -> np.ndarray:
+        """
+            This method runs the forward pass on the server.
+        :param x: Features (batch x INPUT_LENGTH x INPUT_FEATURE_SIZE)
+        :param t: Times (batch x INPUT_LENGTH x 1)
+        :param t_target: Target times (batch x horizon x 1)
+        :return: Predictions
+        """
+        send_arrays(self.connection, [x, t, t_target])
+
+        header, arrays = receive_arrays(self.connection)
+
+        if "error" in header:
+            raise RuntimeError("Inference server error: %s" % header["error"])
+
+        return arrays[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def connect(socket_path: Union[None, str]) -> Union[None, InferenceClient]:
+    """
+        This method connects to the inference server if it is running.
+    :param socket_path: Path of the Unix socket, None for in-process inference
+    :return: Client, or None if the server is not available
+    """
+    if socket_path is None or not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+
+    try:
+        return InferenceClient(socket_path)
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    from .NegoFormer import NegoFormer
+    from .model_store import get_shared_model, get_horizon_models
+
+    parser = argparse.ArgumentParser(description="Run the Autoformer model of NegoFormer as a local inference server.")
+    parser.add_argument("--socket", default="negoformer.sock", help="Path of the Unix socket. Default: 'negoformer.sock'")
+    parser.add_argument("--max_batch_size", type=int, default=64, help="Maximum number of candidates in a batch. Default: 64")
+    parser.add_argument("--latency_budget", type=float, default=0.005, help="Maximum waiting time for a batch in seconds. Default: 0.005")
+
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() and not NegoFormer.QUANTIZED else 'cpu')
+
+    model = get_shared_model(NegoFormer.INPUT_FEATURE_SIZE, NegoFormer.OUTPUT_LENGTH, device,
+                             NegoFormer.COMPILED_MODEL_PATH, NegoFormer.WEIGHTS_PATH, NegoFormer.QUANTIZED)
+
+    horizon_models = get_horizon_models(NegoFormer.INPUT_FEATURE_SIZE, NegoFormer.OUTPUT_LENGTH, device,
+                                        NegoFormer.COMPILED_MODEL_PATH, NegoFormer.WEIGHTS_PATH, NegoFormer.QUANTIZED,
+                                        NegoFormer.HORIZON_BUCKETS)
+
+    if NegoFormer.NUMBER_OF_THREADS is not None:
+        torch.set_num_threads(NegoFormer.NUMBER_OF_THREADS)
+
+    print("Inference server is listening on", args.socket)
+
+    InferenceServer(args.socket, model, device, args.max_batch_size, args.latency_budget, horizon_models).serve_forever()
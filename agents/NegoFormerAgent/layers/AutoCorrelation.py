@@ -22,43 +22,57 @@ class AutoCorrelation(nn.Module):
         self.mask_flag = mask_flag
         self.output_attention = output_attention
         self.dropout = nn.Dropout(attention_dropout)
+        self.init_indices = {}  # Cached time indices for each sequence length and device
+
+    def get_init_index(self, length, device):
+        """
+        Time indices (i.e., arange) of the given sequence length, cached on the first call
+        """
+        key = (length, str(device))
+
+        if key not in self.init_indices:
+            self.init_indices[key] = torch.arange(length, device=device)
+
+        return self.init_indices[key]
+
+    def time_delay_agg(self, values, delay, weights):
+        """
+        Batched time delay aggregation, i.e., the sum of roll(values, -delay[:, i], -1) * weights[:, i] over the top k
+        delays. The delays of each sample are scattered into a (length x length) delay matrix, so that the aggregation
+        of all delays is a single batched matrix multiplication.
+        """
+        batch, head, channel, length = values.shape
+        top_k = delay.shape[1]
+        # rows of the delayed time-steps, i.e., (t + delay) mod length
+        index = (self.get_init_index(length, values.device).view(1, 1, length) + delay.unsqueeze(-1)) % length
+        delay_matrix = torch.zeros(batch, length, length, dtype=values.dtype, device=values.device)\
+            .scatter_add(1, index, weights.unsqueeze(-1).expand(batch, top_k, length).contiguous())
+        delays_agg = torch.matmul(values.reshape(batch, head * channel, length), delay_matrix)
+        return delays_agg.view(batch, head, channel, length)
 
     def time_delay_agg_training(self, values, corr):
         """
         SpeedUp version of Autocorrelation (a batch-normalization style design)
         This is for the training phase.
         """
-        head = values.shape[1]
-        channel = values.shape[2]
+        batch = values.shape[0]
         length = values.shape[3]
         # find top k
         top_k = int(self.factor * math.log(length))
         mean_value = torch.mean(torch.mean(corr, dim=1), dim=1)
         index = torch.topk(torch.mean(mean_value, dim=0), top_k, dim=-1)[1]
-        weights = torch.stack([mean_value[:, index[i]] for i in range(top_k)], dim=-1)
+        weights = mean_value[:, index]
         # update corr
         tmp_corr = torch.softmax(weights, dim=-1)
-        # aggregation
-        tmp_values = values
-        delays_agg = torch.zeros_like(values).float()
-        for i in range(top_k):
-            pattern = torch.roll(tmp_values, -int(index[i]), -1)
-            delays_agg = delays_agg + pattern * \
-                         (tmp_corr[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length))
-        return delays_agg
+        # aggregation, the same delays for all samples
+        return self.time_delay_agg(values, index.unsqueeze(0).expand(batch, top_k), tmp_corr)
 
     def time_delay_agg_inference(self, values, corr):
         """
         SpeedUp version of Autocorrelation (a batch-normalization style design)
         This is for the inference phase.
         """
-        batch = values.shape[0]
-        head = values.shape[1]
-        channel = values.shape[2]
         length = values.shape[3]
-        # index init
-        init_index = torch.arange(length).unsqueeze(0).unsqueeze(0).unsqueeze(0)\
-            .repeat(batch, head, channel, 1).to(values.device)
         # find top k
         top_k = int(self.factor * math.log(length))
         mean_value = torch.mean(torch.mean(corr, dim=1), dim=1)
@@ -66,14 +80,7 @@ class AutoCorrelation(nn.Module):
         # update corr
         tmp_corr = torch.softmax(weights, dim=-1)
         # aggregation
-        tmp_values = values.repeat(1, 1, 1, 2)
-        delays_agg = torch.zeros_like(values).float()
-        for i in range(top_k):
-            tmp_delay = init_index + delay[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length)
-            pattern = torch.gather(tmp_values, dim=-1, index=tmp_delay)
-            delays_agg = delays_agg + pattern * \
-                         (tmp_corr[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length))
-        return delays_agg
+        return self.time_delay_agg(values, delay, tmp_corr)
 
     def time_delay_agg_full(self, values, corr):
         """
@@ -112,10 +119,13 @@ class AutoCorrelation(nn.Module):
             keys = keys[:, :L, :, :]
 
         # period-based dependencies
-        q_fft = torch.rfft(queries.permute(0, 2, 3, 1).contiguous(), signal_ndim=3)
-        k_fft = torch.rfft(keys.permute(0, 2, 3, 1).contiguous(), signal_ndim=3)
-        res = q_fft * torch.conj(k_fft)
-        corr = torch.irfft(res, signal_ndim=3)
+        # The legacy torch.rfft/irfft API (removed in PyTorch 1.8) represented the spectrum as a real tensor with a last
+        # dimension of (real, imaginary), and torch.conj of that real tensor was a no-op. Thus, the real and imaginary
+        # parts are multiplied element-wise (not as complex numbers) as in the trained models.
+        q_fft = torch.view_as_real(torch.fft.rfftn(queries.permute(0, 2, 3, 1).contiguous(), dim=(-3, -2, -1)))
+        k_fft = torch.view_as_real(torch.fft.rfftn(keys.permute(0, 2, 3, 1).contiguous(), dim=(-3, -2, -1)))
+        res = q_fft * k_fft
+        corr = torch.fft.irfftn(torch.view_as_complex(res), s=(H, E, L), dim=(-3, -2, -1))
 
         # time delay agg
         if self.training:
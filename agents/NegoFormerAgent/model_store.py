@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import pickle as pkl
+import warnings
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import torch
+from .Autoformer import Model
+from .quantization import quantize
+
+WEIGHTS_INDEX = "index.json"  # Index file of a weights directory
+
+# Process-level cache of the models, keyed by the source, the device and the quantization
+shared_models: Dict[Tuple[str, str, bool], torch.nn.Module] = {}
+
+
+def save_weights(state_dict: Dict[str, torch.Tensor], directory: str):
+    """
+        This method saves the state dictionary of a model into a weights directory, i.e., one .npy file for each tensor
+        and an index file. Unlike pickle, this format does not execute any code on loading, and it can be memory-mapped.
+    :param state_dict: State dictionary of the model
+    :param directory: Weights directory
+    :return: Nothing
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    index = {}
+
+    for i, (name, tensor) in enumerate(state_dict.items()):
+        file_name = "%d.npy" % i
+
+        array = tensor.detach().cpu().numpy()
+
+        np.save(os.path.join(directory, file_name), array, allow_pickle=False)
+
+        index[name] = {"file": file_name, "shape": list(array.shape), "dtype": str(array.dtype)}
+
+    with open(os.path.join(directory, WEIGHTS_INDEX), "w") as f:
+        json.dump(index, f, indent=1)
+
+
+def load_weights(directory: str) -> Dict[str, torch.Tensor]:
+    """
+        This method loads the tensors of a weights directory as copy-on-write memory maps. Thus, the weights are read
+        lazily, and their pages are shared by all processes that load the same directory.
+    :param directory: Weights directory
+    :return: State dictionary
+    """
+    with open(os.path.join(directory, WEIGHTS_INDEX), "r") as f:
+        index = json.load(f)
+
+    state_dict = {}
+
+    for name, entry in index.items():
+        array = np.load(os.path.join(directory, entry["file"]), mmap_mode="c", allow_pickle=False)
+
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            raise ValueError("Corrupted weights file for %s in %s" % (name, directory))
+
+        state_dict[name] = torch.from_numpy(array)
+
+    return state_dict
+
+
+def assign_weights(model: torch.nn.Module, state_dict: Dict[str, torch.Tensor]):
+    """
+        This method replaces the parameters of the model with the given tensors without copying them, so that the
+        memory-mapped weights stay shared. The parameters do not require gradients, i.e., only for inference.
+    :param model: Model
+    :param state_dict: State dictionary, e.g., from load_weights
+    :return: Nothing
+    """
+    parameters = dict(model.named_parameters())
+
+    if set(parameters.keys()) != set(state_dict.keys()):
+        raise ValueError("Weights do not match the parameters of the model.")
+
+    for name, tensor in state_dict.items():
+        if tensor.shape != parameters[name].shape:
+            raise ValueError("Shape mismatch for %s: %s != %s" % (name, tuple(tensor.shape), tuple(parameters[name].shape)))
+
+        *module_names, parameter_name = name.split(".")
+
+        module = model
+        for module_name in module_names:
+            module = getattr(module, module_name)
+
+        module._parameters[parameter_name] = torch.nn.Parameter(tensor, requires_grad=False)
+
+
+def prepare_model(model: torch.nn.Module, quantized: bool = False) -> torch.nn.Module:
+    """
+        This method prepares the eager model for inference, i.e., evaluation mode and optional quantization.
+    :param model: Eager Autoformer model
+    :param quantized: Whether the model is quantized dynamically (int8), only on CPU
+    :return: Model for inference
+    """
+    model.train(False)
+
+    if quantized:
+        model = quantize(model)
+
+    return model
+
+
+def get_compiled_model_path(compiled_model_path: str, quantized: bool = False) -> str:
+    """
+        This method provides the path of the TorchScript model for the quantization, e.g., 'model.quantized.pt' for the
+        quantized variant of 'model.pt'. Thus, the float and the quantized models are exported side by side, and the
+        float model is never loaded in place of the quantized one.
+    :param compiled_model_path: Path of the TorchScript model of the float model
+    :param quantized: Whether the model is quantized dynamically (int8)
+    :return: Path of the TorchScript model
+    """
+    if not quantized:
+        return compiled_model_path
+
+    root, extension = os.path.splitext(compiled_model_path)
+
+    return "%s.quantized%s" % (root, extension)
+
+
+def find_compiled_model(compiled_model_path: Union[None, str], quantized: bool = False) -> Union[None, str]:
+    """
+        This method finds the exported TorchScript model for the quantization, see get_compiled_model_path.
+    :param compiled_model_path: Path of the TorchScript model of the float model
+    :param quantized: Whether the model is quantized dynamically (int8)
+    :return: Path of the TorchScript model if it exists, otherwise None
+    """
+    if compiled_model_path is None:
+        return None
+
+    compiled_model_path = get_compiled_model_path(compiled_model_path, quantized)
+
+    return compiled_model_path if os.path.exists(compiled_model_path) else None
+
+
+def create_model(input_feature_size: int, output_length: int, device: torch.device,
+                 compiled_model_path: Union[None, str] = None, weights_path: Union[None, str] = None,
+                 quantized: bool = False) -> torch.nn.Module:
+    """
+        This method creates the model for inference from the first available source: the TorchScript model, the
+        weights directory, or the initial weights. The quantized model is loaded only from its own TorchScript model
+        (see get_compiled_model_path); otherwise, the eager model is quantized. If both the TorchScript model and the
+        weights directory exist, the weights are ignored with a warning.
+    :param input_feature_size: Number of the input features
+    :param output_length: Output length of the model
+    :param device: Target device
+    :param compiled_model_path: Path of the TorchScript model of the float model, see export_model.py
+    :param weights_path: Weights directory, see save_weights
+    :param quantized: Whether the model is quantized dynamically (int8), only on CPU
+    :return: Model in evaluation mode
+    """
+    has_weights = weights_path is not None and os.path.exists(os.path.join(weights_path, WEIGHTS_INDEX))
+
+    compiled_model_path = find_compiled_model(compiled_model_path, quantized)
+
+    if compiled_model_path is not None:
+        if has_weights:
+            warnings.warn("The TorchScript model %s is loaded, and the weights in %s are ignored."
+                          % (compiled_model_path, weights_path))
+
+        model = torch.jit.load(compiled_model_path, map_location=device)
+        model.train(False)
+
+        return model
+
+    model = Model(input_feature_size, output_length)
+
+    if has_weights:
+        assign_weights(model, load_weights(weights_path))
+
+    return prepare_model(model.to(device), quantized)
+
+
+def get_shared_model(input_feature_size: int, output_length: int, device: torch.device,
+                     compiled_model_path: Union[None, str] = None, weights_path: Union[None, str] = None,
+                     quantized: bool = False) -> torch.nn.Module:
+    """
+        This method provides the model for inference from the process-level cache, so that the model is created only
+        once in a process. Since the model is in evaluation mode and its forward pass has no side effect, all NegoFormer
+        instances in the process share it read-only. Calling this method before creating a process pool (with fork)
+        shares the model with the workers as copy-on-write. Otherwise, the workers still share the pages of the
+        memory-mapped weights.
+
+        See create_model for the parameters.
+    :return: Shared model in evaluation mode
+    """
+    key = (str(find_compiled_model(compiled_model_path, quantized) or weights_path), str(device), quantized)
+
+    if key not in shared_models:
+        shared_models[key] = create_model(input_feature_size, output_length, device, compiled_model_path,
+                                          weights_path, quantized)
+
+    return shared_models[key]
+
+
+def get_horizon_path(compiled_model_path: str, horizon: int) -> str:
+    """
+        This method provides the path of the TorchScript model traced for a truncated horizon, e.g., 'model_64.pt'.
+    :param compiled_model_path: Path of the TorchScript model of the full horizon
+    :param horizon: Truncated horizon
+    :return: Path of the TorchScript model of the horizon
+    """
+    root, extension = os.path.splitext(compiled_model_path)
+
+    return "%s_%d%s" % (root, horizon, extension)
+
+
+def get_horizon_models(input_feature_size: int, output_length: int, device: torch.device,
+                       compiled_model_path: Union[None, str] = None, weights_path: Union[None, str] = None,
+                       quantized: bool = False, horizons: List[int] = ()) -> Dict[int, torch.nn.Module]:
+    """
+        This method provides the shared models of the truncated horizons shorter than the output length. The eager
+        model supports any horizon. However, a TorchScript model is traced for a fixed horizon. Thus, only the
+        horizons whose TorchScript models are exported (see get_horizon_path and get_compiled_model_path) are provided.
+
+        See create_model for the other parameters.
+    :param horizons: Truncated horizons, e.g., [32, 64, 128]
+    :return: Models of the supported horizons
+    """
+    model = get_shared_model(input_feature_size, output_length, device, compiled_model_path, weights_path, quantized)
+
+    horizon_models = {}
+
+    for horizon in horizons:
+        if horizon >= output_length:
+            continue
+
+        if not isinstance(model, torch.jit.ScriptModule):
+            horizon_models[horizon] = model
+        elif find_compiled_model(get_horizon_path(compiled_model_path, horizon), quantized) is not None:
+            horizon_models[horizon] = get_shared_model(input_feature_size, output_length, device,
+                                                       get_horizon_path(compiled_model_path, horizon), None, quantized)
+
+    return horizon_models
+
+
+def clear_shared_models():
+    """
+        This method clears the process-level cache, e.g., after the weights are updated.
+    :return: Nothing
+    """
+    shared_models.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the pickled state dictionary of the Autoformer model into a weights directory.")
+    parser.add_argument("weights", help="Pickled state dictionary of the model (e.g., 'agents/NegoFormerAgent/model.pkl')")
+    parser.add_argument("--output", default="agents/NegoFormerAgent/weights", help="Output weights directory. Default: 'agents/NegoFormerAgent/weights'")
+
+    args = parser.parse_args()
+
+    with open(args.weights, "rb") as f:
+        save_weights(pkl.load(f), args.output)
+
+    print("Weights are saved into", args.output)
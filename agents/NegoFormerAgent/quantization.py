@@ -0,0 +1,86 @@
+import copy
+from typing import Set
+import torch
+import torch.nn as nn
+
+
+class PointwiseConv(nn.Module):
+    """
+        PointwiseConv is a Linear layer that replaces a Conv1d layer with kernel size 1 (e.g., the feed-forward blocks
+        of the encoder and decoder layers). They are mathematically identical; however, only Linear layers can be
+        quantized dynamically.
+    """
+    linear: nn.Linear  # Linear layer holding the weights of the convolution
+
+    def __init__(self, conv: nn.Conv1d):
+        """
+            Constructor
+        :param conv: Conv1d layer with kernel size 1
+        """
+        super(PointwiseConv, self).__init__()
+
+        self.linear = nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+
+        with torch.no_grad():
+            self.linear.weight.copy_(conv.weight[:, :, 0])
+
+            if conv.bias is not None:
+                self.linear.bias.copy_(conv.bias)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        :param x: Input as in Conv1d, i.e., (batch, channels, length)
+        :return: Output as in Conv1d, i.e., (batch, channels, length)
+        """
+        return self.linear(x.transpose(-1, 1)).transpose(-1, 1)
+
+
+def is_pointwise_conv(module: nn.Module) -> bool:
+    """
+        This method checks whether the given module is a Conv1d layer that can be replaced by PointwiseConv.
+    :param module: Module
+    :return: Whether it is a pointwise convolution, or not
+    """
+    return isinstance(module, nn.Conv1d) and module.kernel_size == (1,) and module.stride == (1,) and \
+        module.padding == (0,) and module.dilation == (1,) and module.groups == 1
+
+
+def convert_pointwise_convs(module: nn.Module):
+    """
+        This method replaces all pointwise convolutions in the given module with PointwiseConv layers, in place.
+    :param module: Module
+    :return: Nothing
+    """
+    for name, child in module.named_children():
+        if is_pointwise_conv(child):
+            setattr(module, name, PointwiseConv(child))
+        else:
+            convert_pointwise_convs(child)
+
+
+def get_quantizable_layers(model: nn.Module) -> Set[str]:
+    """
+        This method provides the names of the layers to quantize, i.e., the feed-forward blocks (PointwiseConv) of the
+        encoder and decoder layers. The projections of AutoCorrelationLayer are excluded, since the top-k delays of the
+        auto-correlation amplify their quantization errors. The time embedding and the final projection are excluded
+        as well, since they map directly from the inputs and into the outputs.
+    :param model: Autoformer model after convert_pointwise_convs
+    :return: Names of the Linear layers to quantize
+    """
+    return {name + ".linear" for name, module in model.named_modules() if isinstance(module, PointwiseConv)}
+
+
+def quantize(model: nn.Module) -> nn.Module:
+    """
+        This method generates a dynamically quantized (int8) copy of the Autoformer model for CPU inference. Only the
+        feed-forward blocks of the encoder and decoder layers are quantized (see get_quantizable_layers), the remaining
+        layers stay in float.
+    :param model: Autoformer model in evaluation mode
+    :return: Quantized model
+    """
+    model = copy.deepcopy(model).cpu()
+    model.train(False)
+
+    convert_pointwise_convs(model)
+
+    return torch.quantization.quantize_dynamic(model, get_quantizable_layers(model), dtype=torch.qint8)
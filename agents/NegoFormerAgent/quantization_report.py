@@ -0,0 +1,130 @@
+import argparse
+import glob
+import os
+import time
+from typing import List, Union
+import numpy as np
+import pandas as pd
+import torch
+import nenv
+from nenv.Preference import domain_loader
+from nenv.utils.SessionTrace import SessionTrace, TRACE_EXTENSION, AGENT_NAMES, parse_trace_name
+from .NegoFormer import NegoFormer
+from .TimeEstimator import TimeEstimator
+from .quantization import quantize
+from .export_model import load_eager_model
+from .replay import replay_offers, sample_candidates
+
+
+def compare_on_trace(trace_path: str, agent_no: str, model: torch.nn.Module, quantized_model: torch.nn.Module,
+                     number_of_candidates: int = 5, max_predictions: Union[None, int] = None, seed: int = 0) -> dict:
+    """
+        This method replays a recorded session from the perspective of the given agent. At each offer of the agent, the
+        float and the quantized models predict the slopes of the same candidates, i.e., the offered bid and randomly
+        selected bids.
+    :param trace_path: Binary session trace path
+    :param agent_no: Perspective of the replay, 'A' or 'B'
+    :param model: Float model
+    :param quantized_model: Quantized model
+    :param number_of_candidates: Number of candidates in each prediction, default 5
+    :param max_predictions: Maximum number of predictions, default None (i.e., no limit)
+    :param seed: Random seed for the candidates, default 0
+    :return: Comparison of the session
+    """
+    agent_a_name, agent_b_name, domain_name = parse_trace_name(trace_path)
+
+    pref_a, pref_b = domain_loader(domain_name)
+    preference = pref_a if agent_no == "A" else pref_b
+
+    trace = SessionTrace.load(trace_path)
+
+    random_state = np.random.RandomState(seed)
+
+    time_estimator = TimeEstimator()
+    opponent_model = nenv.OpponentModel.FrequencyWindowOpponentModel(preference)
+
+    negoformers = []
+
+    for m in [model, quantized_model]:
+        negoformer = NegoFormer(time_estimator, opponent_model)
+        negoformer.model = m
+
+        negoformers.append(negoformer)
+
+    slope_agreement, choice_agreement, squared_errors = [], [], []
+    elapsed_times = [[], []]
+
+    for _, is_received, t, bid in replay_offers(trace, agent_no, preference, negoformers):
+        if is_received or not negoformers[0].is_ready() or \
+                (max_predictions is not None and len(choice_agreement) >= max_predictions):
+            continue
+
+        candidates = sample_candidates(bid, preference, number_of_candidates, random_state)
+
+        slopes = []
+
+        for i, negoformer in enumerate(negoformers):
+            start_time = time.perf_counter()
+            slopes.append(negoformer.predict_batch(candidates, t))
+            elapsed_times[i].append(time.perf_counter() - start_time)
+
+        slope_agreement.extend([slope == quantized_slope for slope, quantized_slope in zip(*slopes)])
+        choice_agreement.append(int(np.argmin(slopes[0])) == int(np.argmin(slopes[1])))
+
+        for candidate in candidates:
+            predictions = negoformers[0].current_predictions[candidate]
+            quantized_predictions = negoformers[1].current_predictions[candidate]
+
+            squared_errors.extend([(predictions[key] - quantized_predictions[key]) ** 2 for key in predictions])
+
+    return {
+        "AgentA": agent_a_name,
+        "AgentB": agent_b_name,
+        "DomainID": domain_name,
+        "Perspective": agent_no,
+        "NumPrediction": len(choice_agreement),
+        "SlopeAgreement": float(np.mean(slope_agreement)) if len(slope_agreement) > 0 else None,
+        "ChoiceAgreement": float(np.mean(choice_agreement)) if len(choice_agreement) > 0 else None,
+        "MSE": float(np.mean(squared_errors)) if len(squared_errors) > 0 else None,
+        "FloatTime": float(np.mean(elapsed_times[0])) if len(elapsed_times[0]) > 0 else None,
+        "QuantizedTime": float(np.mean(elapsed_times[1])) if len(elapsed_times[1]) > 0 else None
+    }
+
+
+def generate_report(trace_paths: List[str], weights_path: Union[None, str] = None, **kwargs) -> pd.DataFrame:
+    """
+        This method compares the quantized model with the float model on the given recorded sessions from the
+        perspective of both agents.
+    :param trace_paths: List of binary session trace paths
+    :param weights_path: Path of the pickled state dictionary or the weights directory, None for the initial weights
+    :param kwargs: Arguments of compare_on_trace
+    :return: Report as DataFrame, one row for each session and perspective
+    """
+    model = load_eager_model(weights_path)
+    quantized_model = quantize(model)
+
+    rows = []
+
+    for trace_path in trace_paths:
+        for agent_no in AGENT_NAMES:
+            rows.append(compare_on_trace(trace_path, agent_no, model, quantized_model, **kwargs))
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the quantized Autoformer model of NegoFormer with the float model on the recorded sessions.")
+    parser.add_argument("session_dir", help="Directory of the recorded sessions (e.g., 'results/sessions/')")
+    parser.add_argument("--weights", default=None, help="Pickled state dictionary or weights directory of the model. Default: the initial weights")
+    parser.add_argument("--output", default="quantization_report.xlsx", help="Output path of the report. Default: 'quantization_report.xlsx'")
+    parser.add_argument("--max_predictions", type=int, default=None, help="Maximum number of predictions for each session")
+
+    args = parser.parse_args()
+
+    report = generate_report(sorted(glob.glob(os.path.join(args.session_dir, "*" + TRACE_EXTENSION))), args.weights,
+                             max_predictions=args.max_predictions)
+
+    report.to_excel(args.output, index=False)
+
+    print(report.to_string())
+    print("Speed-up: %.2f" % (report["FloatTime"].mean() / report["QuantizedTime"].mean()))
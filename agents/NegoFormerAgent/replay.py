@@ -0,0 +1,71 @@
+from typing import Iterator, List, Tuple
+import numpy as np
+import nenv
+from nenv.utils.SessionTrace import AGENT_NAMES, ACTION_CODES
+from .NegoFormer import NegoFormer
+
+
+def replay_offers(trace: np.ndarray, agent_no: str, preference: nenv.Preference,
+                  negoformers: List[NegoFormer]) -> Iterator[Tuple[int, bool, float, nenv.Bid]]:
+    """
+        This method replays the offers of a recorded session from the perspective of the given agent for the given
+        NegoFormer instances, which share the same opponent model and time estimator.
+
+        A received offer updates the opponent model, the time estimator and the histories before it is yielded. An
+        offer of the agent is yielded before it is appended to the histories, so that the caller can predict as in the
+        negotiation (i.e., the offered bid is a candidate).
+    :param trace: Recorded session in the layout of the binary session trace, see SessionTrace.TRACE_DTYPE
+    :param agent_no: Perspective of the replay, 'A' or 'B'
+    :param preference: Preferences of the agent
+    :param negoformers: NegoFormer instances sharing the opponent model and the time estimator
+    :return: Index of the offer (i.e., among the offers of the session), whether it is received, its time and its bid
+    with the utility for the agent
+    """
+    opponent_model, time_estimator = negoformers[0].opponent_model, negoformers[0].time_estimator
+
+    offers = np.asarray(trace["Action"]) == ACTION_CODES["Offer"]
+    bid_indices = np.asarray(trace["BidIndex"])[offers]
+    times = np.asarray(trace["Time"])[offers]
+    who = np.asarray(trace["Who"])[offers]
+
+    for i in range(len(bid_indices)):
+        t = float(times[i])
+
+        bid = preference.get_bid_by_index(int(bid_indices[i]))
+        bid.utility = preference.get_utility(bid)
+
+        if AGENT_NAMES[int(who[i])] != agent_no:  # Received bid
+            opponent_model.update(bid, t)
+            time_estimator.update(t)
+
+            for negoformer in negoformers:
+                negoformer.receive_bid(bid, t)
+
+            yield i, True, t, bid
+
+            continue
+
+        yield i, False, t, bid
+
+        for negoformer in negoformers:
+            negoformer.update(bid, t)
+
+
+def sample_candidates(bid: nenv.Bid, preference: nenv.Preference, number_of_candidates: int,
+                      random_state: np.random.RandomState) -> List[nenv.Bid]:
+    """
+        This method generates the candidates of a prediction in a replay, i.e., the offered bid and randomly selected
+        bids of the domain.
+    :param bid: Offered bid
+    :param preference: Preferences of the agent
+    :param number_of_candidates: Number of candidates, including the offered bid
+    :param random_state: Random state of the replay
+    :return: Candidate bids with the utilities for the agent
+    """
+    candidates = [bid] + [preference.get_bid_by_index(int(i))
+                          for i in random_state.randint(0, len(preference.bids), number_of_candidates - 1)]
+
+    for candidate in candidates:
+        candidate.utility = preference.get_utility(candidate)
+
+    return candidates
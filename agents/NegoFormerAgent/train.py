@@ -0,0 +1,202 @@
+import argparse
+import os
+import pickle as pkl
+import time
+from typing import Union
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Subset
+from .Autoformer import Model
+from .NegoFormer import NegoFormer
+from .dataset import load_dataset
+from .model_store import save_weights
+
+
+def masked_mse(predictions: torch.Tensor, targets: torch.Tensor, target_times: torch.Tensor) -> torch.Tensor:
+    """
+        This method calculates the mean squared error of the predicted opponent utilities (i.e., the last output
+        feature, as in NegoFormer) only on the used target times, i.e., the non-zero ones.
+    :param predictions: Model outputs (batch x OUTPUT_LENGTH x INPUT_FEATURE_SIZE)
+    :param targets: Target utilities (batch x OUTPUT_LENGTH)
+    :param target_times: Target times (batch x OUTPUT_LENGTH x 1)
+    :return: Mean squared error
+    """
+    mask = (target_times[:, :, 0] > 0.).float()
+
+    return torch.sum(((predictions[:, :, -1] - targets) ** 2) * mask) / torch.clamp(torch.sum(mask), min=1.)
+
+
+def run_epoch(model: Model, loader: DataLoader, optimizer: Union[None, torch.optim.Optimizer] = None,
+              on_step=None) -> float:
+    """
+        This method runs the model over the batches of the loader. If an optimizer is given, the model is trained;
+        otherwise, it is evaluated without gradient tracking.
+    :param model: Autoformer model
+    :param loader: DataLoader of the windows
+    :param optimizer: Optimizer, default None (i.e., evaluation)
+    :param on_step: Callback after each training step with the number of the completed batches, default None
+    :return: Mean loss of the batches
+    """
+    model.train(optimizer is not None)
+
+    losses = []
+
+    with torch.set_grad_enabled(optimizer is not None):
+        for step, (x, t, t_target, y) in enumerate(loader):
+            loss = masked_mse(model(x, x, t, t_target), y, t_target)
+
+            if optimizer is not None:
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+
+                if on_step is not None:
+                    on_step(step + 1)
+
+            losses.append(float(loss.detach()))
+
+    return float(np.mean(losses)) if len(losses) > 0 else float("nan")
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    """
+        This method saves the checkpoint via a temporary file, so that an interrupted save does not corrupt the
+        previous checkpoint.
+    :param checkpoint_path: Checkpoint path
+    :param checkpoint: Checkpoint, i.e., the model, the optimizer and the progress
+    :return: Nothing
+    """
+    torch.save(checkpoint, checkpoint_path + ".tmp")
+
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def train(dataset_dir: str, output_path: str = "agents/NegoFormerAgent/model.pkl", weights_path: Union[None, str] = None,
+          checkpoint_path: str = "checkpoint.pt", epochs: int = 10, batch_size: int = 32, learning_rate: float = 1e-4,
+          validation_ratio: float = 0.1, num_workers: int = 2, number_of_threads: Union[None, int] = None,
+          checkpoint_steps: Union[None, int] = None, seed: int = 0, true_utility: bool = False) -> pd.DataFrame:
+    """
+        This method trains the Autoformer model of NegoFormer on a dataset directory (see dataset.py) or a training set
+        store (see TrainingSetLogger.py). The windows are read from the chunks by the DataLoader workers, so the dataset
+        does not need to fit into memory.
+
+        The checkpoint is saved at the end of each epoch (and optionally, every checkpoint_steps batches). If the
+        checkpoint exists, the training resumes from it. Since the order of the windows in an epoch depends only on the
+        seed and the epoch, an interrupted epoch resumes from its next batch.
+
+        The weights of the best validation loss are saved as a pickled state dictionary, which NegoFormer.load_model
+        consumes, and optionally as a weights directory (see model_store.py).
+    :param dataset_dir: Dataset directory or training set store
+    :param output_path: Path of the pickled state dictionary, default 'agents/NegoFormerAgent/model.pkl'
+    :param weights_path: Weights directory, default None (i.e., not saved)
+    :param checkpoint_path: Checkpoint path, default 'checkpoint.pt'
+    :param epochs: Number of the epochs, default 10
+    :param batch_size: Batch size, default 32
+    :param learning_rate: Learning rate of Adam, default 1e-4
+    :param validation_ratio: Ratio of the windows for validation, default 0.1
+    :param num_workers: Number of the DataLoader workers, default 2
+    :param number_of_threads: Intra-op threads for CPU, None for the default of PyTorch
+    :param checkpoint_steps: Number of the batches between two checkpoints in an epoch, default None (i.e., only at
+    the end of each epoch)
+    :param seed: Random seed of the initial weights and the split, default 0
+    :param true_utility: Whether the targets are the utilities of the opponent's preferences instead of the estimated
+    ones, default False. For a dataset directory, it must match the one of build_dataset.
+    :return: Losses of the epochs
+    """
+    if number_of_threads is not None:
+        torch.set_num_threads(number_of_threads)
+
+    torch.manual_seed(seed)
+
+    dataset = load_dataset(dataset_dir, true_utility)
+
+    indices = np.random.RandomState(seed).permutation(len(dataset))
+    number_of_validation = int(len(dataset) * validation_ratio)
+    validation_indices, train_indices = indices[:number_of_validation], indices[number_of_validation:]
+
+    model = Model(NegoFormer.INPUT_FEATURE_SIZE, NegoFormer.OUTPUT_LENGTH)
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+
+    progress = {"epoch": 0, "step": 0, "best_loss": float("inf"), "history": []}
+
+    if os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location="cpu")
+
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        progress = checkpoint["progress"]
+        torch.set_rng_state(checkpoint["random_state"])
+
+        print("Resuming from epoch %d, step %d" % (progress["epoch"] + 1, progress["step"]))
+
+    def checkpoint_now():
+        save_checkpoint(checkpoint_path, {"model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                                          "progress": progress, "random_state": torch.get_rng_state()})
+
+    def on_step(step: int):
+        if checkpoint_steps is not None and step % checkpoint_steps == 0:
+            progress["step"] = start_step + step
+
+            checkpoint_now()
+
+    validation_loader = DataLoader(Subset(dataset, validation_indices.tolist()), batch_size=batch_size,
+                                   num_workers=num_workers)
+
+    for epoch in range(progress["epoch"], epochs):
+        start_time = time.time()
+
+        # The order of an epoch is reproducible, so that the completed batches are skipped on resume
+        order = train_indices[np.random.RandomState(seed + epoch + 1).permutation(len(train_indices))]
+        start_step = progress["step"]
+
+        train_loader = DataLoader(Subset(dataset, order[start_step * batch_size:].tolist()), batch_size=batch_size,
+                                  num_workers=num_workers)
+
+        train_loss = run_epoch(model, train_loader, optimizer, on_step)
+        validation_loss = run_epoch(model, validation_loader) if len(validation_indices) > 0 else train_loss
+
+        if validation_loss < progress["best_loss"]:
+            progress["best_loss"] = validation_loss
+
+            state_dict = {name: tensor.detach().cpu() for name, tensor in model.state_dict().items()}
+
+            with open(output_path, "wb") as f:
+                pkl.dump(state_dict, f)
+
+            if weights_path is not None:
+                save_weights(state_dict, weights_path)
+
+        progress["history"].append({"Epoch": epoch + 1, "TrainLoss": train_loss, "ValidationLoss": validation_loss,
+                                    "ElapsedTime": time.time() - start_time})
+        progress["epoch"] = epoch + 1
+        progress["step"] = 0
+
+        checkpoint_now()
+
+        print("Epoch %d - Train Loss: %.6f, Validation Loss: %.6f" % (epoch + 1, train_loss, validation_loss))
+
+    return pd.DataFrame(progress["history"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Autoformer model of NegoFormer on a dataset directory, see dataset.py.")
+    parser.add_argument("dataset_dir", help="Dataset directory or training set store (e.g., 'dataset/' or 'results/training_set/')")
+    parser.add_argument("--output", default="agents/NegoFormerAgent/model.pkl", help="Path of the pickled state dictionary. Default: 'agents/NegoFormerAgent/model.pkl'")
+    parser.add_argument("--weights", default=None, help="Weights directory to save (e.g., 'agents/NegoFormerAgent/weights'). Default: not saved")
+    parser.add_argument("--checkpoint", default="checkpoint.pt", help="Checkpoint path to save and resume. Default: 'checkpoint.pt'")
+    parser.add_argument("--epochs", type=int, default=10, help="Number of the epochs. Default: 10")
+    parser.add_argument("--batch_size", type=int, default=32, help="Batch size. Default: 32")
+    parser.add_argument("--learning_rate", type=float, default=1e-4, help="Learning rate. Default: 1e-4")
+    parser.add_argument("--num_workers", type=int, default=2, help="Number of the DataLoader workers. Default: 2")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for CPU. Default: the default of PyTorch")
+    parser.add_argument("--checkpoint_steps", type=int, default=None, help="Number of the batches between two checkpoints in an epoch. Default: only at the end of each epoch")
+    parser.add_argument("--true_utility", action="store_true", help="Use the utilities of the opponent's preferences as the targets instead of the estimated ones")
+
+    args = parser.parse_args()
+
+    history = train(args.dataset_dir, args.output, args.weights, args.checkpoint, args.epochs, args.batch_size,
+                    args.learning_rate, num_workers=args.num_workers, number_of_threads=args.threads,
+                    checkpoint_steps=args.checkpoint_steps, true_utility=args.true_utility)
+
+    print(history.to_string(index=False))
@@ -14,6 +14,9 @@ class ParetoEstimator:
     pareto: Union[None, List[nenv.BidPoint]]                        # List of pareto bids
     last_pareto_update: int                                         # Last update time in terms of round
     pareto_update_frequency: int                                    # Pareto update frequency
+    pareto_version: int                                             # Opponent model version of the pareto utilities
+    extracted_version: int                                          # Opponent model version of the last pareto extraction
+    pareto_window_size: float                                       # Window size of the last pareto extraction
 
     def __init__(self, preference: nenv.Preference, opponent_model: nenv.OpponentModel.AbstractOpponentModel, minimum_utility: float, update_frequency: int):
         self.preference = preference
@@ -25,6 +28,9 @@ class ParetoEstimator:
         self.pareto = None
         self.last_pareto_update = 0
         self.pareto_update_frequency = update_frequency
+        self.pareto_version = -1
+        self.extracted_version = -1
+        self.pareto_window_size = -1.
 
     def get_pareto(self, window_size: float) -> List[nenv.BidPoint]:
         """
@@ -33,11 +39,21 @@ class ParetoEstimator:
         :return: List of pareto bids
         """
         estimated_preference = self.opponent_model.preference
+        version = self.opponent_model.version
 
         if self.pareto is not None and self.last_pareto_update < self.pareto_update_frequency:
             self.last_pareto_update += 1
 
-            self.pareto = [nenv.BidPoint(b.bid, b.utility_a, estimated_preference.get_utility(b.bid)) for b in self.pareto]
+            if self.pareto_version != version:  # Re-estimate only if the opponent model is changed
+                self.pareto = [nenv.BidPoint(b.bid, b.utility_a, estimated_preference.get_utility(b.bid)) for b in self.pareto]
+                self.pareto_version = version
+
+            return self.pareto
+
+        if self.pareto is not None and self.extracted_version == version and self.pareto_window_size == window_size:
+            # Same estimated preferences and window size lead to the same pareto. Note that a re-estimated pareto of a
+            # newer version is not reused, since the extraction may select different bids.
+            self.last_pareto_update = 0
 
             return self.pareto
 
@@ -51,6 +67,9 @@ class ParetoEstimator:
 
         self.pareto = pareto_front
         self.last_pareto_update = 0
+        self.pareto_version = version
+        self.extracted_version = version
+        self.pareto_window_size = window_size
 
         return pareto_front
 
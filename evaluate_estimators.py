@@ -0,0 +1,113 @@
+import argparse
+import datetime
+import glob
+import math
+import os
+import sys
+import time
+import warnings
+from typing import List
+from nenv.Preference import domain_loader
+from nenv.SessionEstimator import replay_traces
+from nenv.utils import ExcelLog
+from nenv.utils.DynamicImport import load_logger_class, load_estimator_class
+from nenv.utils.SessionTrace import TRACE_EXTENSION, parse_trace_name
+
+if not sys.warnoptions:
+    warnings.simplefilter("ignore")
+
+# MoveAnalyzeLogger provides the real moves for the move-prediction confusion matrices of EstimatedLogger.
+DEFAULT_LOGGERS = ['MoveAnalyzeLogger', 'EstimatorMetricLogger', 'EstimatedLogger']
+
+
+def find_traces(session_dir: str) -> List[str]:
+    """
+        This method finds the binary session traces in the given directory. The 'sessions' directory of a tournament
+        result directory is also searched.
+    :param session_dir: Directory of the recorded sessions, or the result directory of a tournament
+    :return: Sorted list of trace paths
+    """
+    trace_paths = glob.glob(os.path.join(session_dir, "*" + TRACE_EXTENSION))
+
+    if len(trace_paths) == 0:
+        trace_paths = glob.glob(os.path.join(session_dir, "sessions", "*" + TRACE_EXTENSION))
+
+    return sorted(trace_paths)
+
+
+def evaluate_estimators(session_dir: str, estimator_classes: list, logger_classes: list, result_dir: str,
+                        processes: int = None):
+    """
+        This method replays every recorded session through every Estimator across a process pool, without running the
+        agents again. Then, it calls on_tournament_end of the loggers to extract the tournament-level analysis (e.g.,
+        RMSE, Spearman and Kendall curves, move-prediction confusion matrices).
+    :param session_dir: Directory of the recorded sessions, or the result directory of a tournament
+    :param estimator_classes: List of Estimator classes
+    :param logger_classes: List of logger classes
+    :param result_dir: The result directory that the logs will be created
+    :param processes: Number of processes. Default None, i.e., the number of CPUs.
+    :return: Nothing
+    """
+    trace_paths = find_traces(session_dir)
+
+    assert len(trace_paths) > 0, f"No session trace is found in {session_dir}."
+    assert os.path.abspath(result_dir) != os.path.abspath(session_dir), "The result directory must differ from the session directory."
+
+    if not os.path.exists(result_dir):
+        os.makedirs(result_dir)
+
+    start_time = time.time()
+
+    print(f'Started at {str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))}.')
+    print("Total session:", len(trace_paths))
+
+    rows = replay_traces(trace_paths, estimator_classes, logger_classes, result_dir, processes)
+
+    # Tournament log file
+    tournament_logs = ExcelLog(["TournamentResults"])
+
+    agent_names = []
+    domain_names = []
+
+    for trace_path, row in zip(trace_paths, rows):
+        tournament_logs.append(row)
+
+        agent_a, agent_b, domain_name = parse_trace_name(trace_path)
+
+        for name in [agent_a, agent_b]:
+            if name not in agent_names:
+                agent_names.append(name)
+
+        if domain_name not in domain_names:
+            domain_names.append(domain_name)
+
+    pref_a, _ = domain_loader(domain_names[0])
+    estimator_names = [estimator_class(pref_a).name for estimator_class in estimator_classes]
+
+    print("Replay has been done in", str(datetime.timedelta(seconds=math.ceil(time.time() - start_time))),
+          "- Please, wait for analysis...")
+
+    # On tournament end
+    for logger in [logger_class(result_dir) for logger_class in logger_classes]:
+        logger.on_tournament_end(tournament_logs, agent_names, domain_names, estimator_names)
+
+    tournament_logs.save(os.path.join(result_dir, "results.xlsx"))
+
+    print("Total Elapsed Time:", str(datetime.timedelta(seconds=math.ceil(time.time() - start_time))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate opponent models offline on the recorded negotiation sessions.")
+    parser.add_argument("session_dir", help="Directory of the recorded sessions (e.g., 'results/' or 'results/sessions/')")
+    parser.add_argument("estimators", nargs="+", help="Class names of the opponent models, from 'nenv.OpponentModel' module or full path to the class")
+    parser.add_argument("--loggers", nargs="+", default=DEFAULT_LOGGERS, help="Class names of the loggers. Default: %s" % " ".join(DEFAULT_LOGGERS))
+    parser.add_argument("--result_dir", default="evaluation_results/", help="Where the results will be logged. Default: 'evaluation_results/'")
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes. Default: the number of CPUs")
+
+    args = parser.parse_args()
+
+    evaluate_estimators(args.session_dir,
+                        [load_estimator_class(path) for path in args.estimators],
+                        [load_logger_class(path) for path in args.loggers],
+                        args.result_dir,
+                        args.processes)
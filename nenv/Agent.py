@@ -15,6 +15,7 @@ class AbstractAgent(ABC):
     last_received_bids: List[Bid]               # The history of received bids from the opponent
     estimators: List[AbstractOpponentModel]     # The list of Provided Estimators
     session_time: int                           # The maximum time (in terms of seconds) of the current session
+    background_compute: bool = False            # Whether the agent computes on background threads outside its timed processes
 
     def __init__(self, preference: Preference, session_time: int, estimators: List[AbstractOpponentModel]):
         """
@@ -52,6 +53,9 @@ class AbstractAgent(ABC):
             This method is called when a bid received from the opponent. This method add the received bid into the
             history. Then, it calls the receive_offer method.
 
+            Note: The provided estimators are updated by the session outside the timed processes of the agent, see
+            EstimatorUpdater.
+
             For the agent implementation, implement your strategy in receive_offer method instead of this method.
         :param bid: Received bid from the opponent
         :param t: Current negotiation time
@@ -62,9 +66,6 @@ class AbstractAgent(ABC):
 
         self.last_received_bids.append(_bid)
 
-        for estimator in self.estimators:
-            estimator.update(_bid, t)
-
         self.receive_offer(_bid, t)
 
     @abstractmethod
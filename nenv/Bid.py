@@ -28,6 +28,7 @@ class Bid:
     """
     content: Dict[Issue, str]  # Corresponding offer content as dictionary.
     utility: float             # Utility value of the bid. It may be unassigned (-1).
+    _index: Union[None, int]   # Cached index of the bid in the domain, see Preference.get_bid_index
 
     def __init__(self, content: dict, utility: float = -1):
         """
@@ -37,6 +38,7 @@ class Bid:
         """
         self.content = content
         self.utility = utility
+        self._index = None
 
     def __eq__(self, other: Union[int, float, Dict[Issue, str], object]):
         """
@@ -91,6 +93,7 @@ class Bid:
         :return: Nothing
         """
         self.content[key] = value
+        self._index = None
 
     def __hash__(self):
         """
@@ -165,7 +168,10 @@ class Bid:
         """
         :return: Copy of the Bid object with utility value.
         """
-        return Bid(self.content.copy(), self.utility)
+        bid = Bid(self.content.copy(), self.utility)
+        bid._index = self._index
+
+        return bid
 
     def copy(self):
         """
@@ -1,9 +1,10 @@
 import math
-import random
+from typing import List, Set, Union
 
-from scipy.stats import spearmanr, kendalltau
+import numpy as np
 
 from nenv.Bid import Bid
+from nenv.Issue import Issue
 from nenv.Preference import Preference
 from nenv.OpponentModel.EstimatedPreference import EstimatedPreference
 from abc import ABC, abstractmethod
@@ -16,6 +17,9 @@ class AbstractOpponentModel(ABC):
         predicted preferences of the opponent agent.
     """
     _pref: EstimatedPreference  # Estimated preference
+    _reference: Preference      # Reference preference, generally the agent's preference
+
+    TIE_BREAKING_SEED: int = 0  # Seed of the local random state that breaks the ties in calculate_error
 
     def __init__(self, reference: Preference):
         """
@@ -23,6 +27,7 @@ class AbstractOpponentModel(ABC):
         :param reference: Reference preference to get domain information. Generally, the agent's preference is given.
         """
         self._pref = EstimatedPreference(reference)
+        self._reference = reference
 
     @property
     @abstractmethod
@@ -43,6 +48,35 @@ class AbstractOpponentModel(ABC):
         """
         pass
 
+    def update_batch(self, bid_indices: np.ndarray, times: np.ndarray):
+        """
+            This method updates the estimation with many received bids in the order of receiving (e.g., replaying a
+            recorded session). By default, it calls the update method for each bid. The Estimators can override this
+            method with a vectorized implementation, which must reproduce the sequential result.
+        :param bid_indices: Indices of the received bids, see Preference.get_bid_index
+        :param times: Negotiation times of the received bids
+        :return: Nothing
+        """
+        for bid, t in zip(self.get_bids(bid_indices), times):
+            self.update(bid, float(t))
+
+    def get_bids(self, bid_indices: np.ndarray) -> List[Bid]:
+        """
+            This method generates the received bids from their indices. As in the negotiation session, the utility value
+            of each bid is assigned based on the reference preferences.
+        :param bid_indices: Indices of the received bids
+        :return: List of Bid objects
+        """
+        bids = []
+
+        for bid_index in bid_indices:
+            bid = self._reference.get_bid_by_index(int(bid_index))
+            bid.utility = self._reference.get_utility(bid)
+
+            bids.append(bid)
+
+        return bids
+
     @property
     def preference(self) -> EstimatedPreference:
         """
@@ -51,10 +85,29 @@ class AbstractOpponentModel(ABC):
         """
         return self._pref
 
+    @property
+    def version(self) -> int:
+        """
+            This method provides the version of the estimated preferences. The version increases only when the estimated
+            weights change. Therefore, the consumers can cache any result calculated from the estimated preferences
+            until the version changes.
+        :return: Monotonically increasing version
+        """
+        return self.preference.version
+
+    def changed_issues(self, since: int) -> Set[Issue]:
+        """
+            This method provides the issues whose estimated weights are changed after the given version.
+        :param since: Version of the last read
+        :return: Set of changed Issue objects
+        """
+        return self.preference.changed_issues(since)
+
     def calculate_error(self, org_pref: Preference,
                         return_rmse: bool = True,
                         return_spearman: bool = True,
-                        return_kendall_tau: bool = True) -> (float, float, float):
+                        return_kendall_tau: bool = True,
+                        sample_positions: Union[None, np.ndarray] = None) -> (float, float, float):
         """
             This method calculates the error of the estimated preferences for the performance evaluation of the opponent
             model. There metrics are used:
@@ -62,34 +115,85 @@ class AbstractOpponentModel(ABC):
             domain.
             - Spearman: The ranking correlation between real and estimated bid rankings in that domain.
             - Kendall-Tau: The ranking correlation between real and estimated bid rankings in that domain.
+
+            The ties in the estimated utilities are broken randomly with a local random state (see TIE_BREAKING_SEED),
+            so that the metrics are reproducible and the global random streams of the agents are not consumed. Since
+            both rankings are permutations without any ties, Spearman and Kendall-Tau are calculated in closed form. The skipped metrics are returned as 0.
+
+            If a bid sample is given, the metrics are calculated only on these bids instead of the whole bid space.
         :param org_pref: Original preferences of the opponent to compare
         :param return_rmse: Whether RMSE will be calculated, or not
         :param return_spearman: Whether Spearman will be calculated, or not
         :param return_kendall_tau: Whether Kendall-Tau will be calculated, or not
+        :param sample_positions: Positions of the sampled bids in `org_pref.bids` (not the bid indices of
+        Preference.get_bid_index). Default None, i.e., whole bid space.
         :returns: The metric results (i.e., RMSE, Spearman and Kendall-Tau) as a tuple
         """
-        estimated_pref = self.preference
+        rmse, spearman, kendall = 0., 0., 0.
 
-        bids = org_pref.bids
+        if not (return_rmse or return_spearman or return_kendall_tau):
+            return rmse, spearman, kendall
 
-        utilities = [[bid.utility, estimated_pref.get_utility(bid)] for bid in bids]
+        bid_codes = org_pref.bid_codes  # In descending order of the real utilities
 
-        rmse = 0.
+        if sample_positions is not None:
+            bid_codes = bid_codes[np.sort(sample_positions)]
+
+        estimated_utilities = self.preference.get_utilities(bid_codes)
 
         if return_rmse:
-            for utility in utilities:
-                rmse += math.pow(utility[0] - utility[1], 2.)
+            real_utilities = org_pref.get_utilities(bid_codes)
+
+            rmse = math.sqrt(np.mean(np.square(real_utilities - estimated_utilities)))
+
+        if not (return_spearman or return_kendall_tau):
+            return rmse, spearman, kendall
+
+        # Real ranks of the bids in descending order of the estimated utilities
+        shuffled_indices = np.random.RandomState(self.TIE_BREAKING_SEED).permutation(len(bid_codes))
+        agent_indices = shuffled_indices[np.argsort(-estimated_utilities[shuffled_indices], kind="stable")]
+
+        n = len(agent_indices)
+
+        if return_spearman:
+            differences = np.arange(n, dtype=np.float64) - agent_indices
+
+            spearman = 1. - 6. * np.dot(differences, differences) / (n * (n * n - 1.))
+
+        if return_kendall_tau:
+            kendall = 1. - 4. * count_inversions(agent_indices) / (n * (n - 1.))
+
+        return rmse, float(spearman), float(kendall)
+
+
+def count_inversions(permutation: np.ndarray) -> int:
+    """
+        This method counts the inversions (i.e., the pairs i < j where permutation[i] > permutation[j]) with a bottom-up
+        merge sort in O(n log n). Each level is processed for all blocks at once.
+    :param permutation: Permutation of [0, n)
+    :return: Number of inversions
+    """
+    values = np.asarray(permutation, dtype=np.int64)
+    n = len(values)
+    positions = np.arange(n)
+
+    inversions = 0
+    width = 1
 
-            rmse = math.sqrt(rmse / len(utilities))
+    while width < n:
+        blocks = positions // (2 * width)
+        keys = values + blocks * n  # Keys of different blocks do not overlap
 
-        org_indices = list(range(len(bids)))
-        agent_indices = list(range(len(bids)))
+        is_right = (positions // width) % 2 == 1
 
-        random.shuffle(agent_indices)
+        left_keys = keys[~is_right]  # Sorted, since each half is sorted in the previous level
+        right_keys = keys[is_right]
 
-        agent_indices = sorted(agent_indices, key=lambda i: utilities[i][1], reverse=True)
+        # For each element in a right half, the number of greater elements in the left half of the same block
+        left_ends = np.searchsorted(left_keys, (blocks[is_right] + 1) * n, side="left")
+        inversions += int(np.sum(left_ends - np.searchsorted(left_keys, right_keys, side="right")))
 
-        spearman, _ = spearmanr(org_indices, agent_indices) if return_spearman else [0., 0.]
-        kendall, _ = kendalltau(org_indices, agent_indices) if return_kendall_tau else [0., 0.]
+        values = np.sort(keys, kind="stable") - blocks * n
+        width *= 2
 
-        return rmse, spearman, kendall
+    return inversions
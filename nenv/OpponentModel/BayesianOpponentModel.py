@@ -1,5 +1,7 @@
 import math
+from typing import List, Set, Tuple
 
+import numpy as np
 from nenv.OpponentModel.AbstractOpponentModel import AbstractOpponentModel
 from nenv.OpponentModel.EstimatedPreference import EstimatedPreference, Preference
 from nenv.Bid import Bid
@@ -7,206 +9,216 @@ from nenv.Issue import Issue
 
 
 class BayesianOpponentModel(AbstractOpponentModel):
-    fWeightHyps: list
-    fEvaluatorHyps: list
+    """
+        Bayesian Opponent Model. The probabilities of the weight and the evaluation hypotheses are held in NumPy matrices
+        (issues x hypotheses), and the normalized evaluations of the hypotheses are precomputed.
+
+        Note: All sums are accumulated sequentially (i.e., np.cumsum) and the Gaussian is calculated by math.exp to keep
+        the posteriors identical to the original scalar implementation.
+    """
+    fWeightHyps: np.ndarray          # Weights of the weight hypotheses
+    fWeightProbs: np.ndarray         # Probabilities of the weight hypotheses (issues x weight hypotheses)
+    fEvaluatorProbs: np.ndarray      # Probabilities of the evaluation hypotheses (issues x max. evaluation hypotheses)
+    fEvaluationTable: np.ndarray     # Normalized evaluations (issues x max. evaluation hypotheses x max. values)
+    fEvaluationDiagonal: np.ndarray  # Normalized evaluation of the j-th value for the j-th hypothesis (issues x values)
+    fNumberOfEvaluatorHyps: List[int]  # Number of evaluation hypotheses of each issue
     fPreviousBidUtility: float
     issues: list
-    fExpectedWeight: list
+    fValueIndices: List[dict]        # Index of each value for each issue
+    fExpectedWeight: np.ndarray
     fBiddingHistory: list
+    fSeenBids: Set[Tuple[int, ...]]  # Value indices of the received bids
+    fPreferenceSynced: bool          # Whether the estimated preferences reflect the last update
 
     def __init__(self, reference: Preference):
         super().__init__(reference)
 
         self.fPreviousBidUtility = 1.
         self.fBiddingHistory = []
+        self.fSeenBids = set()
+        self.fPreferenceSynced = False
         self.issues = reference.issues
-        self.fExpectedWeight = [self._pref[issue] for issue in self.issues]
+        self.fValueIndices = [{value: j for j, value in enumerate(issue.values)} for issue in self.issues]
 
         self.initWeightHyps()
+        self.initEvaluatorHyps()
 
-        self.fEvaluatorHyps = []
+        self.fExpectedWeight = self.getExpectedWeights()
 
-        for i in range(len(self.issues)):
-            lEvalHyps = []
+    def initWeightHyps(self):
+        lWeightHypsNumber = 11
 
-            self.fEvaluatorHyps.append(lEvalHyps)
+        self.fWeightHyps = np.array([j / (lWeightHypsNumber - 1) for j in range(lWeightHypsNumber)])
 
-            issue = self.issues[i]
+        lProbs = [(1. - (j + 1) / lWeightHypsNumber) ** 3 for j in range(lWeightHypsNumber)]
 
-            lDiscreteEval = {}
+        lN = 0
 
-            for j in range(len(issue.values)):
-                lDiscreteEval[issue.values[j]] = 1000 * j + 1
+        for j in range(lWeightHypsNumber):
+            lN += lProbs[j]
 
-            lEvalHyps.append({"Prob": 1. / 3, "Desc": "uphill", "DiscreteEval": lDiscreteEval})
+        lProbs = [lProb / lN for lProb in lProbs]
 
-            lDiscreteEval = {}
+        self.fWeightProbs = np.array([lProbs for _ in self.issues])
 
-            for j in range(len(issue.values)):
-                lDiscreteEval[issue.values[j]] = 1000 * (len(issue.values) - j - 1) + 1
+    def initEvaluatorHyps(self):
+        lEvaluatorHyps = []
 
-            lEvalHyps.append({"Prob": 1. / 3, "Desc": "downhill", "DiscreteEval": lDiscreteEval})
+        for issue in self.issues:
+            lEvalHyps = []
+
+            lEvalHyps.append([1000 * j + 1 for j in range(len(issue.values))])  # Uphill
+            lEvalHyps.append([1000 * (len(issue.values) - j - 1) + 1 for j in range(len(issue.values))])  # Downhill
 
             if len(issue.values) > 2:
                 lTotalTriangularFns = len(issue.values) - 1
 
                 for k in range(1, lTotalTriangularFns):
-                    lDiscreteEval = {}
+                    lDiscreteEval = []
 
                     for j in range(len(issue.values)):
                         if j < k:
-                            lDiscreteEval[issue.values[j]] = 1000 * j / k
+                            lDiscreteEval.append(1000 * j / k)
                         else:
-                            lDiscreteEval[issue.values[j]] = 1000 * (len(issue.values) - j - 1) / (
-                                        len(issue.values) - k - 1) + 1
+                            lDiscreteEval.append(1000 * (len(issue.values) - j - 1) / (len(issue.values) - k - 1) + 1)
 
-                    lEvalHyps.append({"Prob": 0, "Desc": "triangular%d" % k, "DiscreteEval": lDiscreteEval})
+                    lEvalHyps.append(lDiscreteEval)
 
-            for eval in lEvalHyps:
-                eval["Prob"] = 1. / len(lEvalHyps)
+            lEvaluatorHyps.append(lEvalHyps)
 
-        for i in range(len(self.fExpectedWeight)):
-            self.fExpectedWeight[i] = self.getExpectedWeight(i)
+        self.fNumberOfEvaluatorHyps = [len(lEvalHyps) for lEvalHyps in lEvaluatorHyps]
 
-    def initWeightHyps(self):
-        self.fWeightHyps = []
-        lWeightHypsNumber = 11
-
-        for i in range(len(self.issues)):
-            lWeightHyps = []
-
-            for j in range(lWeightHypsNumber):
-                lHyp = {}
-                lHyp["Prob"] = (1. - (j + 1) / lWeightHypsNumber) ** 3
-                lHyp["Weight"] = j / (lWeightHypsNumber - 1)
-                lWeightHyps.append(lHyp)
+        max_hyps = max(self.fNumberOfEvaluatorHyps)
+        max_values = max([len(issue.values) for issue in self.issues])
 
-            lN = 0
+        self.fEvaluatorProbs = np.zeros((len(self.issues), max_hyps))
+        self.fEvaluationTable = np.zeros((len(self.issues), max_hyps, max_values))
+        self.fEvaluationDiagonal = np.zeros((len(self.issues), max_values))
 
-            for j in range(lWeightHypsNumber):
-                lN += lWeightHyps[j]["Prob"]
+        for i, lEvalHyps in enumerate(lEvaluatorHyps):
+            self.fEvaluatorProbs[i, :len(lEvalHyps)] = 1. / len(lEvalHyps)
 
-            for j in range(lWeightHypsNumber):
-                lWeightHyps[j]["Prob"] /= lN
+            for j, lDiscreteEval in enumerate(lEvalHyps):
+                self.fEvaluationTable[i, j, :len(lDiscreteEval)] = [self.get_expected_eval(lDiscreteEval, value)
+                                                                    for value in range(len(lDiscreteEval))]
 
-            self.fWeightHyps.append(lWeightHyps)
+            for j in range(len(self.issues[i].values)):
+                self.fEvaluationDiagonal[i, j] = self.fEvaluationTable[i, j, j]
 
-    def conditionalDistribution(self, pUtility: float, pPreviousBidUtility: float) -> float:
+    def conditionalDistribution(self, pUtility: np.ndarray, pPreviousBidUtility: float) -> np.ndarray:
         lSigma = 0.25
-        x = (pPreviousBidUtility - pUtility) / pPreviousBidUtility
-        lResult = 1.0 / (lSigma * math.sqrt(2 * math.pi)) * math.exp(-(x * x) / (2. * lSigma * lSigma))
+        x = (pPreviousBidUtility - np.asarray(pUtility, dtype=np.float64)) / pPreviousBidUtility
+        lExponent = -(x * x) / (2. * lSigma * lSigma)
+        lResult = 1.0 / (lSigma * math.sqrt(2 * math.pi)) * np.array([math.exp(e) for e in lExponent.ravel()])
 
-        return lResult
+        return lResult.reshape(lExponent.shape)
 
-    def getExpectedEvaluationValue(self, pBid: Bid, pIssueNumber: int) -> float:
-        lExpectedEval = 0.
+    def get_value_codes(self, pBid: Bid) -> np.ndarray:
+        """
+        :param pBid: Bid
+        :return: Value index of the bid for each issue
+        """
+        return np.array([self.fValueIndices[i][pBid[issue]] for i, issue in enumerate(self.issues)])
+
+    def getExpectedEvaluationValues(self, pCodes: np.ndarray) -> np.ndarray:
+        """
+        :param pCodes: Value indices of the bid
+        :return: Expected evaluation of the bid for each issue
+        """
+        lEvals = self.fEvaluationTable[np.arange(len(self.issues)), :, pCodes]
 
-        for j in range(len(self.fEvaluatorHyps[pIssueNumber])):
-            lExpectedEval = lExpectedEval + self.fEvaluatorHyps[pIssueNumber][j]["Prob"] * \
-                            self.get_expected_eval(self.fEvaluatorHyps[pIssueNumber][j]["DiscreteEval"],
-                                                   pBid[self.issues[pIssueNumber]])
+        return np.cumsum(self.fEvaluatorProbs * lEvals, axis=1)[:, -1]
 
-        return lExpectedEval
+    def getExpectedEvaluationValue(self, pBid: Bid, pIssueNumber: int) -> float:
+        return float(self.getExpectedEvaluationValues(self.get_value_codes(pBid))[pIssueNumber])
 
-    def get_expected_eval(self, discrete_eval: dict, value_name: str) -> float:
-        max_value = max(discrete_eval.values())
+    @staticmethod
+    def get_expected_eval(discrete_eval: list, value: int) -> float:
+        max_value = max(discrete_eval)
         if max_value < 0.00001:
             return 0.
 
-        return discrete_eval[value_name] / max_value
+        return discrete_eval[value] / max_value
+
+    def getExpectedWeights(self) -> np.ndarray:
+        """
+        :return: Expected weight of each issue
+        """
+        return np.cumsum(self.fWeightProbs * self.fWeightHyps, axis=1)[:, -1]
 
     def getExpectedWeight(self, pIssueNumber: int) -> float:
-        lExpectedWeight = 0.
+        return float(self.getExpectedWeights()[pIssueNumber])
 
-        for i in range(len(self.fWeightHyps[pIssueNumber])):
-            lExpectedWeight += self.fWeightHyps[pIssueNumber][i]["Prob"] * self.fWeightHyps[pIssueNumber][i]["Weight"]
+    def getPartialUtilities(self, pTerms: np.ndarray) -> np.ndarray:
+        """
+            This method calculates the partial utility for each issue, i.e., the sum of the expected weight x expected
+            evaluation terms of the other issues.
+        :param pTerms: Expected weight x expected evaluation of each issue
+        :return: Partial utility for each issue
+        """
+        lTerms = np.tile(pTerms, (len(pTerms), 1))
+        np.fill_diagonal(lTerms, 0.)
 
-        return lExpectedWeight
+        return np.cumsum(lTerms, axis=1)[:, -1]
 
     def getPartialUtility(self, pBid: Bid, pIssueIndex: int) -> float:
-        u = 0
-
-        for j in range(len(self.issues)):
-            if pIssueIndex == j:
-                continue
-
-            w = 0.
-
-            for k in range(len(self.fWeightHyps[j])):
-                w += self.fWeightHyps[j][k]["Prob"] * self.fWeightHyps[j][k]["Weight"]
+        lTerms = self.getExpectedWeights() * self.getExpectedEvaluationValues(self.get_value_codes(pBid))
 
-            u += w * self.getExpectedEvaluationValue(pBid, j)
-
-        return u
+        return float(self.getPartialUtilities(lTerms)[pIssueIndex])
 
     def updateWeights(self):
-        lBid = self.fBiddingHistory[-1]
-        lWeightHyps = []
-
-        for i in range(len(self.fWeightHyps)):
-            lTmp = []
-
-            for j in range(len(self.fWeightHyps[i])):
-                lHyp = {"Weight": self.fWeightHyps[i][j]["Weight"], "Prob": self.fWeightHyps[i][j]["Prob"]}
-                lTmp.append(lHyp)
-
-            lWeightHyps.append(lTmp)
+        lCodes = self.get_value_codes(self.fBiddingHistory[-1])
 
-        for j in range(len(self.issues)):
-            lN = 0.
-            lUtility = 0.
+        lExpectedEvals = self.getExpectedEvaluationValues(lCodes)
+        lPartialUtilities = self.getPartialUtilities(self.getExpectedWeights() * lExpectedEvals)
 
-            for i in range(len(self.fWeightHyps[j])):
-                lUtility = self.fWeightHyps[j][i]["Weight"] * self.getExpectedEvaluationValue(lBid, j)
-                lUtility += self.getPartialUtility(lBid, j)
+        lUtility = self.fWeightHyps[np.newaxis, :] * lExpectedEvals[:, np.newaxis]
+        lUtility += lPartialUtilities[:, np.newaxis]
 
-                lN += self.fWeightHyps[j][i]["Prob"] * self.conditionalDistribution(lUtility, self.fPreviousBidUtility)
+        lProbs = self.fWeightProbs * self.conditionalDistribution(lUtility, self.fPreviousBidUtility)
+        lN = np.cumsum(lProbs, axis=1)[:, -1]
 
-            for i in range(len(self.fWeightHyps[j])):
-                lUtility = self.fWeightHyps[j][i]["Weight"] * self.getExpectedEvaluationValue(lBid, j)
-                lUtility += self.getPartialUtility(lBid, j)
+        self.fWeightProbs = lProbs / (lN[:, np.newaxis] + 1e-12)
 
-                lWeightHyps[j][i]["Prob"] = self.fWeightHyps[j][i]["Prob"] * self.conditionalDistribution(lUtility,
-                                                                                                          self.fPreviousBidUtility) / (lN + 1e-12)
+    def updateEvaluationFns(self):
+        """
+            The evaluation hypotheses are updated issue by issue. The partial utility of an issue is calculated with the
+            already updated evaluation hypotheses of the previous issues.
 
-        self.fWeightHyps = lWeightHyps
+            Note: The utility of j-th evaluation hypothesis is calculated with the j-th value of the issue.
+        :return: Nothing
+        """
+        lCodes = self.get_value_codes(self.fBiddingHistory[-1])
 
-    def updateEvaluationFns(self):
-        lBid = self.fBiddingHistory[-1]
+        lExpectedWeights = self.getExpectedWeights()
+        lExpectedEvals = self.getExpectedEvaluationValues(lCodes)
 
-        lEvaluatorHyps = self.fEvaluatorHyps.copy()
+        for i in range(len(self.issues)):
+            lHypsNumber = self.fNumberOfEvaluatorHyps[i]
 
-        for i in range(len(self.fEvaluatorHyps)):
-            lN = 0.
+            lTerms = lExpectedWeights * lExpectedEvals
+            lTerms[i] = 0.
+            lPartialUtility = np.cumsum(lTerms)[-1]
 
-            for j in range(len(self.fEvaluatorHyps[i])):
-                lHyp = self.fEvaluatorHyps[i][j]
+            lUtility = lPartialUtility + lExpectedWeights[i] * self.fEvaluationDiagonal[i, :lHypsNumber]
 
-                lN += lHyp["Prob"] * self.conditionalDistribution(self.getPartialUtility(lBid, i) +
-                                                                  self.getExpectedWeight(i) *
-                                                                  self.get_expected_eval(lHyp["DiscreteEval"],
-                                                                                         self.issues[i].values[j]),
-                                                                  self.fPreviousBidUtility)
-            for j in range(len(self.fEvaluatorHyps[i])):
-                lHyp = self.fEvaluatorHyps[i][j]
-                lEvaluatorHyps[i][j]["Prob"] = lHyp["Prob"] * self.conditionalDistribution(
-                    self.getPartialUtility(lBid, i) +
-                    self.getExpectedWeight(i) *
-                    self.get_expected_eval(lHyp["DiscreteEval"], self.issues[i].values[j]),
-                    self.fPreviousBidUtility)
+            lProbs = self.fEvaluatorProbs[i, :lHypsNumber] * self.conditionalDistribution(lUtility,
+                                                                                         self.fPreviousBidUtility)
+            lN = np.cumsum(lProbs)[-1]
 
-                lEvaluatorHyps[i][j]["Prob"] /= (lN + 1e-12)
+            self.fEvaluatorProbs[i, :lHypsNumber] = lProbs / (lN + 1e-12)
 
-        self.fEvaluatorHyps = lEvaluatorHyps
+            lExpectedEvals[i] = np.cumsum(self.fEvaluatorProbs[i] * self.fEvaluationTable[i, :, lCodes[i]])[-1]
 
     def haveSeenBefore(self, pBid: Bid) -> bool:
-        return pBid in self.fBiddingHistory
+        return tuple(self.get_value_codes(pBid)) in self.fSeenBids
 
     def update(self, bid: Bid, t: float):
         if self.haveSeenBefore(bid):
             return
 
         self.fBiddingHistory.append(bid)
+        self.fSeenBids.add(tuple(self.get_value_codes(bid)))
 
         if len(self.fBiddingHistory) > 1:
             self.updateWeights()
@@ -216,18 +228,13 @@ class BayesianOpponentModel(AbstractOpponentModel):
 
         self.fPreviousBidUtility -= 0.003
 
-        for i in range(len(self.fExpectedWeight)):
-            self.fExpectedWeight[i] = self.getExpectedWeight(i)
+        self.fExpectedWeight = self.getExpectedWeights()
+        self.fPreferenceSynced = False
 
     def getExpectedUtility(self, bid: Bid) -> float:
-        u = 0.
-
-        for j in range(len(self.issues)):
-            w = self.fExpectedWeight[j]
+        lTerms = self.fExpectedWeight * self.getExpectedEvaluationValues(self.get_value_codes(bid))
 
-            u = u + w * self.getExpectedEvaluationValue(bid, j)
-
-        return u
+        return float(np.cumsum(lTerms)[-1])
 
     @property
     def name(self) -> str:
@@ -243,11 +250,16 @@ class BayesianOpponentModel(AbstractOpponentModel):
 
     @property
     def preference(self) -> EstimatedPreference:
+        if self.fPreferenceSynced:  # Nothing changed since the last read
+            return self._pref
+
+        self.fPreferenceSynced = True
+
         for i, issue in enumerate(self.issues):
-            self._pref[issue] = self.fExpectedWeight[i]
+            self._pref[issue] = float(self.fExpectedWeight[i])
 
             for j, value in enumerate(issue.values):
-                self._pref[issue, value] = self.get_expected_eval(self.fEvaluatorHyps[i][j]["DiscreteEval"], value)
+                self._pref[issue, value] = float(self.fEvaluationDiagonal[i, j])
 
         self._pref.normalize()
 
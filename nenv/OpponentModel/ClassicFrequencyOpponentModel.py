@@ -2,6 +2,7 @@ from typing import List
 from nenv.OpponentModel.AbstractOpponentModel import AbstractOpponentModel
 from nenv.Preference import Preference
 from nenv.Bid import Bid
+import numpy as np
 
 
 class ClassicFrequencyOpponentModel(AbstractOpponentModel):
@@ -43,6 +44,44 @@ class ClassicFrequencyOpponentModel(AbstractOpponentModel):
 
         self.update_weights()
 
+    def update_batch(self, bid_indices: np.ndarray, times: np.ndarray):
+        """
+            This method accumulates the value and issue counters of all received bids sequentially (i.e., np.add.at
+            and np.add.accumulate). Therefore, the result is identical to the sequential updates.
+        :param bid_indices: Indices of the received bids
+        :param times: Negotiation times of the received bids
+        :return: Nothing
+        """
+        times = np.asarray(times, dtype=np.float64)
+        bid_codes = self._pref.get_bid_codes(bid_indices)
+
+        if len(bid_codes) == 0:
+            return
+
+        # Value indices of the previous bids
+        if len(self.opponent_bids) > 0:
+            previous_codes = self._pref.get_bid_codes([self._pref.get_bid_index(self.opponent_bids[-1])])
+        else:
+            previous_codes = np.full((1, len(self._pref.issues)), -1, dtype=np.int64)
+
+        previous_codes = np.concatenate([previous_codes, bid_codes[:-1]], axis=0)
+
+        self.opponent_bids.extend(self.get_bids(bid_indices))
+
+        for i, issue in enumerate(self._pref.issues):
+            value_counts = np.array([self.value_counts[issue][value] for value in issue.values])
+            np.add.at(value_counts, bid_codes[:, i], 1.)
+
+            for j, value in enumerate(issue.values):
+                self.value_counts[issue][value] = float(value_counts[j])
+
+            issue_counts = np.where(bid_codes[:, i] == previous_codes[:, i], self.alpha * (1. - times), 0.)
+            issue_counts = np.add.accumulate(np.concatenate([[self.issue_counts[issue]], issue_counts]))
+
+            self.issue_counts[issue] = float(issue_counts[-1])
+
+        self.update_weights()
+
     def update_weights(self):
         sum_issues = sum(self.issue_counts.values())
 
@@ -1,3 +1,6 @@
+from typing import Dict, Set, Union
+import numpy as np
+from nenv.Bid import Bid
 from nenv.Preference import Preference
 from nenv.Issue import Issue
 
@@ -6,7 +9,19 @@ class EstimatedPreference(Preference):
     """
         Preference object is mutual. Thus, Opponent Models (i.e., Estimators) generate EstimatedPreference object which
         enable to change Issue and Value weights.
+
+        Each actual change of a weight increases the version. Thus, the consumers can check whether the weights are
+        changed since their last read, and which issues are changed.
+
+        The estimated utilities are memoized by bid index until the version changes. Thus, scoring the same bid
+        repeatedly with the same weights costs only an array lookup.
     """
+    version: int                          # Monotonically increasing version of the weights
+    _issue_versions: Dict[Issue, int]     # The version of the last change for each issue
+    _utilities: Union[None, np.ndarray]   # Memoized utilities indexed by bid index, NaN if not calculated yet
+    _utilities_version: int               # The version of the memoized utilities
+    _index_multipliers: np.ndarray        # Multipliers to convert value indices into bid indices
+
     def __init__(self, reference: Preference):
         """
             Constructor
@@ -14,6 +29,15 @@ class EstimatedPreference(Preference):
         """
         super(EstimatedPreference, self).__init__(reference.profile_json_path, generate_bids=False)
 
+        self.version = 0
+        self._issue_versions = {issue: 0 for issue in self.issues}
+
+        self._utilities = None
+        self._utilities_version = -1
+
+        number_of_values = [len(issue.values) for issue in self.issues]
+        self._index_multipliers = np.array([int(np.prod(number_of_values[i + 1:])) for i in range(len(number_of_values))], dtype=np.int64)
+
         for issue in self._issue_weights.keys():
             self._issue_weights[issue] = 1. - reference.issue_weights[issue]
 
@@ -48,9 +72,57 @@ class EstimatedPreference(Preference):
             :return: Weight of Issue or Value
             """
         if isinstance(key, tuple) and len(key) == 2:
-            self._value_weights[key[0]][key[1]] = weight
+            self.set_value_weight(key[0], key[1], weight)
         else:
-            self._issue_weights[key] = weight
+            self.set_issue_weight(key, weight)
+
+    def _get_memoized_utilities(self) -> np.ndarray:
+        """
+            This method provides the memoized utilities. It resets the memoized utilities if the weights are changed.
+        :return: Memoized utilities indexed by bid index
+        """
+        if self._utilities is None:
+            self._utilities = np.full(int(np.prod([len(issue.values) for issue in self.issues])), np.nan)
+            self._utilities_version = self.version
+        elif self._utilities_version != self.version:
+            self._utilities.fill(np.nan)
+            self._utilities_version = self.version
+
+        return self._utilities
+
+    def get_utility(self, bid: Bid) -> float:
+        """
+            This method calculates the utility value of a given bid. The result is memoized until the weights change.
+        :param bid: Target bid
+        :return: Utility value of the bid
+        """
+        utilities = self._get_memoized_utilities()
+
+        index = self.get_bid_index(bid)
+        utility = utilities[index]
+
+        if utility != utility:  # NaN, not calculated yet
+            utility = super(EstimatedPreference, self).get_utility(bid)
+            utilities[index] = utility
+
+        return float(utility)
+
+    def get_utilities(self, bid_codes: np.ndarray) -> np.ndarray:
+        """
+            This method calculates the utility values of many bids at once. Only the bids that are not memoized yet are
+            calculated.
+        :param bid_codes: Value indices of the bids as (number of bids x number of issues) NumPy array, see bid_codes
+        :return: Utility values of the bids
+        """
+        utilities = self._get_memoized_utilities()
+
+        indices = bid_codes @ self._index_multipliers
+        missing = np.isnan(utilities[indices])
+
+        if np.any(missing):
+            utilities[indices[missing]] = super(EstimatedPreference, self).get_utilities(bid_codes[missing])
+
+        return utilities[indices]
 
     def get_issue_weight(self, issue: Issue) -> float:
         """
@@ -74,7 +146,10 @@ class EstimatedPreference(Preference):
         :param weight: New weight that will be assigned
         :return: Nothing
         """
-        self._issue_weights[issue] = weight
+        if self._issue_weights[issue] != weight:
+            self._issue_weights[issue] = weight
+
+            self._on_change(issue)
 
     def set_value_weight(self, issue: Issue, value: str, weight: float):
         """
@@ -84,7 +159,28 @@ class EstimatedPreference(Preference):
         :param weight: New weight that will be assigned
         :return: Nothing
         """
-        self._value_weights[issue][value] = weight
+        if self._value_weights[issue][value] != weight:
+            self._value_weights[issue][value] = weight
+
+            self._on_change(issue)
+
+    def _on_change(self, issue: Issue):
+        """
+            This method increases the version when a weight of the given issue changes.
+        :param issue: Changed Issue object or IssueName as string
+        :return: Nothing
+        """
+        self.version += 1
+        self._issue_versions[issue] = self.version
+
+    def changed_issues(self, since: int) -> Set[Issue]:
+        """
+            This method provides the issues whose weights (i.e., Issue weight or any Value weight) are changed after the
+            given version.
+        :param since: Version of the last read
+        :return: Set of changed Issue objects
+        """
+        return {issue for issue, version in self._issue_versions.items() if version > since}
 
     def normalize(self):
         """
@@ -97,14 +193,14 @@ class EstimatedPreference(Preference):
 
         for issue in self.issues:
             if issue_total == 0:
-                self._issue_weights[issue] = 1. / len(self.issues)
+                self.set_issue_weight(issue, 1. / len(self.issues))
             else:
-                self._issue_weights[issue] /= issue_total
+                self.set_issue_weight(issue, self._issue_weights[issue] / issue_total)
 
             max_val = max(self._value_weights[issue].values())
 
             for value in issue.values:
                 if max_val == 0:
-                    self._value_weights[issue][value] = 1.
+                    self.set_value_weight(issue, value, 1.)
                 else:
-                    self._value_weights[issue][value] /= max_val
+                    self.set_value_weight(issue, value, self._value_weights[issue][value] / max_val)
@@ -1,18 +1,32 @@
 import math
 from typing import List
 
+import numpy as np
+from nenv.Issue import Issue
 from nenv.Preference import Preference
-from nenv.OpponentModel.EstimatedPreference import EstimatedPreference
 from nenv.OpponentModel.AbstractOpponentModel import AbstractOpponentModel
 from nenv.Bid import Bid
-from scipy.stats import chisquare
+from scipy.stats import chi2
 
 
 class FrequencyWindowOpponentModel(AbstractOpponentModel):
-    issues: dict
-    offers: List[Bid]
+    """
+        Frequency Window Opponent Model. The value counters and the weights of all issues are held in padded NumPy arrays
+        (issues x max. number of values), and the value indices of the last two windows are held in a ring buffer.
+        Thus, the window frequencies and the chi-square tests of all issues are calculated at once.
+    """
+    issues: List[Issue]              # List of issues
+    offers: List[Bid]                # Received bids
+    value_indices: List[dict]        # Index of each value for each issue
+    number_of_values: np.ndarray     # Number of values of each issue
+    value_mask: np.ndarray           # Valid entries of the padded value arrays
+    value_counter: np.ndarray        # Value counters (issues x max. number of values)
+    value_weights: np.ndarray        # Estimated value weights (issues x max. number of values)
+    issue_weights: np.ndarray        # Estimated issue weights
+    value_codes: np.ndarray          # Ring buffer of the value indices of the last two windows (2 x window_size, issues)
     alpha: float = 10.
     beta: float = 5.
+    gamma: float = 0.25
     window_size: int = 48
 
     @property
@@ -23,103 +37,144 @@ class FrequencyWindowOpponentModel(AbstractOpponentModel):
         super().__init__(reference)
         self.offers = []
 
-        self.issues = {
-            issue: IssueEstimator(issue.values) for issue in reference.issues
-        }
+        self.issues = reference.issues
+
+        self.value_indices = [{value: j for j, value in enumerate(issue.values)} for issue in self.issues]
+        self.number_of_values = np.array([len(issue.values) for issue in self.issues])
+
+        max_number_of_values = int(np.max(self.number_of_values))
+
+        self.value_mask = np.arange(max_number_of_values)[np.newaxis, :] < self.number_of_values[:, np.newaxis]
+
+        self.issue_weights = np.array([self._pref[issue] for issue in self.issues], dtype=np.float64)
+        self.value_counter = np.zeros((len(self.issues), max_number_of_values), dtype=np.float64)
 
-        for issue in self.issues.keys():
-            self.issues[issue].weight = self._pref[issue]
+        for i, issue in enumerate(self.issues):
+            for j, value in enumerate(issue.values):
+                self.value_counter[i, j] = self._pref[issue, value]
 
-            for value in issue.values:
-                self.issues[issue].value_counter[value] = self._pref[issue, value]
-                self.issues[issue].value_weights[value] = self._pref[issue, value]
+        self.value_weights = self.value_counter.copy()
+
+        self.value_codes = np.zeros((2 * self.window_size, len(self.issues)), dtype=np.int64)
 
     def update(self, bid: Bid, t: float):
         self.offers.append(bid)
 
         if t > 0.8:  # Do Not update in the last rounds.
-            self.update_weights()
             return
 
-        for issue_name, estimator in self.issues.items():
-            estimator.update(bid[issue_name])
+        codes = [self.value_indices[i][bid[issue]] for i, issue in enumerate(self.issues)]
 
-        if len(self.offers) < 2:
-            self.update_weights()
-            return
+        self.value_codes[(len(self.offers) - 1) % (2 * self.window_size)] = codes
+        self.value_counter[np.arange(len(self.issues)), codes] += 1.
+
+        self.update_value_weights()
 
         if len(self.offers) % self.window_size == 0 and len(self.offers) >= 2 * self.window_size:
-            current_window = self.offers[-self.window_size:]
-            previous_window = self.offers[-2 * self.window_size:-self.window_size]
+            self.update_issues(t)
 
-            self.update_issues(previous_window, current_window, t)
+    def update_batch(self, bid_indices: np.ndarray, times: np.ndarray):
+        """
+            This method processes the received bids segment by segment, where each segment ends with a window update.
+            The value counters of a segment are incremented in the order of the bids (i.e., np.add.at applies the
+            repeated indices one by one). Therefore, the result is identical to the sequential updates.
+        :param bid_indices: Indices of the received bids
+        :param times: Negotiation times of the received bids
+        :return: Nothing
+        """
+        times = np.asarray(times, dtype=np.float64)
+        bid_codes = self._pref.get_bid_codes(bid_indices)
+        bids = self.get_bids(bid_indices)
 
-        self.update_weights()
+        number_of_offers = len(self.offers) + 1 + np.arange(len(bids))  # Number of offers after each bid
+        active = ~(times > 0.8)  # Do Not update in the last rounds.
 
-    def update_issues(self, previous_window, current_window, t):
-        not_changed = []
-        concession = False
+        window_ends = np.flatnonzero(active & (number_of_offers % self.window_size == 0) &
+                                     (number_of_offers >= 2 * self.window_size))
 
-        def frequency(window: list, issue_name: str, issue_obj: IssueEstimator):
-            values = []
+        start = 0
 
-            for value in issue_obj.value_weights.keys():
-                total = 0.
+        for end in list(window_ends + 1) + [len(bids)]:
+            if end <= start:
+                continue
 
-                for bid in window:
-                    if bid[issue_name] == value:
-                        total += 1.
+            self.offers.extend(bids[start:end])
 
-                values.append((1. + total) / (len(window) + len(issue_obj.value_counter)))
+            segment_active = active[start:end]
+            segment_codes = bid_codes[start:end][segment_active]
 
-            return values
+            if len(segment_codes) > 0:
+                self.value_codes[(number_of_offers[start:end][segment_active] - 1) % (2 * self.window_size)] = segment_codes
 
-        for issue_name, issue_obj in self.issues.items():
-            fr_current = frequency(current_window, issue_name, issue_obj)
-            fr_previous = frequency(previous_window, issue_name, issue_obj)
-            p_val = chisquare(fr_previous, fr_current)[1]
+                np.add.at(self.value_counter, (np.arange(len(self.issues))[np.newaxis, :], segment_codes), 1.)
 
-            if p_val > 0.05:
-                not_changed.append(issue_obj)
-            else:
-                estimated_current = sum([fr_current[i] * w for i, w in enumerate(issue_obj.value_weights.values())])
-                estimated_previous = sum([fr_previous[i] * w for i, w in enumerate(issue_obj.value_weights.values())])
+                self.update_value_weights()
 
-                if estimated_current < estimated_previous:
-                    concession = True
+            if end - 1 in window_ends:
+                self.update_issues(float(times[end - 1]))
 
-        if len(not_changed) != len(self.issues) and concession:
-            for issue_obj in not_changed:
-                issue_obj.weight += self.alpha * (1. - math.pow(t, self.beta))
+            start = end
 
-        total_issue_weights = sum([issue_obj.weight for issue_obj in self.issues.values()])
+    def update_value_weights(self):
+        """
+            This method calculates the value weights of all issues from the value counters, and writes only the changed
+            weights into the estimated preferences.
+        :return: Nothing
+        """
+        max_counter = np.max(self.value_counter, axis=1, keepdims=True)
 
-        for issue_obj in self.issues.values():
-            issue_obj.weight /= total_issue_weights
+        value_weights = np.power(self.value_counter, self.gamma) / np.power(max_counter, self.gamma)
+        value_weights[~self.value_mask] = 0.
 
-    def update_weights(self):
-        for issue in self.issues.keys():
-            self._pref[issue] = self.issues[issue].weight
+        for i, j in np.argwhere(value_weights != self.value_weights):
+            issue = self.issues[i]
 
-            for value in issue.values:
-                self._pref[issue, value] = self.issues[issue].value_weights[value]
+            self._pref[issue, issue.values[j]] = float(value_weights[i, j])
 
+        self.value_weights = value_weights
 
-class IssueEstimator:
-    weight: float
-    value_weights: dict
-    value_counter: dict
-    gamma: float = 0.25
+    def frequency(self, codes: np.ndarray) -> np.ndarray:
+        """
+            This method calculates the smoothed value frequencies of all issues in the given window.
+        :param codes: Value indices of the bids in the window (window_size x issues)
+        :return: Value frequencies (issues x max. number of values), padded with 1.
+        """
+        number_of_issues, max_number_of_values = self.value_counter.shape
+
+        flat_codes = codes + np.arange(number_of_issues)[np.newaxis, :] * max_number_of_values
+
+        counts = np.bincount(flat_codes.ravel(), minlength=self.value_counter.size)
+        counts = counts.reshape(self.value_counter.shape)
+
+        frequencies = (1. + counts) / (len(codes) + self.number_of_values[:, np.newaxis])
+        frequencies[~self.value_mask] = 1.
+
+        return frequencies
+
+    def update_issues(self, t: float):
+        start = len(self.offers) % (2 * self.window_size)  # Position of the previous window in the ring buffer
+
+        previous_window = self.value_codes[start:start + self.window_size]
+        current_window = self.value_codes[self.window_size - start:2 * self.window_size - start]
+
+        fr_current = self.frequency(current_window)
+        fr_previous = self.frequency(previous_window)
+
+        # Chi-square test of all issues
+        statistics = np.sum((fr_previous - fr_current) ** 2 / fr_current, axis=1)
+        p_values = chi2.sf(statistics, self.number_of_values - 1)
+
+        not_changed = p_values > 0.05
 
-    def __init__(self, values: list):
-        self.value_weights = {value: 1. for value in values}
-        self.value_counter = {value: 1. for value in values}
+        estimated_current = np.sum(fr_current * self.value_weights, axis=1)
+        estimated_previous = np.sum(fr_previous * self.value_weights, axis=1)
 
-        self.weight = 1.
+        concession = bool(np.any(~not_changed & (estimated_current < estimated_previous)))
 
-    def update(self, value: str):
-        self.value_counter[value] += 1.
+        if not np.all(not_changed) and concession:
+            self.issue_weights[not_changed] += self.alpha * (1. - math.pow(t, self.beta))
 
-        max_value = max(self.value_counter.values())
+        self.issue_weights /= np.sum(self.issue_weights)
 
-        self.value_weights = {value_name: math.pow(self.value_counter[value_name], self.gamma) / math.pow(max_value, self.gamma) for value_name in self.value_counter.keys()}
+        for i, issue in enumerate(self.issues):
+            self._pref[issue] = float(self.issue_weights[i])
@@ -1,8 +1,9 @@
 import os
 import random
-from typing import List, Dict
+from typing import List, Dict, Union
 
 import numba
+import numpy as np
 
 from nenv.Issue import Issue
 from nenv.Bid import Bid
@@ -21,7 +22,9 @@ class Preference:
     __issues: List[Issue]
     _issue_weights: Dict[Issue, float]
     _value_weights: Dict[Issue, Dict[str, float]]
+    _value_indices: Dict[Issue, Dict[str, int]]
     _bids: List[Bid]
+    _bid_codes: Union[None, np.ndarray]
     __reservation_value: float
 
     def __init__(self, profile_json_path: str, generate_bids: bool = True):
@@ -34,7 +37,9 @@ class Preference:
         self.__issues = []
         self._issue_weights = {}
         self._value_weights = {}
+        self._value_indices = {}
         self._bids = []
+        self._bid_codes = None
 
         with open(profile_json_path, "r") as f:
             profile_data = json.load(f)
@@ -52,6 +57,8 @@ class Preference:
             for value_name, value_weight in profile_data["issues"][issue_name].items():
                 self._value_weights[issue][value_name] = value_weight
 
+            self._value_indices[issue] = {value_name: i for i, value_name in enumerate(issue.values)}
+
         # Generate bids
         if generate_bids:
             _ = self.bids
@@ -106,6 +113,94 @@ class Preference:
 
         return utility
 
+    @property
+    def bid_codes(self) -> np.ndarray:
+        """
+            This method provides the value indices of all bids in the same order with the bids property. It extracts the
+            value indices on the first call.
+        :return: Value indices of the bids as (number of bids x number of issues) NumPy array
+        """
+        if self._bid_codes is None:
+            self._bid_codes = np.array([[self._value_indices[issue][bid[issue]] for issue in self.__issues]
+                                        for bid in self.bids], dtype=np.int64).reshape(-1, len(self.__issues))
+
+        return self._bid_codes
+
+    def get_bid_codes(self, bid_indices: np.ndarray) -> np.ndarray:
+        """
+            This method converts the bid indices into the value indices of the bids, see get_bid_index method.
+        :param bid_indices: Indices of the bids
+        :return: Value indices of the bids as (number of bids x number of issues) NumPy array
+        """
+        remainders = np.array(bid_indices, dtype=np.int64)
+        bid_codes = np.zeros((len(remainders), len(self.__issues)), dtype=np.int64)
+
+        for i in reversed(range(len(self.__issues))):
+            number_of_values = len(self.__issues[i].values)
+
+            bid_codes[:, i] = remainders % number_of_values
+            remainders //= number_of_values
+
+        return bid_codes
+
+    def get_utilities(self, bid_codes: np.ndarray) -> np.ndarray:
+        """
+            This method calculates the utility values of many bids at once.
+        :param bid_codes: Value indices of the bids as (number of bids x number of issues) NumPy array, see bid_codes
+        :return: Utility values of the bids
+        """
+        utilities = np.zeros(len(bid_codes))
+
+        for i, issue in enumerate(self.__issues):
+            value_weights = np.array([self._value_weights[issue][value_name] for value_name in issue.values])
+
+            utilities += self._issue_weights[issue] * value_weights[bid_codes[:, i]]
+
+        return utilities
+
+    def get_bid_index(self, bid: Bid) -> int:
+        """
+            This method provides the index of the given bid in the domain. The index only depends on the domain (i.e.,
+            issue and value order in the profile), not on the weights. Therefore, both parties of a domain share the same
+            bid indices. It is the inverse of get_bid_by_index method.
+
+            The index is cached in the Bid object.
+        :param bid: Target bid
+        :return: Index of the bid in [0, domain size)
+        """
+        if bid._index is not None:
+            return bid._index
+
+        index = 0
+
+        for issue in self.__issues:
+            index = index * len(self._value_indices[issue]) + self._value_indices[issue][bid[issue]]
+
+        bid._index = index
+
+        return index
+
+    def get_bid_by_index(self, index: int) -> Bid:
+        """
+            This method generates the bid of the given bid index. It is the inverse of get_bid_index method.
+        :param index: Index of the bid in [0, domain size)
+        :return: Corresponding Bid object without utility value
+        """
+        content = {}
+        remainder = index
+
+        for issue in reversed(self.__issues):
+            values = self._value_indices[issue]
+
+            content[issue] = issue.values[remainder % len(values)]
+
+            remainder //= len(values)
+
+        bid = Bid({issue: content[issue] for issue in self.__issues})
+        bid._index = index
+
+        return bid
+
     def get_bid_at(self, target_utility: float) -> Bid:
         """
             This method returns the closest bid to provided target utility. Binary Search approach is applied.
@@ -231,9 +326,9 @@ class Preference:
     @property
     def value_weights(self) -> Dict[Issue, Dict[str, float]]:
         """
-        :return: Copy of dictionary of Issue-Value - Weight pairs
+        :return: Copy of dictionary of Issue-Value - Weight pairs. The inner dictionaries are copied as well.
         """
-        return self._value_weights.copy()
+        return {issue: weights.copy() for issue, weights in self._value_weights.items()}
 
     @property
     def max_util_bid(self) -> Bid:
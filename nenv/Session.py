@@ -1,11 +1,14 @@
 import time
-from typing import List, Union
+from typing import Dict, List, Union
 from nenv.Action import Accept, Action, Offer
 from nenv.Agent import AbstractAgent
 from nenv.BidSpace import BidSpace
+from nenv.OpponentModel import AbstractOpponentModel
 from nenv.utils.ProcessManager import ProcessManager
 from nenv.utils.SessionOps import session_operation
 from nenv.utils.ExcelLog import ExcelLog, LogRow, update
+from nenv.utils.SessionTrace import SessionTrace, get_trace_path
+from nenv.utils.EstimatorUpdater import EstimatorUpdater
 
 
 class Session:
@@ -16,6 +19,7 @@ class Session:
     agentA: AbstractAgent  # AgentA object
     agentB: AbstractAgent  # AgentB object
     session_log: ExcelLog  # Session log
+    trace: SessionTrace  # Binary session trace
     loggers: list  # List of Loggers
     round: int  # Current negotiation round
     action_history: List[Action]  # List of Action that the agents have taken
@@ -23,12 +27,16 @@ class Session:
     log_path: str  # Session Log csv path
     deadline_time: Union[None, int]  # Time-based deadline in terms of seconds
     deadline_round: Union[None, int]  # Round-based deadline in terms of seconds
+    virtual_clock: Union[None, str]  # Virtual clock mode for time-based deadline, 'thread', 'process' or None
+    virtual_time: float  # Total CPU time charged to the agents in virtual clock mode
+    estimator_updaters: Dict[str, EstimatorUpdater]  # Estimator updaters of the agents, 'A' and 'B'
+    flush_on_offer: bool  # Whether any logger reads the estimators in on_offer
     last_row: dict  # Last row of the log
     start_time: float  # Start time of the session
     process_manager: ProcessManager  # Process Manager
     time_out: float  # Time out for any process
 
-    def __init__(self, agentA: AbstractAgent, agentB: AbstractAgent, path: str, deadline_time: Union[None, int], deadline_round: Union[None, int], loggers: list):
+    def __init__(self, agentA: AbstractAgent, agentB: AbstractAgent, path: str, deadline_time: Union[None, int], deadline_round: Union[None, int], loggers: list, virtual_clock: Union[None, str] = None, background_estimators: bool = False):
         """
             Constructor
         :param agentA: AgentA object
@@ -37,11 +45,25 @@ class Session:
         :param deadline_time: Time-Based deadline in terms of seconds.
         :param deadline_round: Round-based deadline in terms of number of rounds.
         :param loggers: List of logger
+        :param virtual_clock: Virtual clock mode for the time-based deadline. If it is None, wall-clock time is used.
+        Otherwise, the negotiation time advances only by the CPU time that the agents consume in their Act and Receive
+        Bid processes. 'thread' charges the CPU time of the thread running the agent, 'process' charges the CPU time of
+        the whole process (e.g., including the intra-op threads of the agent). It cannot be used with the agents
+        computing on background threads (see AbstractAgent.background_compute). Default None.
+        :param background_estimators: The estimators are updated outside the timed processes of the agents. If it is
+        True, the updates are applied on a background worker thread while the agents negotiate. Otherwise, they are
+        deferred until the loggers read the estimators. It cannot be used with 'process' virtual clock, since the CPU
+        time of the background worker would be charged to the agents. Default False.
         """
 
         assert deadline_time is not None or deadline_round is not None, "No deadline type is specified."
         assert deadline_time is None or deadline_time > 0, "Deadline must be positive."
         assert deadline_round is None or deadline_round > 0, "Deadline must be positive."
+        assert virtual_clock in [None, "thread", "process"], "Virtual clock must be 'thread', 'process' or None."
+        assert not (background_estimators and virtual_clock == "process"), \
+            "Background estimators cannot be used with 'process' virtual clock, their CPU time would be charged to the agents."
+        assert virtual_clock is None or not (agentA.background_compute or agentB.background_compute), \
+            "Agents computing on background threads cannot be used with virtual clock, their CPU time would not be charged to them."
 
         self.process_manager = ProcessManager()
 
@@ -53,18 +75,26 @@ class Session:
         self.log_path = path
         self.deadline_time = deadline_time
         self.deadline_round = deadline_round
+        self.virtual_clock = virtual_clock
+        self.virtual_time = 0.
         self.last_row = {}
         self.action_history = []
         self.start_time = 0.
         self.round = 0
         self.time_out = min(60, deadline_time) if deadline_time is not None else 60
 
+        self.estimator_updaters = {
+            "A": EstimatorUpdater(agentA.estimators, agentA.preference, background_estimators),
+            "B": EstimatorUpdater(agentB.estimators, agentB.preference, background_estimators)
+        }
+
         sheet_names = {"Session"}
 
         for estimator in self.agentA.estimators:
             sheet_names.add(estimator.name)
 
         self.loggers = loggers
+        self.flush_on_offer = any(logger.reads_estimators for logger in loggers)
 
         for logger in self.loggers:
             logger_sheet_names = logger.before_session_start(self)
@@ -73,6 +103,7 @@ class Session:
                 sheet_names.add(sheet_name)
 
         self.session_log = ExcelLog(sheet_names)
+        self.trace = SessionTrace()
 
     def get_time(self) -> float:
         """
@@ -80,24 +111,33 @@ class Session:
         """
 
         if self.deadline_time is not None and self.deadline_round is not None:
-            t_time = (time.time() - self.start_time) / self.deadline_time
+            t_time = self.get_negotiation_seconds() / self.deadline_time
             t_round = self.round / self.deadline_round
 
             return max(t_round, t_time)
         elif self.deadline_time is not None:
-            return (time.time() - self.start_time) / self.deadline_time
+            return self.get_negotiation_seconds() / self.deadline_time
         elif self.deadline_round is not None:
             return self.round / self.deadline_round
         else:
             raise Exception("No deadline is specified.")
 
+    def get_negotiation_seconds(self) -> float:
+        """
+        :return: Elapsed negotiation time in terms of seconds, based on the wall-clock or the virtual clock
+        """
+        if self.virtual_clock is not None:
+            return self.virtual_time
+
+        return time.time() - self.start_time
+
     def on_offer(self, action: Action, agent_no: str, t: float):
         """
             This method is called when an offer received from an agent.
         :param action: Offer action
         :param agent_no: Who made the offer, 'A' or 'B'
         :param t: Negotiation time when received the offer
-        :return: Log row for session
+        :return: Nothing
         """
         self.action_history.append(action)
 
@@ -118,6 +158,10 @@ class Session:
         }
 
         self.session_log.append({"Session": row})
+        self.trace.append(self.round, agent_no, t, self.agentA.preference.get_bid_index(action.bid), "Offer")
+
+        if self.flush_on_offer:  # Otherwise, the estimators are updated at once at the end of the session
+            self.flush_estimators()
 
         # Update each sheet with loggers
         for logger in self.loggers:
@@ -135,6 +179,8 @@ class Session:
         :param t: Acceptance time
         :return: Log row for tournament
         """
+        self.close_estimators()
+
         self.action_history.append(action)
 
         agent1_utility = self.agentA.preference.get_utility(action.bid)
@@ -154,8 +200,9 @@ class Session:
         }
 
         self.session_log.append({"Session": row})
+        self.trace.append(self.round, agent_no, t, self.agentA.preference.get_bid_index(action.bid), "Accept")
 
-        self.session_log.save(self.log_path)
+        self.save_logs()
 
         # Terminate
 
@@ -193,7 +240,9 @@ class Session:
         :param t: Negotiation time
         :return: Log row for tournament
         """
-        self.session_log.save(self.log_path)
+        self.close_estimators()
+
+        self.save_logs()
 
         # Terminate
 
@@ -234,7 +283,9 @@ class Session:
         :param t: Negotiation time
         :return: Log row for tournament
         """
-        self.session_log.save(self.log_path)
+        self.close_estimators()
+
+        self.save_logs()
 
         # Terminate
 
@@ -275,7 +326,9 @@ class Session:
         :param t: Negotiation time
         :return: Log row for tournament
         """
-        self.session_log.save(self.log_path)
+        self.close_estimators()
+
+        self.save_logs()
 
         # Terminate
 
@@ -308,6 +361,48 @@ class Session:
 
         return row
 
+    def flush_estimators(self):
+        """
+            This method applies the pending updates of the estimators before the loggers read them.
+        :return: Nothing
+        """
+        self.drop_estimators(self.estimator_updaters["A"].flush(), self.estimator_updaters["B"].flush())
+
+    def close_estimators(self):
+        """
+            This method applies the pending updates of the estimators, and stops the background workers at the end of
+            the session.
+        :return: Nothing
+        """
+        self.drop_estimators(self.estimator_updaters["A"].close(), self.estimator_updaters["B"].close())
+
+    def drop_estimators(self, failed_estimators_A: List[AbstractOpponentModel],
+                        failed_estimators_B: List[AbstractOpponentModel]):
+        """
+            This method drops the estimators which raise an exception from both agents, since the loggers pair the
+            estimators of the agents by their positions. Thus, the loggers do not log any row for them after the
+            failure, and the negotiation result does not change.
+        :param failed_estimators_A: Failed estimators of AgentA
+        :param failed_estimators_B: Failed estimators of AgentB
+        :return: Nothing
+        """
+        estimator_ids = {self.agentA.estimators.index(estimator) for estimator in failed_estimators_A}
+        estimator_ids.update(self.agentB.estimators.index(estimator) for estimator in failed_estimators_B)
+
+        for estimator_id in sorted(estimator_ids, reverse=True):
+            print("%s is dropped from the session, since it raised an exception." % self.agentA.estimators[estimator_id].name)
+
+            del self.agentA.estimators[estimator_id]
+            del self.agentB.estimators[estimator_id]
+
+    def save_logs(self):
+        """
+            This method saves the session log file and the binary session trace next to it.
+        :return: Nothing
+        """
+        self.session_log.save(self.log_path)
+        self.trace.save(get_trace_path(self.log_path))
+
     def _run_process_manager(self, agent_no: str, process_name: str, call_events: bool = True, **kwargs) -> Union[
         dict, Action, None]:
         """
@@ -326,6 +421,13 @@ class Session:
 
         self.process_manager.run(session_operation, self.time_out, kwargs)
 
+        # Charge the consumed CPU time in virtual clock mode
+        if self.virtual_clock is not None and process_name in ["Act", "Receive Bid"]:
+            if self.virtual_clock == "thread":
+                self.virtual_time += self.process_manager.thread_time
+            else:
+                self.virtual_time += self.process_manager.process_time
+
         if self.process_manager.has_exception:
             print(
                 f"Exception occurs in {self.agentA.name if agent_no == 'A' else self.agentB.name} while {process_name}:")
@@ -365,12 +467,15 @@ class Session:
 
         action = None
         self.round = 0
+        self.virtual_time = 0.
         self.start_time = time.time()
         t = self.get_time()
 
         while t < 1.:  # Until deadline
             # AgentA
             if self.round > 0:
+                self.estimator_updaters["A"].submit(action.bid, t)
+
                 receiving_bid_result = self._run_process_manager('A', 'Receive Bid', bid=action.bid, t=t)
 
                 if receiving_bid_result:  # If any problem occurs, end the session
@@ -398,6 +503,8 @@ class Session:
                 return self.on_fail(t)
 
             # AgentB
+            self.estimator_updaters["B"].submit(action.bid, t)
+
             receiving_bid_result = self._run_process_manager('B', 'Receive Bid', bid=action.bid, t=t)
 
             if receiving_bid_result:  # If any problem occurs, end the session
@@ -1,17 +1,27 @@
-from typing import List
+import os
+from multiprocessing import Pool
+from typing import List, Union
+
+import numpy as np
 
 import nenv
 from nenv.Action import Action
 from nenv.Agent import AbstractAgent
 from nenv.Bid import Bid
+from nenv.Preference import Preference, domain_loader
 import json
 from nenv.utils.ExcelLog import ExcelLog, LogRow, update
+from nenv.utils.SessionTrace import SessionTrace, AGENT_NAMES, ACTION_NAMES, parse_trace_name
 
 
 class SessionEstimator:
     """
         SessionEstimator simulates the negotiation to generate Estimator logs after the tournament.
         It takes the previous session log to give them to Estimators
+
+        If a binary session trace (see SessionTrace) is provided, the session is replayed from the memory-mapped trace
+        instead of the session log file. In that case, the session log file is not read; the replayed logs are written
+        into the given path.
     """
     agentA: AbstractAgent  # AgentA object
     agentB: AbstractAgent  # AgentB object
@@ -19,14 +29,17 @@ class SessionEstimator:
     loggers: list  # List of Loggers
     log_path: str  # Session Log csv path
     action_history: List[Action]  # List of Action that the agents have taken
+    trace: Union[None, np.ndarray]  # Memory-mapped session trace, if provided
 
-    def __init__(self, agentA: AbstractAgent, agentB: AbstractAgent, path: str, loggers: list):
+    def __init__(self, agentA: AbstractAgent, agentB: AbstractAgent, path: str, loggers: list, trace_path: Union[None, str] = None):
         """
             Constructor
         :param agentA: AgentA object
         :param agentB: AgentB object
         :param path: Session log file path
         :param loggers: List of logger
+        :param trace_path: Binary session trace path. If it is provided, the session is replayed from the trace, and
+        the session log file is only written. Default None.
         """
         self.agentA = agentA
 
@@ -52,18 +65,62 @@ class SessionEstimator:
                 if sheet_name not in sheet_names:
                     sheet_names.add(sheet_name)
 
-        self.session_log = ExcelLog(sheet_names, self.log_path)
+        if trace_path is None:
+            self.trace = None
+            self.session_log = ExcelLog(sheet_names, self.log_path)
+        else:
+            self.trace = SessionTrace.load(trace_path)
+            self.session_log = ExcelLog(sheet_names)
+
+            for session_row in self.trace_rows():
+                self.session_log.append({"Session": session_row})
 
-    def parse_bid(self, bid_content: str) -> Bid:
+    def trace_rows(self) -> List[dict]:
+        """
+            This method converts the session trace into the rows of the session log.
+        :return: List of session log rows
+        """
+        rows = []
+
+        bid_indices = np.asarray(self.trace["BidIndex"]).tolist()
+        rounds = np.asarray(self.trace["Round"]).tolist()
+        times = np.asarray(self.trace["Time"]).tolist()
+        agents = np.asarray(self.trace["Who"]).tolist()
+        actions = np.asarray(self.trace["Action"]).tolist()
+
+        for i in range(len(bid_indices)):
+            bid = self.agentA.preference.get_bid_by_index(bid_indices[i])
+
+            agent_a_utility = self.agentA.preference.get_utility(bid)
+            agent_b_utility = self.agentB.preference.get_utility(bid)
+
+            rows.append({
+                "Round": rounds[i],
+                "Time": times[i],
+                "Who": AGENT_NAMES[agents[i]],
+                "Action": ACTION_NAMES[actions[i]],
+                "AgentAUtility": agent_a_utility,
+                "AgentBUtility": agent_b_utility,
+                "NashProduct": agent_a_utility * agent_b_utility,
+                "KalaiSum": agent_a_utility + agent_b_utility,
+                "BidContent": bid
+            })
+
+        return rows
+
+    def parse_bid(self, bid_content: Union[str, Bid, None]) -> Bid:
         """
             This method converts string to Bid object
-        :param bid_content: String
+        :param bid_content: String, or Bid object for the replayed traces
         :return: Bid object
         """
 
         if bid_content is None:
             return Bid({})
 
+        if isinstance(bid_content, Bid):
+            return bid_content.copy()
+
         bid_dict = json.loads(bid_content.replace("'", '"'))
 
         return Bid(bid_dict)
@@ -162,3 +219,97 @@ class SessionEstimator:
             update(row_tournament, logger.on_session_end(logger, self))
 
         return row_tournament
+
+
+class ReplayAgent(AbstractAgent):
+    """
+        ReplayAgent represents a party of a recorded negotiation session. It only holds the preferences, the name and
+        the Estimators of the party. Thus, it cannot negotiate.
+    """
+    __name: str  # Name of the recorded agent
+
+    def __init__(self, preference: Preference, estimators: list, name: str):
+        """
+            Constructor
+        :param preference: Preferences of the recorded agent
+        :param estimators: List of Estimators
+        :param name: Name of the recorded agent
+        """
+        super().__init__(preference, 1, estimators)
+
+        self.__name = name
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    def initiate(self, opponent_name: Union[None, str]):
+        pass
+
+    def receive_offer(self, bid: Bid, t: float):
+        pass
+
+    def act(self, t: float) -> Action:
+        raise Exception("ReplayAgent cannot negotiate.")
+
+
+def replay_trace(trace_path: str, estimator_classes: list, logger_classes: list, log_dir: str) -> LogRow:
+    """
+        This method replays a recorded session trace with the given Estimators and loggers. The session log is written
+        into the 'sessions' directory of the given log directory.
+    :param trace_path: Binary session trace path
+    :param estimator_classes: List of Estimator classes
+    :param logger_classes: List of logger classes
+    :param log_dir: The log directory of the loggers
+    :return: Log row for tournament
+    """
+    agent_a_name, agent_b_name, domain_name = parse_trace_name(trace_path)
+
+    pref_a, pref_b = domain_loader(domain_name)
+
+    agent_a = ReplayAgent(pref_a, [estimator(pref_a) for estimator in estimator_classes], agent_a_name)
+    agent_b = ReplayAgent(pref_b, [estimator(pref_b) for estimator in estimator_classes], agent_b_name)
+
+    loggers = [logger_class(log_dir) for logger_class in logger_classes]
+
+    log_path = os.path.join(log_dir, "sessions/", f"{agent_a_name}_{agent_b_name}_Domain{domain_name}.xlsx")
+
+    session = SessionEstimator(agent_a, agent_b, log_path, loggers, trace_path)
+
+    row_tournament = {"TournamentResults": {"AgentA": agent_a_name, "AgentB": agent_b_name, "DomainID": domain_name,
+                                            "DomainSize": len(pref_a.bids), "IssueSize": len(pref_a.issues),
+                                            "FilePath": log_path}}
+
+    return session.start(row_tournament)
+
+
+def _replay_trace(args: tuple) -> LogRow:
+    """
+        Pool wrapper of replay_trace method.
+    """
+    return replay_trace(*args)
+
+
+def replay_traces(trace_paths: List[str], estimator_classes: list, logger_classes: list, log_dir: str,
+                  processes: Union[None, int] = None) -> List[LogRow]:
+    """
+        This method replays many recorded session traces across a process pool. Each process creates its own
+        Estimators and loggers. Note that the loggers only provide the session-level logs, on_tournament_end events are
+        not called.
+    :param trace_paths: List of binary session trace paths
+    :param estimator_classes: List of Estimator classes
+    :param logger_classes: List of logger classes
+    :param log_dir: The log directory of the loggers
+    :param processes: Number of processes. Default None, i.e., the number of CPUs.
+    :return: List of log rows for tournament in the same order with the given traces
+    """
+    if not os.path.exists(os.path.join(log_dir, "sessions/")):
+        os.makedirs(os.path.join(log_dir, "sessions/"))
+
+    jobs = [(trace_path, list(estimator_classes), list(logger_classes), log_dir) for trace_path in trace_paths]
+
+    if processes == 1:
+        return [_replay_trace(job) for job in jobs]
+
+    with Pool(processes) as pool:
+        return pool.map(_replay_trace, jobs)
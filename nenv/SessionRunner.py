@@ -20,8 +20,10 @@ class SessionRunner:
     session: Session                 # Negotiation session object
     deadline_time: Union[None, int]  # The time-based deadline in terms of seconds
     deadline_time: Union[None, int]  # The round-based in terms of number of rounds
+    virtual_clock: Union[None, str]  # Virtual clock mode for the time-based deadline
+    background_estimators: bool      # Whether the estimators are updated on a background worker thread
 
-    def __init__(self, agentA_class: AgentClass, agentB_class: AgentClass, domain_name: str, deadline_time: Union[None, int], deadline_round: Union[None, int], estimators: List[OpponentModelClass], loggers: List[LoggerClass]):
+    def __init__(self, agentA_class: AgentClass, agentB_class: AgentClass, domain_name: str, deadline_time: Union[None, int], deadline_round: Union[None, int], estimators: List[OpponentModelClass], loggers: List[LoggerClass], virtual_clock: Union[None, str] = None, background_estimators: bool = False):
         """
             Constructor
         :param agentA_class: Class of AgentA, which is subclass of AbstractAgent class.
@@ -31,6 +33,9 @@ class SessionRunner:
         :param deadline_round: Round-based deadline in terms of number of rounds
         :param estimators: List of Estimator
         :param loggers: List of logger
+        :param virtual_clock: Virtual clock mode for the time-based deadline, 'thread', 'process' or None. Default None.
+        :param background_estimators: Whether the estimators are updated on a background worker thread instead of
+        deferring the updates until the loggers read them. Default False.
         """
 
         assert deadline_time is not None or deadline_round is not None, "No deadline type is specified."
@@ -47,6 +52,8 @@ class SessionRunner:
         self.deadline_time = deadline_time
         self.deadline_round = deadline_round
         self.loggers = loggers
+        self.virtual_clock = virtual_clock
+        self.background_estimators = background_estimators
 
     def run(self, save_path: str) -> LogRow:
         """
@@ -54,7 +61,7 @@ class SessionRunner:
         :param save_path: Session log file
         :return: Log row for tournament
         """
-        self.session = Session(self.agentA, self.agentB, save_path, self.deadline_time, self.deadline_round, self.loggers)
+        self.session = Session(self.agentA, self.agentB, save_path, self.deadline_time, self.deadline_round, self.loggers, self.virtual_clock, self.background_estimators)
 
         session_result = self.session.start()
 
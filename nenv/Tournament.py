@@ -5,7 +5,7 @@ import random
 import shutil
 import time
 import warnings
-from typing import Union, Set, List, Tuple
+from typing import Union, Set, List, Tuple, Dict
 import numpy as np
 import pandas as pd
 from nenv.Agent import AgentClass
@@ -25,6 +25,8 @@ class Tournament:
     estimators: Set[OpponentModelClass]
     deadline_time: Union[int, None]
     deadline_round: Union[int, None]
+    virtual_clock: Union[str, None]
+    background_estimators: bool
     result_dir: str
     seed: Union[int, None]
     shuffle: bool
@@ -41,7 +43,10 @@ class Tournament:
                  repeat: int = 1,
                  result_dir: str = "results/",
                  seed: Union[int, None] = None,
-                 shuffle: bool = False
+                 shuffle: bool = False,
+                 virtual_clock: Union[str, None] = None,
+                 background_estimators: bool = False,
+                 logger_settings: Union[Dict[str, dict], None] = None
                  ):
         """
             This class conducts a negotiation tournament.
@@ -56,11 +61,20 @@ class Tournament:
         :param result_dir: The result directory that the tournament logs will be created. Default 'results/'
         :param seed: Setting seed for whole tournament. Default None.
         :param shuffle: Whether shuffle negotiation combinations. Default False
+        :param virtual_clock: Virtual clock mode for the time-based deadline. 'thread' or 'process' charges each agent
+        its own measured CPU time instead of using wall-clock time. Default None, i.e., wall-clock time.
+        :param background_estimators: The estimators are always updated outside the timed processes of the agents.
+        Whether the updates run on a background worker thread, or they are deferred until the loggers read them.
+        The background worker cannot be used with 'process' virtual clock. Default False.
+        :param logger_settings: Class attributes of the loggers to override, keyed by the class name of the logger
+        (e.g., {'EstimatorMetricLogger': {'cadence': 'change'}}). Default None.
         """
 
         assert deadline_time is not None or deadline_round is not None, "No deadline type is specified."
         assert deadline_time is None or deadline_time > 0, "Deadline must be positive."
         assert deadline_round is None or deadline_round > 0, "Deadline must be positive."
+        assert not (background_estimators and virtual_clock == "process"), \
+            "Background estimators cannot be used with 'process' virtual clock, their CPU time would be charged to the agents."
 
         if repeat <= 0:
             warnings.warn("repeat is set to 1.")
@@ -74,12 +88,24 @@ class Tournament:
         self.estimators = estimator_classes
         self.deadline_time = deadline_time
         self.deadline_round = deadline_round
-        self.loggers = [logger_class(result_dir) for logger_class in set(logger_classes)]
+        if logger_settings is None:
+            logger_settings = {}
+
+        logger_names = [logger_class.__name__ for logger_class in logger_classes]
+
+        for logger_name in logger_settings:
+            assert logger_name in logger_names, f"Settings of {logger_name} are given, but it is not in the loggers."
+
+        self.loggers = [logger_class.configure(logger_settings[logger_class.__name__])(result_dir)
+                        if logger_class.__name__ in logger_settings else logger_class(result_dir)
+                        for logger_class in set(logger_classes)]
         self.result_dir = result_dir
         self.seed = seed
         self.repeat = repeat
         self.self_negotiation = self_negotiation
         self.shuffle = shuffle
+        self.virtual_clock = virtual_clock
+        self.background_estimators = background_estimators
 
     def run(self):
         """
@@ -128,7 +154,7 @@ class Tournament:
 
         for i, (agent_class_1, agent_class_2, domain_name) in enumerate(negotiations):
             # Start session
-            session_runner = SessionRunner(agent_class_1, agent_class_2, domain_name, self.deadline_time, self.deadline_round, list(self.estimators), self.loggers)
+            session_runner = SessionRunner(agent_class_1, agent_class_2, domain_name, self.deadline_time, self.deadline_round, list(self.estimators), self.loggers, self.virtual_clock, self.background_estimators)
 
             session_path = "%s_%s_Domain%s.xlsx" % \
                            (session_runner.agentA.name, session_runner.agentB.name, domain_name)
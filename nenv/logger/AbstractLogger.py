@@ -13,9 +13,15 @@ class AbstractLogger(ABC):
     """
         The loggers work as event handler.
         In each event, it should return the corresponding log as dictionary to append into the log file.
+
+        The loggers which read the estimators in on_offer must set reads_estimators, so that the session applies the
+        pending updates of the estimators before each offer event. Otherwise, the estimators are up-to-date only at
+        the end of the session (i.e., on_accept, on_fail and on_session_end).
     """
     log_dir: str  # The log directory
 
+    reads_estimators: bool = False  # Whether the logger reads the estimators in on_offer
+
     def __init__(self, log_dir: str):
         """
             Constructor
@@ -94,6 +100,19 @@ class AbstractLogger(ABC):
         """
         pass
 
+    @classmethod
+    def configure(cls, settings: dict):
+        """
+            This method creates a subclass of the logger whose class attributes are overridden by the given settings,
+            e.g., the tournament configuration. Only the existing class attributes can be overridden.
+        :param settings: Class attributes to override
+        :return: Configured logger class with the same name
+        """
+        for name in settings:
+            assert hasattr(cls, name) and not callable(getattr(cls, name)), f"{cls.__name__} has no setting named '{name}'."
+
+        return type(cls.__name__, (cls,), dict(settings, __module__=cls.__module__))
+
     def get_path(self, file_name: str) -> str:
         """
             This method generates the full path for given file name.
@@ -10,6 +10,7 @@ class EstimatedBidSpaceLogger(AbstractLogger):
         It iterates over all provided Estimators of the agents to generate the estimated bid space.
         Then, it logs the estimated Kalai and Nash distances for each Estimator of each agent.
     """
+    reads_estimators: bool = True
 
     def on_offer(self, agent: str, offer: Bid, time: float, session: Union[Session, SessionEstimator]) -> LogRow:
         row = {}
@@ -24,6 +24,7 @@ class EstimatedLogger(AbstractLogger):
         which are commonly used for classification tasks are applied for the evaluation. Additionally, this logger also
         creates a Confusion Matrix for each estimator.
     """
+    reads_estimators: bool = True
 
     def on_offer(self, agent: str, offer: Bid, time: float, session: Union[Session, SessionEstimator]) -> LogRow:
         row = {}
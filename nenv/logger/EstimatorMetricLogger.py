@@ -1,7 +1,11 @@
 from nenv.logger.AbstractLogger import *
 from nenv.Agent import AbstractAgent
 from tournament_graphs import draw_line
+from nenv.OpponentModel import AbstractOpponentModel
+from nenv.Preference import Preference
 from typing import List, Tuple, Dict
+from scipy.stats import norm
+import math
 import numpy as np
 
 
@@ -13,13 +17,58 @@ class EstimatorMetricLogger(AbstractLogger):
         At the end of tournament, it generates overall results containing these metric results. It also draws the
         necessary plots.
 
+        The evaluation cadence during the session can be configured via the class attributes, e.g., with the
+        'logger_settings' of the tournament configuration or by subclassing:
+            - 'offer': Every k offers (i.e., every_k). every_k = 1 evaluates on every offer.
+            - 'change': Only when the estimated weights of the Estimator change.
+            - 'time': On a geometric time schedule (i.e., time_start, time_start * time_ratio, ...)
+        The skipped rows are interpolated for the round-by-round results. Besides, the metrics can be calculated on a
+        fixed stratified bid sample of each domain (i.e., sample_size) with the corresponding confidence bounds. The
+        final metrics at the end of the session are always calculated on the whole bid space.
+
         Note: This logger increases the computational time due to the expensive calculation of the metrics. If you have
         strict time for the tournament run, you can look EstimatorOnlyFinalMetricLogger which is a cheaper version of
         this logger.
     """
+    reads_estimators: bool = True         # The metrics are calculated during the session
+    cadence: str = "offer"                # Evaluation cadence, 'offer', 'change' or 'time'
+    every_k: int = 1                      # Evaluation period in terms of offers for 'offer' cadence
+    time_start: float = 0.01              # First scheduled time for 'time' cadence
+    time_ratio: float = 1.25              # Ratio of the geometric time schedule for 'time' cadence
+    sample_size: Union[int, None] = None  # Size of the stratified bid sample. None means the whole bid space
+    sample_seed: int = 0                  # Seed of the stratified bid sample
+    confidence: float = 0.95              # Confidence level of the bounds for the sampled metrics
+    samples: Dict[str, np.ndarray]        # Stratified bid samples for each profile
+    offer_count: int                      # Number of offers in the current session
+    next_time: float                      # Next scheduled time for 'time' cadence
+    versions: Dict[str, Tuple[int, int]]  # Last evaluated versions of each Estimator for 'change' cadence
+
+    def initiate(self):
+        assert self.cadence in ["offer", "change", "time"], "Cadence must be 'offer', 'change' or 'time'."
+        assert self.every_k > 0, "every_k must be positive."
+        assert self.time_ratio > 1., "time_ratio must be greater than 1."
+
+        self.samples = {}
+        self.offer_count = 0
+        self.next_time = 0.
+        self.versions = {}
+
+    def before_session_start(self, session: Union[Session, SessionEstimator]) -> List[str]:
+        self.offer_count = 0
+        self.next_time = 0.
+        self.versions = {}
+
+        return []
 
     def on_offer(self, agent: str, offer: Bid, time: float, session: Union[Session, SessionEstimator]) -> LogRow:
-        return self.get_metrics(session.agentA, session.agentB)
+        self.offer_count += 1
+
+        estimator_ids = self.get_estimators_to_evaluate(time, session.agentA, session.agentB)
+
+        if len(estimator_ids) == 0:
+            return {}
+
+        return self.get_metrics(session.agentA, session.agentB, estimator_ids, self.sample_size is not None)
 
     def on_accept(self, agent: str, offer: Bid, time: float, session: Union[Session, SessionEstimator]) -> LogRow:
         return self.get_metrics(session.agentA, session.agentB)
@@ -40,12 +89,111 @@ class EstimatorMetricLogger(AbstractLogger):
         self.to_excel(rmse, kendall, spearman)
         self.draw(rmse, kendall, spearman)
 
-    def get_metrics(self, agent_a: AbstractAgent, agent_b: AbstractAgent) -> LogRow:
+    def get_estimators_to_evaluate(self, t: float, agent_a: AbstractAgent, agent_b: AbstractAgent) -> List[int]:
+        """
+            This method decides which Estimators are evaluated on the current offer based on the cadence.
+        :param t: Current negotiation time
+        :param agent_a: AgentA
+        :param agent_b: AgentB
+        :return: List of Estimator indices
+        """
+        estimator_ids = list(range(len(agent_a.estimators)))
+
+        if self.cadence == "offer":
+            return estimator_ids if (self.offer_count - 1) % self.every_k == 0 else []
+
+        if self.cadence == "time":
+            if t < self.next_time:
+                return []
+
+            while self.next_time <= t:
+                self.next_time = self.time_start if self.next_time == 0. else self.next_time * self.time_ratio
+
+            return estimator_ids
+
+        changed_ids = []
+
+        for estimator_id in estimator_ids:
+            name = agent_a.estimators[estimator_id].name
+
+            versions = (agent_a.estimators[estimator_id].version, agent_b.estimators[estimator_id].version)
+
+            if self.versions.get(name, None) != versions:
+                self.versions[name] = versions
+
+                changed_ids.append(estimator_id)
+
+        return changed_ids
+
+    def get_sample(self, preference: Preference) -> Union[np.ndarray, None]:
+        """
+            This method provides the fixed stratified bid sample of the given profile. The bids are sorted by their
+            utility values, and one bid is drawn from each of the equal-sized strata.
+        :param preference: Preferences to compare
+        :return: Positions of the sampled bids in `preference.bids`, or None if the sample covers the bid space
+        """
+        number_of_bids = len(preference.bids)
+
+        if self.sample_size is None or self.sample_size >= number_of_bids:
+            return None
+
+        if preference.profile_json_path not in self.samples:
+            random_state = np.random.RandomState(self.sample_seed)
+
+            boundaries = np.linspace(0, number_of_bids, self.sample_size + 1).astype(np.int64)
+            strata_sizes = boundaries[1:] - boundaries[:-1]
+
+            self.samples[preference.profile_json_path] = boundaries[:-1] + (random_state.random_sample(self.sample_size) * strata_sizes).astype(np.int64)
+
+        return self.samples[preference.profile_json_path]
+
+    def get_bounds(self, estimator: AbstractOpponentModel, org_pref: Preference, sample_positions: np.ndarray, rmse: float, spearman: float, kendall: float) -> Tuple[Tuple[float, float], Tuple[float, float], Tuple[float, float]]:
+        """
+            This method calculates the confidence bounds of the sampled metrics. Normal approximation is applied on the
+            squared errors for RMSE, Fisher z-transformation is applied for Spearman and Kendall-Tau (with the variance
+            estimates of Fieller et al., 1957).
+        :param estimator: Estimator
+        :param org_pref: Original preferences of the opponent
+        :param sample_positions: Positions of the sampled bids in `org_pref.bids`
+        :param rmse: Sampled RMSE
+        :param spearman: Sampled Spearman
+        :param kendall: Sampled Kendall-Tau
+        :return: (Lower, Upper) bounds of RMSE, Spearman and Kendall-Tau
+        """
+        n = len(sample_positions)
+        z = norm.ppf(0.5 + self.confidence / 2.)
+
+        bid_codes = org_pref.bid_codes[sample_positions]
+        squared_errors = np.square(org_pref.get_utilities(bid_codes) - estimator.preference.get_utilities(bid_codes))
+
+        mse_error = z * np.std(squared_errors, ddof=1) / math.sqrt(n)
+        rmse_bounds = (math.sqrt(max(rmse * rmse - mse_error, 0.)), math.sqrt(rmse * rmse + mse_error))
+
+        def fisher_bounds(correlation: float, variance: float) -> Tuple[float, float]:
+            correlation_z = math.atanh(min(max(correlation, -0.999999), 0.999999))
+            error = z * math.sqrt(variance)
+
+            return math.tanh(correlation_z - error), math.tanh(correlation_z + error)
+
+        spearman_bounds = fisher_bounds(spearman, 1.06 / max(n - 3, 1))
+        kendall_bounds = fisher_bounds(kendall, 0.437 / max(n - 4, 1))
+
+        return rmse_bounds, spearman_bounds, kendall_bounds
+
+    def get_metrics(self, agent_a: AbstractAgent, agent_b: AbstractAgent, estimator_ids: Union[List[int], None] = None, sampled: bool = False) -> LogRow:
         row = {}
 
-        for estimator_id in range(len(agent_a.estimators)):
-            rmseA, spearmanA, kendallA = agent_a.estimators[estimator_id].calculate_error(agent_b.preference)
-            rmseB, spearmanB, kendallB = agent_b.estimators[estimator_id].calculate_error(agent_a.preference)
+        if estimator_ids is None:
+            estimator_ids = range(len(agent_a.estimators))
+
+        sample_a = self.get_sample(agent_b.preference) if sampled else None
+        sample_b = self.get_sample(agent_a.preference) if sampled else None
+
+        for estimator_id in estimator_ids:
+            estimator_a, estimator_b = agent_a.estimators[estimator_id], agent_b.estimators[estimator_id]
+
+            rmseA, spearmanA, kendallA = estimator_a.calculate_error(agent_b.preference, sample_positions=sample_a)
+            rmseB, spearmanB, kendallB = estimator_b.calculate_error(agent_a.preference, sample_positions=sample_b)
 
             log = {
                 "RMSE_A": rmseA,
@@ -59,7 +207,18 @@ class EstimatorMetricLogger(AbstractLogger):
                 "KendallTau": (kendallA + kendallB) / 2.
             }
 
-            row[agent_a.estimators[estimator_id].name] = log
+            for side, estimator, org_pref, sample, metrics in [("A", estimator_a, agent_b.preference, sample_a, (rmseA, spearmanA, kendallA)),
+                                                               ("B", estimator_b, agent_a.preference, sample_b, (rmseB, spearmanB, kendallB))]:
+                if sample is None:
+                    continue
+
+                rmse_bounds, spearman_bounds, kendall_bounds = self.get_bounds(estimator, org_pref, sample, *metrics)
+
+                log["RMSE_%s_Lower" % side], log["RMSE_%s_Upper" % side] = rmse_bounds
+                log["Spearman%s_Lower" % side], log["Spearman%s_Upper" % side] = spearman_bounds
+                log["KendallTau%s_Lower" % side], log["KendallTau%s_Upper" % side] = kendall_bounds
+
+            row[estimator_a.name] = log
 
         return row
 
@@ -85,12 +244,12 @@ class EstimatorMetricLogger(AbstractLogger):
 
             summary = summary.append({
                 "EstimatorName": estimator_names[i],
-                "Avg.RMSE": np.mean(RMSE),
-                "Std.RMSE": np.std(RMSE),
-                "Avg.Spearman": np.mean(spearman),
-                "Std.Spearman": np.std(spearman),
-                "Avg.KendallTau": np.mean(kendall),
-                "Std.KendallTau": np.std(kendall)
+                "Avg.RMSE": np.nanmean(RMSE),
+                "Std.RMSE": np.nanstd(RMSE),
+                "Avg.Spearman": np.nanmean(spearman),
+                "Std.Spearman": np.nanstd(spearman),
+                "Avg.KendallTau": np.nanmean(kendall),
+                "Std.KendallTau": np.nanstd(kendall)
             }, ignore_index=True)
 
         summary.sort_values(by="Avg.RMSE", inplace=True, ascending=True)
@@ -113,24 +272,48 @@ class EstimatorMetricLogger(AbstractLogger):
 
             session_path = self.get_path(f"sessions/{agent_a}_{agent_b}_{domain_name}.xlsx")
 
-            for i in range(len(estimator_names)):
-                session_log = ExcelLog(file_path=session_path)
+            session_log = ExcelLog(file_path=session_path)
+            session_rows = session_log.log_rows["Session"]
+
+            # Offers until the acceptance
+            number_of_rows = len(session_rows)
 
-                for row_index, estimator_row in enumerate(session_log.log_rows[estimator_names[i]]):
-                    if session_log.log_rows["Session"][row_index]["Action"] == "Accept":
-                        break
+            for row_index, session_row in enumerate(session_rows):
+                if session_row["Action"] == "Accept":
+                    number_of_rows = row_index
+                    break
 
-                    _round = session_log.log_rows["Session"][row_index]["Round"]
+            for estimator_name in estimator_names:
+                estimator_rows = session_log.log_rows[estimator_name][:number_of_rows]
 
-                    rmse[estimator_names[0]][_round].append(estimator_row["RMSE_A"])
-                    spearman[estimator_names[0]][_round].append(estimator_row["SpearmanA"])
-                    kendall[estimator_names[0]][_round].append(estimator_row["KendallTauA"])
-                    rmse[estimator_names[0]][_round].append(estimator_row["RMSE_B"])
-                    spearman[estimator_names[0]][_round].append(estimator_row["SpearmanB"])
-                    kendall[estimator_names[0]][_round].append(estimator_row["KendallTauB"])
+                for results, key_a, key_b in [(rmse, "RMSE_A", "RMSE_B"),
+                                              (spearman, "SpearmanA", "SpearmanB"),
+                                              (kendall, "KendallTauA", "KendallTauB")]:
+                    for key in [key_a, key_b]:
+                        values = self.interpolate([estimator_row.get(key, np.nan) for estimator_row in estimator_rows])
+
+                        for row_index, value in enumerate(values):
+                            results[estimator_name][session_rows[row_index]["Round"]].append(value)
 
         return rmse, spearman, kendall
 
+    @staticmethod
+    def interpolate(values: List[float]) -> np.ndarray:
+        """
+            This method fills the skipped (i.e., NaN) rows by linear interpolation between the evaluated rows.
+        :param values: Logged values row by row
+        :return: Interpolated values
+        """
+        values = np.array(values, dtype=np.float64)
+        evaluated = ~np.isnan(values)
+
+        if np.all(evaluated) or not np.any(evaluated):
+            return values
+
+        indices = np.arange(len(values))
+
+        return np.interp(indices, indices[evaluated], values[evaluated])
+
     def to_excel(self, rmse: dict, spearman: dict, kendall: dict):
         rows = []
 
@@ -193,7 +376,7 @@ class EstimatorMetricLogger(AbstractLogger):
             std[estimator_name] = []
 
             for result in rounds:
-                means[estimator_name].append(float(np.mean(result)))
-                std[estimator_name].append(float(np.std(result)))
+                means[estimator_name].append(float(np.nanmean(result)))
+                std[estimator_name].append(float(np.nanstd(result)))
 
         return means, std
@@ -70,12 +70,12 @@ class EstimatorOnlyFinalMetricLogger(AbstractLogger):
 
             summary = summary.append({
                 "EstimatorName": estimator_names[i],
-                "Avg.RMSE": np.mean(RMSE),
-                "Std.RMSE": np.std(RMSE),
-                "Avg.Spearman": np.mean(spearman),
-                "Std.Spearman": np.std(spearman),
-                "Avg.KendallTau": np.mean(kendall),
-                "Std.KendallTau": np.std(kendall)
+                "Avg.RMSE": np.nanmean(RMSE),
+                "Std.RMSE": np.nanstd(RMSE),
+                "Avg.Spearman": np.nanmean(spearman),
+                "Std.Spearman": np.nanstd(spearman),
+                "Avg.KendallTau": np.nanmean(kendall),
+                "Std.KendallTau": np.nanstd(kendall)
             }, ignore_index=True)
 
         summary.sort_values(by="Avg.RMSE", inplace=True, ascending=True)
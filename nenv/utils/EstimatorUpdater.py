@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Tuple, Union
+import numpy as np
+from nenv.Bid import Bid
+from nenv.OpponentModel import AbstractOpponentModel
+from nenv.Preference import Preference
+
+
+class EstimatorUpdater:
+    """
+        EstimatorUpdater feeds the Estimators of an agent with the bids received from the opponent. The Estimators are
+        only used for the evaluation. Therefore, the session updates them outside the timed processes of the agent.
+
+        The updates are either deferred until the Estimators are read (i.e., flush), or applied on a background worker
+        thread in the order of the received bids. The deferred updates are applied at once via update_batch.
+
+        If an Estimator raises an exception, it is reported once and its following updates are skipped. The session
+        drops it from the Estimators of both agents (see Session.drop_estimators), so the negotiation result does not
+        depend on the Estimators.
+    """
+    estimators: List[AbstractOpponentModel]   # Estimators of the agent, shared with the agent
+    preference: Preference                     # Preferences of the agent to assign the utility of the received bids
+    pending: List[Tuple[Bid, float]]           # Deferred updates
+    executor: Union[None, ThreadPoolExecutor]  # Background worker, if enabled
+    futures: List[Future]                      # Submitted updates to the background worker
+    failed: List[AbstractOpponentModel]        # Estimators which raise an exception since the last flush
+
+    def __init__(self, estimators: List[AbstractOpponentModel], preference: Preference, background: bool = False):
+        """
+            Constructor
+        :param estimators: Estimators of the agent
+        :param preference: Preferences of the agent
+        :param background: Whether the updates are applied on a background worker thread, or deferred until flush.
+        Default False.
+        """
+        self.estimators = estimators
+        self.preference = preference
+        self.pending = []
+        self.futures = []
+        self.failed = []
+        self.executor = ThreadPoolExecutor(max_workers=1) if background and len(estimators) > 0 else None
+
+    def submit(self, bid: Bid, t: float):
+        """
+            This method is called when the agent receives a bid from the opponent.
+        :param bid: Received bid
+        :param t: Negotiation time when the agent receives the bid
+        :return: Nothing
+        """
+        if len(self.estimators) == 0:
+            return
+
+        _bid = bid.copy_without_utility()
+        _bid.utility = self.preference.get_utility(_bid)
+
+        if self.executor is not None:
+            self.futures.append(self.executor.submit(self._update, [(_bid, t)]))
+        else:
+            self.pending.append((_bid, t))
+
+    def _update(self, updates: List[Tuple[Bid, float]]):
+        """
+            This method updates the Estimators in the order of the received bids.
+        :param updates: List of received bid and negotiation time pairs
+        :return: Nothing
+        """
+        for bid, t in updates:
+            for estimator in self.estimators:
+                if estimator in self.failed:
+                    continue
+
+                try:
+                    estimator.update(bid, t)
+                except Exception as e:
+                    self._fail(estimator, e)
+
+    def _fail(self, estimator: AbstractOpponentModel, e: Exception):
+        """
+            This method reports the exception of an Estimator, and skips its following updates.
+        :param estimator: Estimator which raises the exception
+        :param e: Exception
+        :return: Nothing
+        """
+        print("Exception occurs in %s while updating:" % estimator.name)
+        print(e)
+
+        self.failed.append(estimator)
+
+    def flush(self) -> List[AbstractOpponentModel]:
+        """
+            This method applies all submitted updates. It must be called before reading the Estimators. An exception
+            of an Estimator is not raised, but reported.
+        :return: Estimators which raise an exception since the last flush. They must be dropped from the Estimators.
+        """
+        updates = self.pending
+        futures = self.futures
+
+        self.pending = []
+        self.futures = []
+
+        for future in futures:
+            future.result()  # The exceptions are caught in the worker
+
+        if len(updates) > 0:
+            bid_indices = np.array([self.preference.get_bid_index(bid) for bid, _ in updates], dtype=np.int64)
+            times = np.array([t for _, t in updates], dtype=np.float64)
+
+            for estimator in self.estimators:
+                if estimator in self.failed:
+                    continue
+
+                try:
+                    estimator.update_batch(bid_indices, times)
+                except Exception as e:
+                    self._fail(estimator, e)
+
+        failed = self.failed
+
+        self.failed = []
+
+        return failed
+
+    def close(self) -> List[AbstractOpponentModel]:
+        """
+            This method applies all submitted updates, then it stops the background worker.
+        :return: Estimators which raise an exception since the last flush
+        """
+        failed = self.flush()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        return failed
@@ -1,3 +1,4 @@
+import time
 from nenv.utils.KillableThread import KillableThread
 from typing import Callable, Union, Any
 
@@ -11,6 +12,8 @@ class ProcessManager:
     timed_out: bool             # The process is timed-out or not
     exception: Exception        # Exception if it occurs
     has_exception: bool         # If any exception is occurred, or not
+    thread_time: float          # CPU time of the thread that runs the process, in terms of seconds
+    process_time: float         # CPU time of the whole process while running the process, in terms of seconds
     process: Callable           # Process will be called
     thread: KillableThread      # Thread object
 
@@ -26,15 +29,20 @@ class ProcessManager:
         self.process = lambda args: {}
         self.exception = None
         self.has_exception = False
+        self.thread_time = 0.
+        self.process_time = 0.
 
     def _run(self, args: Union[list, dict, None], return_dict: dict):
         """
             This method is a wrapper to run the process with given arguments. It also handles the exception if it
-            occurs.
+            occurs. The consumed CPU time is also measured.
         :param args: Given arguments as a list, dictionary or none
         :param return_dict: Return dictionary
         :return: None
         """
+        start_thread_time = time.thread_time()
+        start_process_time = time.process_time()
+
         try:
             # Handle different kind of arguments.
             if not args:
@@ -48,6 +56,10 @@ class ProcessManager:
             return_dict["exception"] = e
             return_dict["has_exception"] = True
 
+        finally:
+            return_dict["thread_time"] = time.thread_time() - start_thread_time
+            return_dict["process_time"] = time.process_time() - start_process_time
+
     def run(self, process: Callable, timeout: float, args: Union[list, dict, None] = None) -> object:
         """
             This method calls the process with given arguments by setting a timeout. It returns the output of the
@@ -71,6 +83,8 @@ class ProcessManager:
         return_dict["return_val"] = None
         return_dict["exception"] = None
         return_dict["has_exception"] = False
+        return_dict["thread_time"] = 0.
+        return_dict["process_time"] = 0.
 
         # Start the process with a timeout
         self.thread = KillableThread(target=self._run, args=(args, return_dict))
@@ -90,5 +104,7 @@ class ProcessManager:
         self.return_val = return_dict["return_val"]
         self.exception = return_dict["exception"]
         self.has_exception = return_dict["has_exception"]
+        self.thread_time = return_dict["thread_time"]
+        self.process_time = return_dict["process_time"]
 
         return self.return_val  # Return value of the given process
@@ -0,0 +1,98 @@
+import os
+from typing import List, Tuple
+import numpy as np
+
+# Record layout of a binary session trace. Each row represents an action in the negotiation session.
+TRACE_DTYPE = np.dtype([
+    ("Round", np.int32),     # Negotiation round
+    ("Who", np.uint8),       # Who took the action, 0: 'A', 1: 'B'
+    ("Time", np.float64),    # Normalized negotiation time
+    ("BidIndex", np.int64),  # Index of the bid in the domain, see Preference.get_bid_index
+    ("Action", np.uint8)     # 0: Offer, 1: Accept
+])
+
+TRACE_EXTENSION = ".trace.npy"
+
+AGENT_CODES = {"A": 0, "B": 1}
+AGENT_NAMES = ["A", "B"]
+ACTION_CODES = {"Offer": 0, "Accept": 1}
+ACTION_NAMES = ["Offer", "Accept"]
+
+
+class SessionTrace:
+    """
+        SessionTrace holds the compact binary trace of a negotiation session (i.e., Round, Who, Time, Bid Index and
+        Action of each action). Different from the session log file, the trace can be memory-mapped without any parsing.
+        Thus, it enables fast replays of the negotiation sessions (e.g., SessionEstimator).
+    """
+    rows: List[Tuple[int, int, float, int, int]]  # Recorded rows
+
+    def __init__(self):
+        """
+            Constructor
+        """
+        self.rows = []
+
+    def append(self, negotiation_round: int, who: str, t: float, bid_index: int, action: str):
+        """
+            Append an action into the trace
+        :param negotiation_round: Negotiation round
+        :param who: Who took the action, 'A' or 'B'
+        :param t: Negotiation time
+        :param bid_index: Index of the bid, see Preference.get_bid_index
+        :param action: 'Offer' or 'Accept'
+        :return: Nothing
+        """
+        self.rows.append((negotiation_round, AGENT_CODES[who], t, bid_index, ACTION_CODES[action]))
+
+    def to_array(self) -> np.ndarray:
+        """
+        :return: Recorded rows as a structured NumPy array
+        """
+        return np.array(self.rows, dtype=TRACE_DTYPE)
+
+    def save(self, file_path: str):
+        """
+            Save to file
+        :param file_path: File path
+        :return: Nothing
+        """
+        np.save(file_path, self.to_array(), allow_pickle=False)
+
+    @staticmethod
+    def load(file_path: str) -> np.ndarray:
+        """
+            Memory-map a trace file
+        :param file_path: File path
+        :return: Read-only structured NumPy array
+        """
+        return np.load(file_path, mmap_mode="r", allow_pickle=False)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def get_trace_path(log_path: str) -> str:
+    """
+        This method generates the trace path of a session log file.
+    :param log_path: Session log file path
+    :return: Trace file path
+    """
+    return os.path.splitext(log_path)[0] + TRACE_EXTENSION
+
+
+def parse_trace_name(trace_path: str) -> Tuple[str, str, str]:
+    """
+        This method extracts the agent names and the domain name from a trace file name, which follows the session file
+        name convention of Tournament (i.e., AgentA_AgentB_DomainX).
+
+        Note: Agent names are assumed not to contain '_' character.
+    :param trace_path: Trace file path
+    :return: AgentA name, AgentB name, Domain name
+    """
+    file_name = os.path.basename(trace_path)[:-len(TRACE_EXTENSION)]
+
+    agents, domain_name = file_name.rsplit("_Domain", 1)
+    agent_a, agent_b = agents.split("_", 1)
+
+    return agent_a, agent_b, domain_name
@@ -2,4 +2,5 @@ from nenv.utils.ProcessManager import ProcessManager
 from nenv.utils.SessionOps import AGENT_OPERATIONS, session_operation
 from nenv.utils.KillableThread import KillableThread
 from nenv.utils.ExcelLog import ExcelLog, LogRow
+from nenv.utils.SessionTrace import SessionTrace
 from nenv.utils.Move import get_move, get_move_distribution, calculate_move_correlation, calculate_awareness, calculate_behavior_sensitivity
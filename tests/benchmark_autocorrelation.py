@@ -0,0 +1,155 @@
+import argparse
+import math
+import time
+from typing import Callable, List
+import pandas as pd
+import torch
+from agents.NegoFormerAgent.layers.AutoCorrelation import AutoCorrelation
+
+
+def reference_agg(values: torch.Tensor, delay: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    """
+        The time delay aggregation of the given delays and weights of each sample with a loop over the delays, as the
+        reference of AutoCorrelation.time_delay_agg.
+    :param values: Values (batch x head x channel x length)
+    :param delay: Delays of each sample (batch x top k)
+    :param weights: Weights of the delays of each sample (batch x top k)
+    :return: Aggregated values
+    """
+    delays_agg = torch.zeros_like(values)
+    for b in range(values.shape[0]):
+        for i in range(delay.shape[1]):
+            delays_agg[b] = delays_agg[b] + torch.roll(values[b], -int(delay[b, i]), -1) * weights[b, i]
+    return delays_agg
+
+
+def reference_agg_training(factor: int, values: torch.Tensor, corr: torch.Tensor) -> torch.Tensor:
+    """
+        The time delay aggregation of the training phase with a loop over the top k delays (i.e., the previous
+        implementation), as the reference.
+    :param factor: Factor of AutoCorrelation
+    :param values: Values (batch x head x channel x length)
+    :param corr: Auto-correlations (batch x head x channel x length)
+    :return: Aggregated values
+    """
+    head = values.shape[1]
+    channel = values.shape[2]
+    length = values.shape[3]
+    top_k = int(factor * math.log(length))
+    mean_value = torch.mean(torch.mean(corr, dim=1), dim=1)
+    index = torch.topk(torch.mean(mean_value, dim=0), top_k, dim=-1)[1]
+    weights = torch.stack([mean_value[:, index[i]] for i in range(top_k)], dim=-1)
+    tmp_corr = torch.softmax(weights, dim=-1)
+    delays_agg = torch.zeros_like(values).float()
+    for i in range(top_k):
+        pattern = torch.roll(values, -int(index[i]), -1)
+        delays_agg = delays_agg + pattern * \
+                     (tmp_corr[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length))
+    return delays_agg
+
+
+def reference_agg_inference(factor: int, values: torch.Tensor, corr: torch.Tensor) -> torch.Tensor:
+    """
+        The time delay aggregation of the inference phase with a loop over the top k delays (i.e., the previous
+        implementation), as the reference.
+    :param factor: Factor of AutoCorrelation
+    :param values: Values (batch x head x channel x length)
+    :param corr: Auto-correlations (batch x head x channel x length)
+    :return: Aggregated values
+    """
+    batch = values.shape[0]
+    head = values.shape[1]
+    channel = values.shape[2]
+    length = values.shape[3]
+    init_index = torch.arange(length).unsqueeze(0).unsqueeze(0).unsqueeze(0) \
+        .repeat(batch, head, channel, 1).to(values.device)
+    top_k = int(factor * math.log(length))
+    mean_value = torch.mean(torch.mean(corr, dim=1), dim=1)
+    weights, delay = torch.topk(mean_value, top_k, dim=-1)
+    tmp_corr = torch.softmax(weights, dim=-1)
+    tmp_values = values.repeat(1, 1, 1, 2)
+    delays_agg = torch.zeros_like(values).float()
+    for i in range(top_k):
+        tmp_delay = init_index + delay[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length)
+        pattern = torch.gather(tmp_values, dim=-1, index=tmp_delay)
+        delays_agg = delays_agg + pattern * \
+                     (tmp_corr[:, i].unsqueeze(1).unsqueeze(1).unsqueeze(1).repeat(1, head, channel, length))
+    return delays_agg
+
+
+def measure(method: Callable, values: torch.Tensor, corr: torch.Tensor, repeats: int) -> float:
+    """
+        This method measures the average elapsed time of the given aggregation method after a warm-up call.
+    :param method: Aggregation method
+    :param values: Values
+    :param corr: Auto-correlations
+    :param repeats: Number of the measured calls
+    :return: Average elapsed time in milliseconds
+    """
+    with torch.no_grad():
+        method(values, corr)
+
+        start_time = time.perf_counter()
+
+        for _ in range(repeats):
+            method(values, corr)
+
+    return (time.perf_counter() - start_time) / repeats * 1000.
+
+
+def benchmark(lengths: List[int], batch_size: int = 5, heads: int = 8, channels: int = 64, factor: int = 5,
+              repeats: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+        This method compares the batched time delay aggregation of AutoCorrelation with the reference loops in terms of
+        the elapsed time and the maximum absolute difference. The default shapes are the shapes in NegoFormer, i.e.,
+        the candidates as the batch, and 512 model dimensions in 8 heads.
+    :param lengths: Sequence lengths, e.g., 96 for the encoder and 432 for the decoder
+    :param batch_size: Batch size, default 5
+    :param heads: Number of heads, default 8
+    :param channels: Number of channels of each head, default 64
+    :param factor: Factor of AutoCorrelation, default 5
+    :param repeats: Number of the measured calls, default 10
+    :param seed: Random seed, default 0
+    :return: Results, one row for each sequence length and phase
+    """
+    torch.manual_seed(seed)
+
+    auto_correlation = AutoCorrelation(False, factor)
+
+    rows = []
+
+    for length in lengths:
+        values = torch.randn(batch_size, heads, channels, length)
+        corr = torch.randn(batch_size, heads, channels, length)
+
+        for phase, method, reference in [("Inference", auto_correlation.time_delay_agg_inference, reference_agg_inference),
+                                         ("Training", auto_correlation.time_delay_agg_training, reference_agg_training)]:
+            reference_method = lambda v, c: reference(factor, v, c)
+
+            with torch.no_grad():
+                difference = float(torch.max(torch.abs(method(values, corr) - reference_method(values, corr))))
+
+            reference_time = measure(reference_method, values, corr, repeats)
+            batched_time = measure(method, values, corr, repeats)
+
+            rows.append({
+                "Length": length,
+                "Phase": phase,
+                "ReferenceTime": reference_time,
+                "BatchedTime": batched_time,
+                "SpeedUp": reference_time / batched_time,
+                "MaxDifference": difference
+            })
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the time delay aggregation of AutoCorrelation.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[96, 128, 224, 432], help="Sequence lengths. Default: 96 128 224 432")
+    parser.add_argument("--batch_size", type=int, default=5, help="Batch size. Default: 5")
+    parser.add_argument("--repeats", type=int, default=10, help="Number of the measured calls. Default: 10")
+
+    args = parser.parse_args()
+
+    print(benchmark(args.lengths, args.batch_size, repeats=args.repeats).to_string(index=False))
@@ -0,0 +1,68 @@
+import math
+import unittest
+import torch
+from agents.NegoFormerAgent.layers.AutoCorrelation import AutoCorrelation
+from tests.benchmark_autocorrelation import reference_agg, reference_agg_training, reference_agg_inference
+
+LENGTHS = [8, 96, 128, 224, 432]  # Encoder (96) and decoder (432) lengths of NegoFormer, and others
+FACTORS = [1, 3, 5]  # top_k = int(factor * log(length))
+
+
+class AutoCorrelationTest(unittest.TestCase):
+    """
+        Tests of the batched time delay aggregation of AutoCorrelation against the previous per-delay loops.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+
+    def assert_close(self, actual: torch.Tensor, expected: torch.Tensor):
+        self.assertEqual(actual.shape, expected.shape)
+        torch.testing.assert_close(actual, expected, rtol=1e-5, atol=1e-5)
+
+    def test_time_delay_agg(self):
+        auto_correlation = AutoCorrelation(False, 1)
+
+        for length in LENGTHS:
+            for top_k in [1, 2, 5, length]:
+                with self.subTest(length=length, top_k=top_k):
+                    values = torch.randn(3, 2, 4, length)
+                    # Different delays for each sample, including the repeated ones
+                    delay = torch.randint(0, length, (3, top_k))
+                    weights = torch.softmax(torch.randn(3, top_k), dim=-1)
+
+                    self.assert_close(auto_correlation.time_delay_agg(values, delay, weights),
+                                      reference_agg(values, delay, weights))
+
+    def test_time_delay_agg_training(self):
+        for factor in FACTORS:
+            auto_correlation = AutoCorrelation(False, factor)
+
+            for length in LENGTHS:
+                if int(factor * math.log(length)) > length:
+                    continue
+
+                with self.subTest(factor=factor, length=length):
+                    values = torch.randn(3, 2, 4, length)
+                    corr = torch.randn(3, 2, 4, length)
+
+                    self.assert_close(auto_correlation.time_delay_agg_training(values, corr),
+                                      reference_agg_training(factor, values, corr))
+
+    def test_time_delay_agg_inference(self):
+        for factor in FACTORS:
+            auto_correlation = AutoCorrelation(False, factor)
+
+            for length in LENGTHS:
+                if int(factor * math.log(length)) > length:
+                    continue
+
+                with self.subTest(factor=factor, length=length):
+                    values = torch.randn(3, 2, 4, length)
+                    corr = torch.randn(3, 2, 4, length)
+
+                    self.assert_close(auto_correlation.time_delay_agg_inference(values, corr),
+                                      reference_agg_inference(factor, values, corr))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import itertools
+import math
+import os
+import unittest
+from typing import Union
+import numpy as np
+from scipy.stats import kendalltau, spearmanr
+import nenv
+from nenv.OpponentModel import AbstractOpponentModel, ClassicFrequencyOpponentModel, FrequencyWindowOpponentModel
+from nenv.OpponentModel.AbstractOpponentModel import count_inversions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOMAINS = ["5", "10", "22", "41"]
+
+
+def reference_calculate_error(opponent_model: AbstractOpponentModel, org_pref: nenv.Preference,
+                              sample_positions: Union[None, np.ndarray] = None) -> (float, float, float):
+    """
+        The previous calculate_error with SciPy, where the ties are broken with the same local random state instead of
+        random.shuffle.
+    :param opponent_model: Opponent model to evaluate
+    :param org_pref: Original preferences of the opponent to compare
+    :param sample_positions: Positions of the sampled bids in `org_pref.bids`. Default None, i.e., whole bid space.
+    :return: RMSE, Spearman and Kendall-Tau
+    """
+    estimated_pref = opponent_model.preference
+
+    bids = org_pref.bids
+
+    if sample_positions is not None:
+        bids = [bids[position] for position in np.sort(sample_positions)]
+
+    utilities = [[bid.utility, estimated_pref.get_utility(bid)] for bid in bids]
+
+    rmse = 0.
+
+    for utility in utilities:
+        rmse += math.pow(utility[0] - utility[1], 2.)
+
+    rmse = math.sqrt(rmse / len(utilities))
+
+    org_indices = list(range(len(bids)))
+    agent_indices = list(np.random.RandomState(opponent_model.TIE_BREAKING_SEED).permutation(len(bids)))
+
+    agent_indices = sorted(agent_indices, key=lambda i: utilities[i][1], reverse=True)
+
+    spearman, _ = spearmanr(org_indices, agent_indices)
+    kendall, _ = kendalltau(org_indices, agent_indices)
+
+    return rmse, spearman, kendall
+
+
+class ErrorMetricsTest(unittest.TestCase):
+    """
+        Tests of the closed-form Spearman and the merge sort Kendall-Tau against SciPy on the same tie-broken ranking.
+    """
+    def test_count_inversions(self):
+        random_state = np.random.RandomState(0)
+
+        for n in [0, 1, 2, 3, 5, 8, 13, 64, 100]:
+            for _ in range(5):
+                with self.subTest(n=n):
+                    permutation = random_state.permutation(n)
+
+                    expected = sum(1 for i, j in itertools.combinations(range(n), 2) if permutation[i] > permutation[j])
+
+                    self.assertEqual(count_inversions(permutation), expected)
+
+        self.assertEqual(count_inversions(np.arange(1000)[::-1]), 1000 * 999 // 2)
+
+    def test_same_metrics(self):
+        for domain_name in DOMAINS:
+            for model_class in [ClassicFrequencyOpponentModel, FrequencyWindowOpponentModel]:
+                with self.subTest(domain=domain_name, model=model_class.__name__):
+                    org_pref = nenv.Preference(os.path.join(ROOT, "domains", "domain%s" % domain_name,
+                                                            "profileA.json"))
+                    random_state = np.random.RandomState(0)
+
+                    opponent_model = model_class(org_pref)
+
+                    # Before any update (i.e., many ties), and after some offers
+                    for number_of_offers in [0, 20]:
+                        bid_indices = random_state.randint(0, len(org_pref.bids), number_of_offers)
+
+                        for i, bid in enumerate(opponent_model.get_bids(bid_indices)):
+                            opponent_model.update(bid, i / len(bid_indices))
+
+                        sample_positions = random_state.choice(len(org_pref.bids), min(len(org_pref.bids), 100),
+                                                               replace=False)
+
+                        for positions in [None, sample_positions]:
+                            actual = opponent_model.calculate_error(org_pref, sample_positions=positions)
+                            expected = reference_calculate_error(opponent_model, org_pref, positions)
+
+                            for actual_metric, expected_metric in zip(actual, expected):
+                                self.assertAlmostEqual(actual_metric, expected_metric, delta=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
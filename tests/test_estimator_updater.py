@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+import nenv
+from nenv.OpponentModel import ClassicFrequencyOpponentModel, FrequencyWindowOpponentModel
+from nenv.logger import EstimatorMetricLogger
+from agents.boulware.Boulware import BoulwareAgent
+from agents.conceder.Conceder import ConcederAgent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FailingOpponentModel(ClassicFrequencyOpponentModel):
+    """
+        An estimator which raises an exception in the middle of the session.
+    """
+    @property
+    def name(self) -> str:
+        return "Failing Opponent Model"
+
+    def update(self, bid: nenv.Bid, t: float):
+        if t > 0.3:
+            raise RuntimeError("Failing Opponent Model")
+
+        super().update(bid, t)
+
+    def update_batch(self, bid_indices, times):
+        raise RuntimeError("Failing Opponent Model")
+
+
+class EstimatorUpdaterTest(unittest.TestCase):
+    """
+        Tests of the estimator failures, which must not change the negotiation result.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+
+        os.chdir(ROOT)  # The domain paths are relative to the repository
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_runner(self, estimators: list, loggers: list, background_estimators: bool) -> nenv.SessionRunner:
+        return nenv.SessionRunner(BoulwareAgent, ConcederAgent, "5", None, 200, estimators,
+                                  [logger(self.directory + "/") for logger in loggers], None, background_estimators)
+
+    def test_failing_estimator_is_dropped(self):
+        expected = self.create_runner([], [], False).run(os.path.join(self.directory, "expected.xlsx"))
+
+        for background_estimators in [False, True]:
+            for loggers in [[], [EstimatorMetricLogger]]:  # Deferred until the end, or flushed on each offer
+                with self.subTest(background_estimators=background_estimators, loggers=len(loggers)):
+                    runner = self.create_runner([FailingOpponentModel, FrequencyWindowOpponentModel], loggers,
+                                              background_estimators)
+                    result = runner.run(os.path.join(self.directory, "session.xlsx"))
+
+                    for key in ["Result", "Round", "AgentAUtility", "AgentBUtility"]:
+                        self.assertEqual(result["TournamentResults"][key], expected["TournamentResults"][key])
+
+                    self.assertEqual([estimator.name for estimator in runner.agentA.estimators],
+                                     ["Frequency Window Opponent Model"])
+                    self.assertEqual([estimator.name for estimator in runner.agentB.estimators],
+                                     ["Frequency Window Opponent Model"])
+                    self.assertNotIn("Failing Opponent Model", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import math
+import os
+import unittest
+from typing import List
+import numpy as np
+from scipy.stats import chisquare
+import nenv
+from nenv.Bid import Bid
+from nenv.OpponentModel import AbstractOpponentModel, FrequencyWindowOpponentModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOMAINS = ["5", "10", "22", "41"]
+
+
+class ReferenceIssueEstimator:
+    """
+        IssueEstimator of the previous (loop-based) FrequencyWindowOpponentModel.
+    """
+    weight: float
+    value_weights: dict
+    value_counter: dict
+    gamma: float = 0.25
+
+    def __init__(self, values: list):
+        self.value_weights = {value: 1. for value in values}
+        self.value_counter = {value: 1. for value in values}
+
+        self.weight = 1.
+
+    def update(self, value: str):
+        self.value_counter[value] += 1.
+
+        max_value = max(self.value_counter.values())
+
+        self.value_weights = {value_name: math.pow(self.value_counter[value_name], self.gamma) / math.pow(max_value, self.gamma) for value_name in self.value_counter.keys()}
+
+
+class ReferenceFrequencyWindowOpponentModel(AbstractOpponentModel):
+    """
+        The previous (loop-based) FrequencyWindowOpponentModel, as the reference of the vectorized one.
+    """
+    issues: dict
+    offers: List[Bid]
+    alpha: float = 10.
+    beta: float = 5.
+    window_size: int = 48
+
+    @property
+    def name(self) -> str:
+        return "Reference Frequency Window Opponent Model"
+
+    def __init__(self, reference: nenv.Preference):
+        super().__init__(reference)
+        self.offers = []
+
+        self.issues = {
+            issue: ReferenceIssueEstimator(issue.values) for issue in reference.issues
+        }
+
+        for issue in self.issues.keys():
+            self.issues[issue].weight = self._pref[issue]
+
+            for value in issue.values:
+                self.issues[issue].value_counter[value] = self._pref[issue, value]
+                self.issues[issue].value_weights[value] = self._pref[issue, value]
+
+    def update(self, bid: Bid, t: float):
+        self.offers.append(bid)
+
+        if t > 0.8:  # Do Not update in the last rounds.
+            self.update_weights()
+            return
+
+        for issue_name, estimator in self.issues.items():
+            estimator.update(bid[issue_name])
+
+        if len(self.offers) < 2:
+            self.update_weights()
+            return
+
+        if len(self.offers) % self.window_size == 0 and len(self.offers) >= 2 * self.window_size:
+            current_window = self.offers[-self.window_size:]
+            previous_window = self.offers[-2 * self.window_size:-self.window_size]
+
+            self.update_issues(previous_window, current_window, t)
+
+        self.update_weights()
+
+    def update_issues(self, previous_window, current_window, t):
+        not_changed = []
+        concession = False
+
+        def frequency(window: list, issue_name: str, issue_obj: ReferenceIssueEstimator):
+            values = []
+
+            for value in issue_obj.value_weights.keys():
+                total = 0.
+
+                for bid in window:
+                    if bid[issue_name] == value:
+                        total += 1.
+
+                values.append((1. + total) / (len(window) + len(issue_obj.value_counter)))
+
+            return values
+
+        for issue_name, issue_obj in self.issues.items():
+            fr_current = frequency(current_window, issue_name, issue_obj)
+            fr_previous = frequency(previous_window, issue_name, issue_obj)
+            p_val = chisquare(fr_previous, fr_current)[1]
+
+            if p_val > 0.05:
+                not_changed.append(issue_obj)
+            else:
+                estimated_current = sum([fr_current[i] * w for i, w in enumerate(issue_obj.value_weights.values())])
+                estimated_previous = sum([fr_previous[i] * w for i, w in enumerate(issue_obj.value_weights.values())])
+
+                if estimated_current < estimated_previous:
+                    concession = True
+
+        if len(not_changed) != len(self.issues) and concession:
+            for issue_obj in not_changed:
+                issue_obj.weight += self.alpha * (1. - math.pow(t, self.beta))
+
+        total_issue_weights = sum([issue_obj.weight for issue_obj in self.issues.values()])
+
+        for issue_obj in self.issues.values():
+            issue_obj.weight /= total_issue_weights
+
+    def update_weights(self):
+        for issue in self.issues.keys():
+            self._pref[issue] = self.issues[issue].weight
+
+            for value in issue.values:
+                self._pref[issue, value] = self.issues[issue].value_weights[value]
+
+
+def load_preference(domain_name: str) -> nenv.Preference:
+    return nenv.Preference(os.path.join(ROOT, "domains", "domain%s" % domain_name, "profileA.json"))
+
+
+def generate_offers(preference: nenv.Preference, number_of_offers: int, seed: int):
+    """
+        This method generates a random offer stream, where the opponent mostly repeats one bid in each window and
+        concedes from a window to the next, so that the issue weights change.
+    :param preference: Preferences of the opponent
+    :param number_of_offers: Number of offers
+    :param seed: Random seed
+    :return: Bid indices and times of the offers
+    """
+    random_state = np.random.RandomState(seed)
+
+    window_size = ReferenceFrequencyWindowOpponentModel.window_size
+    number_of_bids = len(preference.bids)
+    concessions = np.linspace(0, number_of_bids * 0.6, number_of_offers // window_size + 1).astype(int)
+
+    positions = [concessions[i // window_size] if random_state.rand() < 0.8 else random_state.randint(0, number_of_bids)
+                 for i in range(number_of_offers)]
+
+    bid_indices = np.array([preference.get_bid_index(preference.bids[position]) for position in positions])
+    times = np.sort(random_state.rand(number_of_offers))  # Including the last rounds, t > 0.8
+
+    return bid_indices, times
+
+
+class FrequencyWindowOpponentModelTest(unittest.TestCase):
+    """
+        Tests of the vectorized FrequencyWindowOpponentModel against the previous loop-based implementation.
+    """
+    def assert_same_weights(self, actual: nenv.Preference, expected: nenv.Preference):
+        for issue in expected.issues:
+            self.assertAlmostEqual(actual[issue], expected[issue], delta=1e-12)
+
+            for value in issue.values:
+                self.assertAlmostEqual(actual[issue, value], expected[issue, value], delta=1e-12)
+
+    def test_same_weights(self):
+        for domain_name in DOMAINS:
+            for seed in range(2):
+                with self.subTest(domain=domain_name, seed=seed):
+                    preference = load_preference(domain_name)
+                    bid_indices, times = generate_offers(preference, 400, seed)
+
+                    model = FrequencyWindowOpponentModel(preference)
+                    reference_model = ReferenceFrequencyWindowOpponentModel(preference)
+
+                    for i, (bid, t) in enumerate(zip(model.get_bids(bid_indices), times)):
+                        model.update(bid, float(t))
+                        reference_model.update(bid, float(t))
+
+                        if i % 24 == 0 or i == len(bid_indices) - 1:
+                            self.assert_same_weights(model.preference, reference_model.preference)
+
+
+if __name__ == "__main__":
+    unittest.main()
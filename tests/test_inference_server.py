@@ -0,0 +1,153 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+import torch
+import nenv
+from agents.NegoFormerAgent.NegoFormer import NegoFormer
+from agents.NegoFormerAgent.TimeEstimator import TimeEstimator
+from agents.NegoFormerAgent.export_model import get_example_inputs
+from agents.NegoFormerAgent.inference_server import InferenceServer, InferenceClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_process(model: torch.nn.Module, x: np.ndarray, t: np.ndarray, t_target: np.ndarray) -> np.ndarray:
+    """
+        This method runs the model in the process, as the reference of the server predictions.
+    :param model: Model in evaluation mode
+    :param x: Features
+    :param t: Times
+    :param t_target: Target times
+    :return: Predictions
+    """
+    with torch.no_grad():
+        x_tensor = torch.FloatTensor(x)
+
+        return model(x_tensor, x_tensor, torch.FloatTensor(t), torch.FloatTensor(t_target)).numpy()
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets are not available")
+class InferenceServerTest(unittest.TestCase):
+    """
+        Tests of the inference server against the in-process inference of the same model.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+
+        # Initial weights, so that the tests do not depend on a trained model. The model is shared in the process
+        self.negoformer_class = type("TestNegoFormer", (NegoFormer,), {"COMPILED_MODEL_PATH": None,
+                                                                       "WEIGHTS_PATH": None, "QUANTIZED": False,
+                                                                       "TRUNCATE_HORIZON": False})
+
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "negoformer.sock")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_negoformer(self) -> NegoFormer:
+        preference = nenv.Preference(os.path.join(ROOT, "domains", "domain5", "profileA.json"))
+
+        return self.negoformer_class(TimeEstimator(), nenv.OpponentModel.FrequencyWindowOpponentModel(preference))
+
+    def test_concurrent_clients(self):
+        model = self.create_negoformer().model
+
+        # Different batch sizes and horizons, so that the server batches and splits the requests
+        requests = []
+
+        for batch_size, horizon in [(1, 336), (3, 336), (5, 336), (2, 64), (4, 64), (2, 336)]:
+            x, _, t, t_target = get_example_inputs(batch_size, horizon)
+
+            requests.append((x.numpy(), t.numpy(), t_target.numpy()))
+
+        results = [None] * len(requests)
+        errors = []
+        barrier = threading.Barrier(len(requests))
+
+        def send(index: int):
+            try:
+                client = InferenceClient(self.socket_path)
+
+                try:
+                    barrier.wait()
+
+                    results[index] = client.predict(*requests[index])
+                finally:
+                    client.close()
+            except Exception as e:
+                errors.append(e)
+
+        with InferenceServer(self.socket_path, model, latency_budget=0.05):
+            threads = [threading.Thread(target=send, args=(i,)) for i in range(len(requests))]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+
+        for request, result in zip(requests, results):
+            expected = run_in_process(model, *request)
+
+            self.assertEqual(result.shape, expected.shape)
+            np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-5)
+
+    def test_fallback_after_stop(self):
+        server = InferenceServer(self.socket_path, self.create_negoformer().model).start()
+
+        try:
+            negoformer_class = type("ServedNegoFormer", (self.negoformer_class,),
+                                    {"INFERENCE_SERVER_PATH": self.socket_path})
+            negoformer = negoformer_class(TimeEstimator(), self.create_negoformer().opponent_model)
+
+            self.assertIsNotNone(negoformer.inference_client)
+
+            x, _, t, t_target = get_example_inputs(3)
+            x, t, t_target = x.numpy(), t.numpy(), t_target.numpy()
+
+            expected = run_in_process(negoformer.model, x, t, t_target)
+
+            np.testing.assert_allclose(negoformer.forward(x, t, t_target), expected, rtol=1e-4, atol=1e-5)
+        finally:
+            server.stop()
+
+        predictions = negoformer.forward(x, t, t_target)
+
+        self.assertIsNone(negoformer.inference_client)
+        np.testing.assert_allclose(predictions, expected, rtol=1e-4, atol=1e-5)
+
+    def test_close(self):
+        with InferenceServer(self.socket_path, self.create_negoformer().model) as server:
+            negoformer_class = type("ServedNegoFormer", (self.negoformer_class,),
+                                    {"INFERENCE_SERVER_PATH": self.socket_path})
+            negoformer = negoformer_class(TimeEstimator(), self.create_negoformer().opponent_model)
+
+            x, _, t, t_target = get_example_inputs(1)
+            negoformer.forward(x.numpy(), t.numpy(), t_target.numpy())
+
+            self.assertEqual(len(server.connections), 1)
+
+            negoformer.close()
+
+            self.assertIsNone(negoformer.inference_client)
+
+            # The handler of the session ends once the connection is closed
+            for _ in range(50):
+                if len(server.connections) == 0:
+                    break
+
+                time.sleep(0.05)
+
+            self.assertEqual(len(server.connections), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+import torch
+from agents.NegoFormerAgent.NegoFormer import NegoFormer
+from agents.NegoFormerAgent.export_model import export_torchscript, load_eager_model
+from agents.NegoFormerAgent.model_store import create_model, get_compiled_model_path, get_horizon_path, save_weights
+
+
+class ModelStoreTest(unittest.TestCase):
+    """
+        Tests of the model sources of NegoFormer, i.e., the TorchScript models, the weights and the quantization.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+
+        self.directory = tempfile.mkdtemp()
+        self.compiled_model_path = os.path.join(self.directory, "model.pt")
+        self.weights_path = os.path.join(self.directory, "weights")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_model(self, quantized: bool) -> torch.nn.Module:
+        return create_model(NegoFormer.INPUT_FEATURE_SIZE, NegoFormer.OUTPUT_LENGTH, torch.device("cpu"),
+                            self.compiled_model_path, self.weights_path, quantized)
+
+    def test_paths(self):
+        self.assertEqual(get_compiled_model_path("agents/model.pt"), "agents/model.pt")
+        self.assertEqual(get_compiled_model_path("agents/model.pt", True), "agents/model.quantized.pt")
+        self.assertEqual(get_compiled_model_path(get_horizon_path("agents/model.pt", 64), True),
+                         "agents/model_64.quantized.pt")
+
+    def test_quantized_model_is_not_replaced(self):
+        export_torchscript(load_eager_model(), self.compiled_model_path)
+
+        # The float TorchScript model must not be loaded for the quantized model
+        self.assertIsInstance(self.create_model(False), torch.jit.ScriptModule)
+        self.assertNotIsInstance(self.create_model(True), torch.jit.ScriptModule)
+
+        export_torchscript(self.create_model(True), get_compiled_model_path(self.compiled_model_path, True))
+
+        self.assertIsInstance(self.create_model(True), torch.jit.ScriptModule)
+
+    def test_ignored_weights_warning(self):
+        model = load_eager_model()
+
+        save_weights(model.state_dict(), self.weights_path)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+
+            self.assertNotIsInstance(self.create_model(False), torch.jit.ScriptModule)
+
+        self.assertFalse(any("are ignored" in str(warning.message) for warning in caught))
+
+        export_torchscript(model, self.compiled_model_path)
+
+        with self.assertWarnsRegex(UserWarning, "are ignored"):
+            self.assertIsInstance(self.create_model(False), torch.jit.ScriptModule)
+
+
+if __name__ == "__main__":
+    unittest.main()
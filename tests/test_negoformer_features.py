@@ -0,0 +1,135 @@
+import os
+import unittest
+from typing import List, Union
+import numpy as np
+import torch
+import nenv
+from agents.NegoFormerAgent.NegoFormer import NegoFormer
+from agents.NegoFormerAgent.NegoFormerProcessor import OfferPoint, process
+from agents.NegoFormerAgent.TimeEstimator import TimeEstimator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOMAINS = ["5", "10"]
+
+
+def reference_inputs(negoformer: NegoFormer, bids: List[nenv.Bid], t: float,
+                     pending_point: Union[None, OfferPoint] = None) -> (np.ndarray, np.ndarray):
+    """
+        The previous input preparation, where the features of each offer point are recomputed with the latest estimated
+        opponent preferences.
+    :param negoformer: NegoFormer instance
+    :param bids: Candidate bids
+    :param t: Current negotiation time
+    :param pending_point: Pending offer point, default None
+    :return: Features and times
+    """
+    estimated_preference = negoformer.opponent_model.preference
+
+    bid_point_history = list(negoformer.bid_point_history)
+
+    if pending_point is not None:
+        bid_point_history.append(pending_point)
+
+    # The last time-step is reserved for the candidate bid
+    bid_point_history = bid_point_history[-(negoformer.INPUT_LENGTH - 1):]
+    candidate_index = len(bid_point_history)
+
+    X = np.zeros((len(bids), negoformer.INPUT_LENGTH, negoformer.INPUT_FEATURE_SIZE))
+    T = np.zeros((len(bids), negoformer.INPUT_LENGTH, 1))
+
+    for i, bid_point in enumerate(bid_point_history):
+        T[:, i, 0] = bid_point.t
+
+        if i >= 2:
+            X[:, i, :] = process(bid_point_history[i - 2], bid_point, t, estimated_preference)
+        else:
+            X[:, i, :] = process(None, bid_point, t, estimated_preference)
+
+    T[:, candidate_index, 0] = t
+
+    for j, bid in enumerate(bids):
+        bid_point = OfferPoint(-1, bid, t)
+
+        if candidate_index >= 2:
+            X[j, candidate_index, :] = process(bid_point_history[candidate_index - 2], bid_point, t, estimated_preference)
+        else:
+            X[j, candidate_index, :] = process(None, bid_point, t, estimated_preference)
+
+    return X, T
+
+
+class NegoFormerFeaturesTest(unittest.TestCase):
+    """
+        Tests of the incremental ring buffer of the NegoFormer features against a full recompute of the history.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+
+        # Initial weights, since the model is not used. The model is shared in the process
+        self.negoformer_class = type("TestNegoFormer", (NegoFormer,), {"COMPILED_MODEL_PATH": None,
+                                                                       "WEIGHTS_PATH": None, "QUANTIZED": False,
+                                                                       "TRUNCATE_HORIZON": False})
+
+    def get_bid(self, preference: nenv.Preference, random_state: np.random.RandomState) -> nenv.Bid:
+        bid = preference.get_bid_by_index(int(random_state.randint(0, len(preference.bids))))
+        bid.utility = preference.get_utility(bid)
+
+        return bid
+
+    def assert_same_inputs(self, negoformer: NegoFormer, bids: List[nenv.Bid], t: float,
+                           pending_point: Union[None, OfferPoint] = None):
+        X, T, _, _ = negoformer.prepare_inputs(bids, t, pending_point)
+        expected_X, expected_T = reference_inputs(negoformer, bids, t, pending_point)
+
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(T, expected_T)
+
+    def assert_same_features(self, negoformer: NegoFormer, bid: nenv.Bid, t: float):
+        features, times = negoformer.get_features(t, negoformer.INPUT_LENGTH - 1)
+        expected_X, expected_T = reference_inputs(negoformer, [bid], t)
+
+        self.assertEqual(len(features), min(len(negoformer.bid_point_history), negoformer.INPUT_LENGTH - 1))
+        np.testing.assert_array_equal(features, expected_X[0, :len(features)])
+        np.testing.assert_array_equal(times, expected_T[0, :len(features), 0])
+
+    def test_same_inputs(self):
+        for domain_name in DOMAINS:
+            for model_class in [nenv.OpponentModel.FrequencyWindowOpponentModel,
+                                nenv.OpponentModel.BayesianOpponentModel]:
+                with self.subTest(domain=domain_name, model=model_class.__name__):
+                    preference = nenv.Preference(os.path.join(ROOT, "domains", "domain%s" % domain_name,
+                                                              "profileA.json"))
+                    random_state = np.random.RandomState(0)
+
+                    opponent_model = model_class(preference)
+                    negoformer = self.negoformer_class(TimeEstimator(), opponent_model)
+
+                    # The buffer wraps around twice. The estimation does not change in the last rounds (t > 0.8) of
+                    # FrequencyWindow, where the features are calculated incrementally.
+                    number_of_points = 2 * NegoFormer.INPUT_LENGTH + 40
+
+                    for i in range(number_of_points):
+                        t = (i + 1) / number_of_points
+                        bid = self.get_bid(preference, random_state)
+
+                        if i % 3 != 2:  # Received bid
+                            opponent_model.update(bid, t)
+                            negoformer.time_estimator.update(t)
+                            negoformer.receive_bid(bid, t)
+                        else:
+                            negoformer.update(bid, t)
+
+                        if i % 5 == 0 or i < 4 or i > number_of_points - 30:
+                            candidates = [self.get_bid(preference, random_state) for _ in range(3)]
+
+                            self.assert_same_features(negoformer, candidates[0], t)
+
+                            if negoformer.is_ready():  # The time estimator is ready, as well
+                                self.assert_same_inputs(negoformer, candidates, t)
+                                self.assert_same_inputs(negoformer, candidates, t,
+                                                        OfferPoint(1, self.get_bid(preference, random_state), t))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import unittest
+import numpy as np
+import nenv
+from nenv.OpponentModel import BayesianOpponentModel, ClassicFrequencyOpponentModel, FrequencyWindowOpponentModel
+from tests.test_frequency_window import generate_offers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOMAINS = ["5", "10", "22", "41"]
+
+
+class UpdateBatchTest(unittest.TestCase):
+    """
+        Tests of the batch updates of the opponent models against the sequential updates.
+    """
+    def assert_same_weights(self, actual: nenv.Preference, expected: nenv.Preference):
+        for issue in expected.issues:
+            self.assertAlmostEqual(actual[issue], expected[issue], delta=1e-12)
+
+            for value in issue.values:
+                self.assertAlmostEqual(actual[issue, value], expected[issue, value], delta=1e-12)
+
+    def check_model(self, model_class, number_of_offers: int):
+        for domain_name in DOMAINS:
+            with self.subTest(model=model_class.__name__, domain=domain_name):
+                preference = nenv.Preference(os.path.join(ROOT, "domains", "domain%s" % domain_name, "profileA.json"))
+                bid_indices, times = generate_offers(preference, number_of_offers, 0)
+
+                sequential_model = model_class(preference)
+                batch_model = model_class(preference)
+                split_model = model_class(preference)
+
+                for bid, t in zip(sequential_model.get_bids(bid_indices), times):
+                    sequential_model.update(bid, float(t))
+
+                batch_model.update_batch(bid_indices, times)
+
+                # Several batches and single updates in between, as in a replay of many sessions
+                split = number_of_offers // 3
+
+                split_model.update_batch(bid_indices[:split], times[:split])
+
+                for bid, t in zip(split_model.get_bids(bid_indices[split:split + 5]), times[split:split + 5]):
+                    split_model.update(bid, float(t))
+
+                split_model.update_batch(bid_indices[split + 5:], times[split + 5:])
+
+                self.assert_same_weights(batch_model.preference, sequential_model.preference)
+                self.assert_same_weights(split_model.preference, sequential_model.preference)
+
+    def test_classic_frequency(self):
+        self.check_model(ClassicFrequencyOpponentModel, 400)
+
+    def test_frequency_window(self):
+        self.check_model(FrequencyWindowOpponentModel, 400)
+
+    def test_default(self):
+        self.check_model(BayesianOpponentModel, 60)
+
+
+if __name__ == "__main__":
+    unittest.main()